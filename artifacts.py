@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import io
+import os
+import shutil
+import time
+from manifest import Manifest, atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Lifecycle of the pipeline's intermediate files (Ramulator2 command traces, DRAMPower
+# CSVs, chunk traces): once every consumer is done they are deleted or compressed
+# (zstd when the zstandard package is installed, gzip -1 otherwise). open_artifact()
+# reads either form, so analysis scripts stream compressed intermediates directly.
+POLICIES = ("delete", "compress", "keep")
+EXTENSIONS = (".zst", ".gz")
+EXT = ".zst" if zstandard else ".gz"
+COPY_BLOCK = 4 * 1024 * 1024
+
+
+def compressed_copy(path: str):
+    for ext in EXTENSIONS:
+        if os.path.exists(path + ext):
+            return path + ext
+    return None
+
+def open_artifact(path: str, mode: str = "rb"):
+    """
+    Streaming reader ("rb" or "r") for path, for a compressed path (.zst/.gz), or for
+    the compressed copy that replaced path after use.
+    """
+    if not path.endswith(EXTENSIONS):
+        if os.path.exists(path):
+            return open(path, mode)
+        path = compressed_copy(path) or path
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb" if "b" in mode else "rt")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"the zstandard package is needed to read {path}")
+        raw = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True), COPY_BLOCK)
+        return raw if "b" in mode else io.TextIOWrapper(raw)
+    return open(path, mode)
+
+def compress(path: str) -> str:
+    # path -> path + EXT, written under a temp name; the original is removed afterwards
+    dst = path + EXT
+    with open(path, "rb") as src, atomic_write(dst, "wb") as out:
+        if zstandard:
+            with zstandard.ZstdCompressor(level=3).stream_writer(out, closefd=False) as w:
+                shutil.copyfileobj(src, w, COPY_BLOCK)
+        else:
+            with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=1, mtime=0) as w:
+                shutil.copyfileobj(src, w, COPY_BLOCK)
+    os.remove(path)
+    return dst
+
+def restore(path: str) -> str:
+    # Decompresses the copy that replaced path back into place and removes the copy
+    copy = compressed_copy(path)
+    with open_artifact(copy) as src, atomic_write(path, "wb") as out:
+        shutil.copyfileobj(src, out, COPY_BLOCK)
+    os.remove(copy)
+    return path
+
+def retire(path: str, policy: str):
+    # Deletes or compresses a consumed intermediate; returns its compressed copy (None if deleted)
+    if policy == "compress":
+        return compress(path)
+    os.remove(path)
+    return None
+
+def tree_bytes(roots: list) -> int:
+    # Disk usage under roots, counting hard-linked files (trace cache links) once
+    seen, total = set(), 0
+    for root in roots:
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_blocks * 512
+    return total
+
+
+class DiskBudget:
+    """
+    allows() is False while the directories under roots use more than max_bytes.
+    The walk is repeated at most every `ttl` seconds.
+    """
+
+    def __init__(self, roots: list, max_bytes: int, ttl: float = 5.0):
+        self.roots = roots
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.used = 0
+        self.checked = 0.0
+
+    def allows(self) -> bool:
+        if time.time() - self.checked > self.ttl:
+            self.used = tree_bytes(self.roots)
+            self.checked = time.time()
+        return self.used <= self.max_bytes
+
+
+def sweep(result_root: str, policy: str) -> int:
+    """
+    Retires the command traces and DRAMPower CSVs of every finished job under
+    result_root (energy report recorded complete, or present for runs without a
+    manifest). Returns the bytes freed.
+    """
+    freed = 0
+    for root, _, files in sorted(os.walk(result_root)):
+        report = next((f for f in files if f.endswith("drampower_report.txt")), None)
+        if not report:
+            continue
+        manifest = Manifest(os.path.join(root, "manifest.json")) if "manifest.json" in files else None
+        stages = manifest.data["stages"] if manifest else {}
+        if manifest and not any(s in stages and manifest.done(s, stages[s]["key"]) for s in ("energy", "piped")):
+            continue
+        for name in files:
+            if "ramulator2_output.txt.ch" in name and not name.endswith(EXTENSIONS):
+                stage = "simulate"
+            elif "drampower_trace_input" in name and name.endswith(".csv"):
+                stage = "convert"
+            else:
+                continue
+            path = os.path.join(root, name)
+            size = os.path.getsize(path)
+            copy = retire(path, policy)
+            freed += size - (os.path.getsize(copy) if copy else 0)
+            if manifest:
+                manifest.retire(stage, path, copy)
+    return freed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Disk usage and cleanup of the pipeline's intermediate files")
+    ap.add_argument("command", choices=["usage", "sweep"])
+    ap.add_argument("roots", nargs="+", help="Result / chunk trace directories")
+    ap.add_argument("--policy", choices=["delete", "compress"], default="delete",
+                    help="What sweep does with consumed intermediates")
+    args = ap.parse_args()
+
+    if args.command == "sweep":
+        for root in args.roots:
+            print(f"{root}: freed {sweep(root, args.policy) / 1024**3:.2f} GB")
+    print(f"Disk usage: {tree_bytes(args.roots) / 1024**3:.2f} GB")
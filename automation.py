@@ -1,154 +1,719 @@
 import os
+import copy
 import yaml
 import subprocess
 import glob
 import sys
+import argparse
+import json
+import time
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from trace_cache import TraceCache, converter_version
+from energy_model import EnergyModel, write_report, aggregate_reports
+from ram2drampower import channel_files, channel_output, stats_path, merge_stats
+from scheduler import Node, run_dag, CACHED
+from manifest import Manifest, atomic_write, tmp_path
+from simpoint import is_current
+import runlog
+import artifacts
 # --- SETTINGS ---
 DO_CONVERSION = True 
 DO_RAMU2_SIM = True
 DO_DRAMPOWER_CONV = True 
 DO_DRAMPOWER_CLI = True
+USE_TRACE_CACHE = True      # reuse converted chunks across runs (see trace_cache.py)
+TRACE_CACHE_MAX_GB = 50
+RESUME = False              # skip jobs whose manifest shows complete, intact outputs
+PIPE_STAGES = False         # run Steps 2-4 concurrently through named pipes (no .ch0 / CSV files)
+ENERGY_BACKEND = "drampower"  # "drampower" (CLI) or "model" (energy_model.py, for wide sweeps)
+INTERMEDIATES = "delete"    # command traces / DRAMPower CSVs once consumed: "delete", "compress" or "keep"
+DISK_BUDGET_GB = 0          # hold back new simulations while result/ + chunk traces use more (0 = no limit)
 
+# Paths (PIPELINE_ROOT and the tool variables below override the default layout)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.environ.get("PIPELINE_ROOT", os.path.join(BASE_DIR, ".."))
+baseline_config_file = "automation.yaml"
+dpc2ram_script = os.path.join(BASE_DIR, "dpc2ram.py")
+ram2drampower_script = os.path.join(BASE_DIR, "ram2drampower.py")
+energy_model_script = os.path.join(BASE_DIR, "energy_model.py")
+simpoint_script = os.path.join(BASE_DIR, "simpoint.py")
+# Ramulator2 Paths
+ramulator_root = os.path.join(WORK_DIR, "ramulator2")
+ramulator_bin = os.environ.get("RAMULATOR2_BIN", os.path.join(ramulator_root, "build/ramulator2"))
 
-def automate_pipeline(dpc_file_name):
-    # Paths
-    baseline_config_file = "automation.yaml"
+# DRAMPower Paths
+drampower_root = os.path.join(WORK_DIR, "DRAMPower")
+drampower_bin = os.environ.get("DRAMPOWER_BIN", os.path.join(drampower_root, "build/bin/cli"))
+dram_spec_json = os.environ.get("DRAMPOWER_MEMSPEC", os.path.join(drampower_root, "tests/tests_drampower/resources/ddr5.json"))
+cli_config_json = os.environ.get("DRAMPOWER_CLI_CONFIG", os.path.join(drampower_root, "tests/tests_drampower/resources/cliconfig.json"))
+# Stand-ins with the same command lines and output formats (see standin_ramulator2.py)
+standin_ramulator_bin = os.path.join(BASE_DIR, "standin_ramulator2.py")
+standin_drampower_bin = os.path.join(BASE_DIR, "standin_drampower.py")
+trace_cache_dir = os.path.join(WORK_DIR, "trace_cache")
+result_dir = os.path.join(WORK_DIR, "result")
+chunk_root = os.path.join(WORK_DIR, "ramulator_trace_files")
+# The energy model reads the same memspec as the CLI, falling back to the repo copy
+model_spec_json = dram_spec_json if os.path.exists(dram_spec_json) else os.path.join(BASE_DIR, "ddr5.json")
 
-    parts = dpc_file_name.split('.')
-    trace_name = parts[1]  
-    import os
+tREFI_list = [3900, 5850, 7800]
+interval_list = [32, 48, 64]
 
-    
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    dpc2ram_script = os.path.join(BASE_DIR, "dpc2ram.py")
-    ram2drampower_script = os.path.join(BASE_DIR, "ram2drampower.py")
-    # Ramulator2 Paths
-    ramulator_root = os.path.join(BASE_DIR, "..", "ramulator2")
+CHUNK_LINES = 200000
 
-    # DRAMPower Paths
-    drampower_root = os.path.join(BASE_DIR, "..", "DRAMPower")
-    drampower_bin = os.path.join(drampower_root, "build/bin/cli")
-    dram_spec_json = os.path.join(drampower_root, "tests/tests_drampower/resources/ddr5.json")
-    cli_config_json = os.path.join(drampower_root, "tests/tests_drampower/resources/cliconfig.json")
+# dpc2ram.py arguments shared by the file and streaming modes
+DPC2RAM_ARGS = [
+    "--chunk-lines", str(CHUNK_LINES),
+    "--inst-limit", "0",
+    "--line-limit", "0",
+    "--shift", "0",
+    "--max-chunk", "2"
+]
 
-    # Data Paths
-    input_xz_trace = os.path.join(BASE_DIR, "..", "trace_files", dpc_file_name)
-    ramulator_trace_input = os.path.join(BASE_DIR, "..", "ramulator_trace_files", trace_name + ".trace")
-    chunk_dir = os.path.join(BASE_DIR, "..", "ramulator_trace_files", trace_name + "_chunks")
 
+def convert_trace(input_xz_trace, trace_name, chunk_dir, conv_args):
+    # Step 1 through the content-addressed cache: a hit links the previously
+    # converted chunks into chunk_dir without touching the .xz trace
+    def convert(out_dir):
+        subprocess.run(runlog.wrap([
+            "python3",
+            dpc2ram_script,
+            input_xz_trace,
+            "--out-dir", out_dir,
+            "--trace-name", trace_name,
+        ] + conv_args, "dpc2ram", trace=trace_name), check=True)
 
-    tREFI_list = [3900, 5850, 7800]
-    interval_list = [32, 48, 64]
+    if not USE_TRACE_CACHE:
+        # Convert into a staging directory and rename the chunks into place (which also
+        # never writes through a hard link into the cache); the chunk directory's
+        # manifest records finished conversions for --resume
+        os.makedirs(chunk_dir, exist_ok=True)
+        manifest = Manifest(os.path.join(chunk_dir, "manifest.json"))
+        stage = "dpc2ram " + " ".join(conv_args)
+        key = manifest.key(manifest.input(os.path.basename(input_xz_trace), input_xz_trace),
+                           converter_version(), trace_name, *conv_args)
+        if RESUME and manifest.done(stage, key):
+            print(f"Resume: {trace_name} chunks already converted")
+            return
+        manifest.start(stage)
+        staging = tempfile.mkdtemp(prefix=".staging_", dir=chunk_dir)
+        t0 = time.time()
+        try:
+            convert(staging)
+            outputs = []
+            for name in sorted(os.listdir(staging)):
+                os.replace(os.path.join(staging, name), os.path.join(chunk_dir, name))
+                outputs.append(os.path.join(chunk_dir, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        manifest.record(stage, key, outputs, time.time() - t0)
+        return
+    cache = TraceCache(trace_cache_dir, int(TRACE_CACHE_MAX_GB * 1024**3))
+    cache.fetch(input_xz_trace, ["--trace-name", trace_name] + conv_args, chunk_dir, convert)
+    s = cache.summary()
+    print(f"Trace cache: {s['hits']} hits / {s['misses']} misses ({s['hit_rate'] * 100:.0f}%), "
+          f"{s['entries']} entries, {s['bytes'] / 1024**3:.2f} GB")
 
-    # --- Step 1: Converting DPC2 trace ---
-    if DO_CONVERSION:
-        print("--- Step 1: Converting DPC trace ---")
+
+def release_fifo(fifo, writer_done, reader_done):
+    # A stage that exits without opening its end of a pipe leaves its neighbour blocked
+    # in open(). Once one side is done, open the other end briefly so the neighbour
+    # sees EOF (reader) or a broken pipe (writer) instead of hanging.
+    while not (writer_done() and reader_done()):
         try:
-            subprocess.run([
-                "python3",
-                dpc2ram_script,
-                input_xz_trace,
-                "--out-dir", chunk_dir,
-                "--trace-name", trace_name,
-                "--chunk-lines", "200000",
-                "--inst-limit", "0",
-                "--line-limit", "0",
-                "--shift", "0",
-                "--max-chunk", "2"
-            ], check=True)
+            if writer_done():
+                os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+            elif reader_done():
+                os.close(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+        except OSError:
+            pass
+        time.sleep(0.1)
+
+
+def run_energy(trace_csv, report, tags={}):
+    # Step 4 for one DRAMPower CSV with the selected backend; tags label its run log record
+    if ENERGY_BACKEND == "model":
+        with runlog.timed("energy_model", **tags):
+            write_report(EnergyModel(model_spec_json).estimate(trace_csv), report)
+        return
+    result = subprocess.run(runlog.wrap([
+        drampower_bin, "-m", dram_spec_json, "-t", trace_csv, "-c", cli_config_json
+    ], "drampower", **tags), capture_output=True, text=True, check=True)
+    with atomic_write(report) as f_report:
+        f_report.write(result.stdout)
+
+
+def run_energy_channels(drampower_trace_input, drampower_report_output, tags={}):
+    # Multi-channel runs have one CSV per channel (<name>.chN.csv); each gets its own
+    # <report>.chN.txt and drampower_report_output holds the sum
+    channels = channel_files(os.path.splitext(drampower_trace_input)[0], ".csv")
+    if os.path.exists(drampower_trace_input) or not channels:
+        run_energy(drampower_trace_input, drampower_report_output, tags)
+        return
+    reports = [channel_output(drampower_report_output, ch) for ch, _ in channels]
+    with ThreadPoolExecutor(max_workers=len(channels)) as pool:
+        list(pool.map(run_energy, [path for _, path in channels], reports,
+                      [{**tags, "channel": ch} for ch, _ in channels]))
+    aggregate_reports(reports, drampower_report_output)
+
+
+def run_stages_piped(config_file, n_channels, ramulator_report_output, ramulator_trace_output,
+                     drampower_trace_input, drampower_report_output, tags={}):
+    # Steps 2-4 at once: each TraceRecorder .chN output is a named pipe read by its own
+    # ram2drampower.py, whose CSV is a second pipe read by DRAMPower (or the energy
+    # model). Only the reports and the ram2drampower stats sidecars are written; the
+    # reports go to temp names that are renamed into place only once every stage succeeded.
+    if n_channels == 1:
+        stages = [(ramulator_trace_output + ".ch0", drampower_trace_input, drampower_report_output)]
+    else:
+        stages = [(f"{ramulator_trace_output}.ch{ch}", channel_output(drampower_trace_input, ch),
+                   channel_output(drampower_report_output, ch)) for ch in range(n_channels)]
+    fifos = [path for trace, csv, _ in stages for path in (trace, csv)]
+    tmp_reports = [(tmp_path(report), report) for _, _, report in stages]
+    tmp_reports.append((tmp_path(ramulator_report_output), ramulator_report_output))
+    for fifo in fifos:
+        if os.path.lexists(fifo):
+            os.remove(fifo)
+        os.mkfifo(fifo)
+    try:
+        with open(tmp_reports[-1][0], "w") as output_file, \
+                ThreadPoolExecutor(max_workers=3 * len(stages)) as pool:
+            sim = subprocess.Popen(runlog.wrap([ramulator_bin, "-f", config_file],
+                                               "ramulator2", **tags, piped=1),
+                                   stdout=output_file, stderr=output_file)
+            convs, energies = [], []
+            for ch, (trace, csv, report) in enumerate(stages):
+                ch_tags = {**tags, "channel": ch, "piped": 1}
+                conv = subprocess.Popen(runlog.wrap(["python3", ram2drampower_script, trace, csv, "--config", config_file],
+                                                    "ram2drampower", **ch_tags))
+                energy = pool.submit(run_energy, csv, tmp_path(report), ch_tags)
+                pool.submit(release_fifo, trace, lambda: sim.poll() is not None, lambda c=conv: c.poll() is not None)
+                pool.submit(release_fifo, csv, lambda c=conv: c.poll() is not None, energy.done)
+                convs.append(conv)
+                energies.append(energy)
+            errors = [energy.exception() for energy in energies]
+            sim.wait()
+            for conv in convs:
+                conv.wait()
+
+        # One failing stage usually breaks its neighbours' pipes too, so name every stage that failed
+        failed = [f"ramulator2 ({sim.returncode})"] if sim.returncode else []
+        for (trace, _, _), conv, error in zip(stages, convs, errors):
+            ch = trace.rsplit(".", 1)[1]
+            failed += [f"ram2drampower.py {ch} ({conv.returncode})"] if conv.returncode else []
+            failed += [f"energy {ch} ({error})"] if error else []
+        if failed:
+            raise RuntimeError("failed stages: " + ", ".join(failed))
+        # Energy reports first, the Ramulator2 report last, so a run never looks complete early
+        for tmp, report in tmp_reports[:-1]:
+            os.replace(tmp, report)
+        if len(stages) > 1:
+            parts = []
+            for _, csv, _ in stages:
+                with open(stats_path(csv)) as f:
+                    parts.append(json.load(f))
+            with atomic_write(stats_path(drampower_trace_input)) as f:
+                json.dump(merge_stats(parts), f, indent=2)
+            aggregate_reports([report for _, _, report in stages], drampower_report_output)
+        os.replace(*tmp_reports[-1])
+    finally:
+        for fifo in fifos:
+            if os.path.lexists(fifo):
+                os.remove(fifo)
+        for tmp, _ in tmp_reports:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    print(f"Report saved: {drampower_report_output}")
+
+
+def job_paths(trace_name, chunk_tag, interval):
+    # Result files of one chunk under one tREFI setting
+    output_base = os.path.join(result_dir, trace_name, 
+        f"{trace_name}_{chunk_tag}", 
+        f"{chunk_tag}_{trace_name}_{interval}ms"
+    )
+    os.makedirs(output_base, exist_ok=True)
+    prefix = output_base + f"/{trace_name}_{interval}ms"
+    return {
+        "output_base": output_base,
+        "ramulator_trace_output": prefix + "_ramulator2_output.txt",
+        "ramulator_report_output": prefix + "_ramulator2_report.txt",
+        "drampower_trace_input": prefix + "_drampower_trace_input.csv",
+        "drampower_report_output": prefix + "_drampower_report.txt",
+        "manifest": output_base + "/manifest.json",
+    }
+
+
+def render_config(base_config, paths, chunk_trace, tREFI):
+    config = copy.deepcopy(base_config)
+    config["MemorySystem"]["DRAM"]["timing"]["tREFI"] = tREFI
+
+    # Update Path in Plugins
+    for plugin in config["MemorySystem"]["Controller"]["plugins"]:
+        if "ControllerPlugin" in plugin:
+            plugin["ControllerPlugin"]["path"] = paths["ramulator_trace_output"]
+
+    config["Frontend"]["traces"] = [chunk_trace]
+    return config
+
+
+def write_job_config(config, paths, chunk_tag, interval):
+    # Ramulator2 config of one job; mkstemp keeps the name unique when jobs run in parallel
+    fd, config_file = tempfile.mkstemp(prefix=f"temp_config_{chunk_tag}_{interval}ms_", suffix=".yaml",
+                                       dir=paths["output_base"])
+    with os.fdopen(fd, "w") as f:
+        yaml.dump(config, f)
+    return config_file
+
+
+def stage_keys(manifest, config, chunk_trace):
+    # Each stage's key chains the key of the stage feeding it, so any changed input
+    # (chunk, rendered config, binaries, converter, memspec) invalidates everything after it
+    simulate = manifest.key(manifest.input("chunk_trace", chunk_trace),
+                            manifest.value("config", yaml.dump(config)),
+                            manifest.input("ramulator2", ramulator_bin))
+    convert = manifest.key(simulate, manifest.input("ram2drampower", ram2drampower_script))
+    if ENERGY_BACKEND == "model":
+        energy = manifest.key(convert, "model", manifest.input("energy_model", energy_model_script),
+                              manifest.input("memspec", model_spec_json))
+    else:
+        energy = manifest.key(convert, "drampower", manifest.input("drampower", drampower_bin),
+                              manifest.input("memspec", dram_spec_json), manifest.input("cliconfig", cli_config_json))
+    return {"simulate": simulate, "convert": convert, "energy": energy, "piped": energy}
+
+
+def stage_outputs(step, paths):
+    # Files a finished stage leaves behind, recorded with their sizes in the manifest
+    csv_stem = os.path.splitext(paths["drampower_trace_input"])[0]
+    csvs = [p for _, p in channel_files(csv_stem, ".csv")]
+    if os.path.exists(paths["drampower_trace_input"]):
+        csvs.append(paths["drampower_trace_input"])
+    stats = [stats_path(p) for p in csvs] + [stats_path(paths["drampower_trace_input"])]
+    reports = [paths["drampower_report_output"]] + \
+        [p for _, p in channel_files(os.path.splitext(paths["drampower_report_output"])[0], ".txt")]
+    if step == "simulate":
+        outputs = [paths["ramulator_report_output"]] + [p for _, p in channel_files(paths["ramulator_trace_output"])]
+    elif step == "convert":
+        outputs = csvs + stats
+    elif step == "energy":
+        outputs = reports
+    else:
+        outputs = [paths["ramulator_report_output"]] + stats + reports
+    return sorted({p for p in outputs if os.path.isfile(p)})
+
+
+def job_complete(base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval):
+    # True when the manifest shows the job's energy report current for its inputs
+    paths = job_paths(trace_name, chunk_tag, interval)
+    manifest = Manifest(paths["manifest"])
+    keys = stage_keys(manifest, render_config(base_config, paths, chunk_trace, tREFI), chunk_trace)
+    return any(manifest.done(step, keys[step]) for step in ("energy", "piped"))
+
+
+# Stage that produces the intermediates each stage reads, and the reverse
+PRODUCER = {"convert": "simulate", "energy": "convert"}
+CONSUMER = {producer: step for step, producer in PRODUCER.items()}
+
+
+def intermediate_files(step, paths):
+    # Files a stage produces only for the next one to read
+    if step == "simulate":
+        return [p for _, p in channel_files(paths["ramulator_trace_output"])]
+    csvs = [p for _, p in channel_files(os.path.splitext(paths["drampower_trace_input"])[0], ".csv")]
+    return csvs + [p for p in [paths["drampower_trace_input"]] if os.path.isfile(p)]
+
+
+def retire_consumed(manifest, step, paths):
+    # step has read its inputs: delete or compress the intermediates of the stage that produced them
+    producer = PRODUCER.get(step)
+    if producer and INTERMEDIATES != "keep":
+        for path in intermediate_files(producer, paths):
+            manifest.retire(producer, path, artifacts.retire(path, INTERMEDIATES))
+
+
+def restore_inputs(manifest, step):
+    # A stage rerun on compressed inputs gets them decompressed back into place
+    producer = PRODUCER.get(step)
+    for path, copy in (manifest.retired(producer) if producer else {}).items():
+        if copy and os.path.exists(copy):
+            artifacts.restore(path)
+            manifest.unretire(producer, path)
+
+
+def stage_done(manifest, keys, step):
+    # A stage whose intermediates were deleted only counts as complete while the stage
+    # that consumed them is, otherwise rerunning the consumer would need them again
+    if not manifest.done(step, keys[step]):
+        return False
+    if None in manifest.retired(step).values():
+        return step in CONSUMER and stage_done(manifest, keys, CONSUMER[step])
+    return True
+
+
+def run_step(step, base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval):
+    """
+    One of Steps 2-4 ("simulate", "convert", "energy", or "piped" for all three) for one
+    chunk and tREFI setting, raising on failure. Also the scheduler's unit of work.
+    Completion is recorded in the job's manifest; with RESUME a stage whose inputs are
+    unchanged and whose outputs are intact is skipped (returns scheduler.CACHED).
+    Once a stage has read its inputs they are retired according to INTERMEDIATES.
+    """
+    paths = job_paths(trace_name, chunk_tag, interval)
+    config = render_config(base_config, paths, chunk_trace, tREFI)
+    manifest = Manifest(paths["manifest"])
+    keys = stage_keys(manifest, config, chunk_trace)
+    key = keys[step]
+    tags = {"trace": trace_name, "chunk": chunk_tag, "interval": interval, "tREFI": tREFI}
+    if RESUME and stage_done(manifest, keys, step):
+        print(f"Resume: {step} already complete ({chunk_tag}, {interval}ms)")
+        return CACHED
+    later = {"simulate": ["convert", "energy", "piped"], "convert": ["energy", "piped"], "energy": ["piped"],
+             "piped": ["simulate", "convert", "energy"]}[step]
+    manifest.start(step, later)
+    restore_inputs(manifest, step)
+
+    t0 = time.time()
+    config_file = write_job_config(config, paths, chunk_tag, interval)
+    try:
+        if step == "simulate":
+            # Ramulator2 writes under temp names that are renamed only after it succeeds
+            tmp_trace = tmp_path(paths["ramulator_trace_output"])
+            with open(config_file, "w") as f:
+                yaml.dump(render_config(base_config, {**paths, "ramulator_trace_output": tmp_trace}, chunk_trace, tREFI), f)
+            try:
+                with atomic_write(paths["ramulator_report_output"]) as output_file:
+                    subprocess.run(runlog.wrap([ramulator_bin, "-f", config_file], "ramulator2", **tags),
+                                   check=True, stdout=output_file, stderr=output_file)
+                for _, old in channel_files(paths["ramulator_trace_output"]):
+                    os.remove(old)
+                for ch, path in channel_files(tmp_trace):
+                    os.replace(path, f"{paths['ramulator_trace_output']}.ch{ch}")
+            finally:
+                for _, path in channel_files(tmp_trace):
+                    os.remove(path)
+        elif step == "convert":
+            if not channel_files(paths["ramulator_trace_output"]):
+                raise FileNotFoundError(f"{paths['ramulator_trace_output']}.chN not found")
+            env = os.environ.copy()
+            env["PYTHONPATH"] = "/home/eevee/Documents/team_teh_tarik/trace_file/:" + env.get("PYTHONPATH", "")
+            subprocess.run(runlog.wrap(
+                ["python3", ram2drampower_script, paths["ramulator_trace_output"], paths["drampower_trace_input"],
+                 "--channels", "--config", config_file], "ram2drampower", **tags),
+                check=True, env=env
+            )
+        elif step == "energy":
+            run_energy_channels(paths["drampower_trace_input"], paths["drampower_report_output"], tags)
+        else:
+            n_channels = config["MemorySystem"]["DRAM"].get("org", {}).get("channel", 1)
+            run_stages_piped(config_file, n_channels, paths["ramulator_report_output"], paths["ramulator_trace_output"],
+                             paths["drampower_trace_input"], paths["drampower_report_output"], tags)
+    finally:
+        os.remove(config_file)
+    manifest.record(step, key, stage_outputs(step, paths), time.time() - t0)
+    retire_consumed(manifest, step, paths)
+    return paths
+
+
+def run_config(base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval):
+    # Steps 2-4 for one chunk under one tREFI setting
+    job = (base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval)
+    paths = job_paths(trace_name, chunk_tag, interval)
+
+    if PIPE_STAGES and DO_RAMU2_SIM and DO_DRAMPOWER_CONV and DO_DRAMPOWER_CLI:
+        print(f"\n--- Steps 2-4: Simulation -> DRAMPower conversion -> Energy through pipes ({chunk_tag}, {interval}ms) ---")
+        print(f"Fetching trace file: {chunk_trace}")
+        try:
+            run_step("piped", *job)
         except Exception as e:
-            print(f"Step 1 failed: {e}")
-            exit(1)
+            print(f"Steps 2-4 failed: {e}")
+            return False
+        return True
 
-        chunk_files = sorted(glob.glob(f"{chunk_dir}/{trace_name}_chunk_*.trace"))
+    # --- Step 2: Running Simulation ---
+    if DO_RAMU2_SIM:
+        print(f"\n--- Step 2: Running Simulation ({chunk_tag}, {interval}ms) ---")
+        print(f"Fetching trace file: {chunk_trace}")
+        try:
+            run_step("simulate", *job)
+        except Exception as e:
+            print(f"Step 2 failed: {e}")
+            return False
+
+    # --- Step 3: Convert to DRAMPower ---
+    if DO_DRAMPOWER_CONV:
+        print(f"\n--- Step 3: Converting to DRAMPower format ---")
+        print(f"Converting trace files: {paths['ramulator_trace_output']}.chN")
+        try:
+            run_step("convert", *job)
+            print(f"DRAMPower trace saved: {paths['drampower_trace_input']}")
+        except Exception as e:
+            print(f"Step 3 failed: {e}")
+
+    # --- Step 4: Run DRAMPower CLI (or the in-process energy model) ---
+    if DO_DRAMPOWER_CLI:
+        backend = "energy_model.py" if ENERGY_BACKEND == "model" else "DRAMPower"
+        print(f"\n--- Step 4: Calculating Energy with {backend} ---")
+        try:
+            run_step("energy", *job)
+            print(f"Report saved: {paths['drampower_report_output']}")
+        except Exception as e:
+            print(f"Step 4 failed: {e}")
+    return True
+
+
+def run_config_from_fifo(base_config, trace_name, fifo, chunk_tag, tREFI, interval):
+    try:
+        run_config(base_config, trace_name, fifo, chunk_tag, tREFI, interval)
+    finally:
+        # dpc2ram unlinks each FIFO once Ramulator2 has opened it. If it is still
+        # there the simulator never started, so drain it to keep the converter moving.
+        try:
+            with open(fifo, "rb") as f:
+                while f.read(1024 * 1024):
+                    pass
+        except FileNotFoundError:
+            pass
+
+
+def stream_pipeline(base_config, input_xz_trace, trace_name, depth):
+    # Step 1 feeds named pipes that Ramulator2 reads directly: conversion of chunk N+1
+    # overlaps the simulations of chunk N and no .trace file is written.
+    # `depth` bounds how many chunks are simulated at once.
+    fifo_dir = os.path.join(chunk_root, trace_name + "_fifos")
+    suffixes = [f"{interval}ms" for interval in interval_list]
+
+    print("--- Step 1: Streaming DPC trace through named pipes ---")
+    conv = subprocess.Popen(runlog.wrap([
+        "python3",
+        dpc2ram_script,
+        input_xz_trace,
+        "--out-dir", fifo_dir,
+        "--trace-name", trace_name,
+        "--fifo-suffixes", ",".join(suffixes),
+    ] + DPC2RAM_ARGS, "dpc2ram", trace=trace_name, streamed=1), stdout=subprocess.PIPE, text=True)
+
+    jobs = []
+    with ThreadPoolExecutor(max_workers=depth * len(suffixes)) as pool:
+        for line in conv.stdout:
+            if not line.startswith("FIFO "):
+                print(line, end="")
+                continue
+            _, chunk_id, *fifos = line.split()
+            chunk_tag = f"{trace_name}_chunk_{int(chunk_id):03d}"
+            for tREFI, interval, fifo in zip(tREFI_list, interval_list, fifos):
+                jobs.append(pool.submit(run_config_from_fifo, base_config, trace_name, fifo, chunk_tag, tREFI, interval))
+        conv.wait()
+        for job in jobs:
+            job.result()
+
+    if conv.returncode != 0:
+        print(f"Step 1 failed: dpc2ram exited with {conv.returncode}")
+        exit(1)
+    if not jobs:
+        print("No chunks streamed!")
+        exit(1)
+
+
+def convert_simpoints(input_xz_trace, trace_name, chunk_dir, max_chunks=0):
+    # Picks representative chunks (cached in result/<trace>/simpoints.json, which the
+    # analysis scripts read for weights) and converts only those chunks. The selection
+    # is redone when the trace file, CHUNK_LINES or max_chunks no longer match it.
+    simpoints_file = os.path.join(result_dir, trace_name, "simpoints.json")
+    try:
+        with open(simpoints_file) as f:
+            current = is_current(json.load(f), input_xz_trace, CHUNK_LINES, max_chunks)
+    except (OSError, ValueError):
+        current = False
+    if not current:
+        print("--- Step 0: Selecting representative chunks ---")
+        os.makedirs(os.path.dirname(simpoints_file), exist_ok=True)
+        subprocess.run(runlog.wrap([
+            "python3", simpoint_script, input_xz_trace,
+            "--chunk-lines", str(CHUNK_LINES),
+            "--max-chunks", str(max_chunks),
+            "--out", simpoints_file
+        ], "simpoint", trace=trace_name), check=True)
+    with open(simpoints_file) as f:
+        chunk_ids = [p["chunk"] for p in json.load(f)["simpoints"]]
+
+    print(f"--- Step 1: Converting representative chunks {chunk_ids} ---")
+    for chunk_id in chunk_ids:
+        convert_trace(input_xz_trace, trace_name, chunk_dir, DPC2RAM_ARGS + [
+            "--max-chunks", "0",
+            "--start-chunk", str(chunk_id),
+            "--chunks", "1",
+            "--batch"
+        ])
+    return [os.path.join(chunk_dir, f"{trace_name}_chunk_{chunk_id:03d}.trace") for chunk_id in chunk_ids]
+
+
+def trace_paths(dpc_file_name):
+    trace_name = dpc_file_name.split('.')[1]
+    input_xz_trace = os.path.join(WORK_DIR, "trace_files", dpc_file_name)
+    chunk_dir = os.path.join(chunk_root, trace_name + "_chunks")
+    return trace_name, input_xz_trace, chunk_dir
+
+
+def convert_chunks(dpc_file_name, simpoints=False, simpoint_max_chunks=0):
+    # Step 1; returns the chunk traces to simulate
+    trace_name, input_xz_trace, chunk_dir = trace_paths(dpc_file_name)
+    if simpoints:
+        return convert_simpoints(input_xz_trace, trace_name, chunk_dir, simpoint_max_chunks)
+    if DO_CONVERSION:
+        print("--- Step 1: Converting DPC trace ---")
+        convert_trace(input_xz_trace, trace_name, chunk_dir, DPC2RAM_ARGS)
+    return sorted(glob.glob(f"{chunk_dir}/{trace_name}_chunk_*.trace"))
 
+
+_disk_budget = None
+
+def disk_budget_ok():
+    # Scheduler gate of new simulations: False while result/ and the chunk traces exceed DISK_BUDGET_GB
+    global _disk_budget
+    if not DISK_BUDGET_GB:
+        return True
+    if _disk_budget is None:
+        _disk_budget = artifacts.DiskBudget([result_dir, chunk_root], int(DISK_BUDGET_GB * 1024**3))
+    return _disk_budget.allows()
+
+
+def retire_chunk(chunk_trace):
+    # With the trace cache a chunk trace is a link into it that Step 1 recreates on the next
+    # run, so it can go once its simulations are done; without the cache it is the only copy
+    if USE_TRACE_CACHE and INTERMEDIATES != "keep" and os.path.lexists(chunk_trace):
+        os.remove(chunk_trace)
+
+
+def job_nodes(name, job):
+    # Steps 2 -> 3 -> 4 of one (chunk, tREFI) job as scheduler nodes named <name>/<step>
+    if PIPE_STAGES and DO_RAMU2_SIM and DO_DRAMPOWER_CONV and DO_DRAMPOWER_CLI:
+        return [Node(f"{name}/piped", run_step, ("piped",) + job, stage="simulate", priority=1, gate=disk_budget_ok)]
+    nodes, deps = [], ()
+    for priority, (step, enabled) in enumerate([("simulate", DO_RAMU2_SIM), ("convert", DO_DRAMPOWER_CONV),
+                                                ("energy", DO_DRAMPOWER_CLI)], start=1):
+        if enabled:
+            gate = disk_budget_ok if step == "simulate" else None
+            nodes.append(Node(f"{name}/{step}", run_step, (step,) + job, deps, step, priority, gate=gate))
+            deps = (nodes[-1].name,)
+    return nodes
+
+
+def pipeline_nodes(dpc_file_name, base_config, simpoints=False, simpoint_max_chunks=0):
+    """
+    Job graph of one trace for scheduler.run_dag: Step 1, which expands into
+    Steps 2 -> 3 -> 4 for every chunk and tREFI setting. Later steps get a higher
+    priority so started chunks finish (and free their inputs) before new ones start.
+    """
+    trace_name = trace_paths(dpc_file_name)[0]
+
+    def expand(chunk_files):
         if not chunk_files:
-            print("No chunk files generated!")
-            exit(1)
+            print(f"No chunk files generated for {dpc_file_name}!")
+        nodes = []
+        for chunk_trace in chunk_files:
+            chunk_tag = os.path.splitext(os.path.basename(chunk_trace))[0]
+            readers = []
+            for tREFI, interval in zip(tREFI_list, interval_list):
+                job = (base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval)
+                job_steps = job_nodes(f"{dpc_file_name}/{chunk_tag}/{interval}ms", job)
+                readers += job_steps
+                nodes += job_steps
+            # Step 2 reads the chunk trace and every step's manifest key hashes it
+            nodes.append(Node(f"{dpc_file_name}/{chunk_tag}/retire", retire_chunk, (chunk_trace,),
+                              [n.name for n in readers], "retire", priority=4))
+        return nodes
+
+    return [Node(f"{dpc_file_name}/convert", convert_chunks, (dpc_file_name, simpoints, simpoint_max_chunks),
+                 stage="trace", expand=expand)]
+
 
-    # 2. Load the baseline config
+def load_base_config():
     with open(baseline_config_file, 'r') as f:
-        base_config = yaml.safe_load(f)
+        return yaml.safe_load(f)
 
-    # 3. Main Loop
+
+def automate_pipeline(dpc_file_name, stream=False, stream_depth=2, simpoints=False, simpoint_max_chunks=0, jobs=1):
+    trace_name, input_xz_trace, chunk_dir = trace_paths(dpc_file_name)
+
+    # Load the baseline config
+    base_config = load_base_config()
+
+    if stream:
+        stream_pipeline(base_config, input_xz_trace, trace_name, stream_depth)
+        print("\nAll tasks complete!")
+        return
+
+    if jobs > 1:
+        status = run_dag(pipeline_nodes(dpc_file_name, base_config, simpoints, simpoint_max_chunks), jobs)
+        if status.get(f"{dpc_file_name}/convert") != "done":
+            exit(1)
+        print("\nAll tasks complete!")
+        return
+
+    # --- Step 1: Converting DPC2 trace ---
+    try:
+        chunk_files = convert_chunks(dpc_file_name, simpoints, simpoint_max_chunks)
+    except Exception as e:
+        print(f"Step 1 failed: {e}")
+        exit(1)
+
+    if not chunk_files:
+        print("No chunk files generated!")
+        exit(1)
+
+    # Main Loop
     for chunk_trace in chunk_files:
         chunk_tag = os.path.splitext(os.path.basename(chunk_trace))[0]
         for tREFI, interval in zip(tREFI_list, interval_list):
-            base_config["MemorySystem"]["DRAM"]["timing"]["tREFI"] = tREFI
-            output_base = os.path.join(BASE_DIR, "..", "result", trace_name, 
-                f"{trace_name}_{chunk_tag}", 
-                f"{chunk_tag}_{trace_name}_{interval}ms"
-            )
-            if not os.path.exists(output_base):
-                os.makedirs(output_base)
-            ramulator_trace_output = output_base + f"/{trace_name}_{interval}ms_ramulator2_output.txt"
-            drampower_trace_input = output_base + f"/{trace_name}_{interval}ms_drampower_trace_input.csv"
-            drampower_report_output = output_base + f"/{trace_name}_{interval}ms_drampower_report.txt"
-
-            # Update Path in Plugins
-
-            for plugin in base_config["MemorySystem"]["Controller"]["plugins"]:
-                if "ControllerPlugin" in plugin:
-                    plugin["ControllerPlugin"]["path"] = ramulator_trace_output
-
-            base_config["Frontend"]["traces"] = [chunk_trace]
-
-            temp_config_name = f"temp_config_{interval}ms.yaml"
-            with open(temp_config_name, 'w') as f:
-                yaml.dump(base_config, f)
-
-            # --- Step 2: Running Simulation ---
-            if DO_RAMU2_SIM:
-                print(f"\n--- Step 2: Running Simulation ({interval}ms) ---")
-                print(f"Fetching trace file: {ramulator_trace_input}")
-                try:
-                    with open(output_base + f"/{trace_name}_{interval}ms_ramulator2_report.txt", "w") as output_file:
-                        subprocess.run([ramulator_root + "/build/ramulator2", "-f", temp_config_name], check=True, stdout=output_file, stderr=output_file)
-                except Exception as e:
-                    print(f"Step 2 failed: {e}")
-                    continue
-
-            # --- Step 3: Convert to DRAMPower ---
-            if DO_DRAMPOWER_CONV:
-                print(f"\n--- Step 3: Converting to DRAMPower format ---")
-                print(f"Converting trace file: {ramulator_trace_output}.ch0")
-                try:
-                    if os.path.exists(ramulator_trace_output + ".ch0"):
-                        env = os.environ.copy()
-                        env["PYTHONPATH"] = "/home/eevee/Documents/team_teh_tarik/trace_file/:" + env.get("PYTHONPATH", "")
-                        
-                        subprocess.run(
-                            ["python3", ram2drampower_script, ramulator_trace_output + ".ch0", drampower_trace_input], 
-                            check=True, env=env
-                        )
-                        print(f"DRAMPower trace saved: {drampower_trace_input}")
-                    else:
-                        print(f"Error: {ramulator_trace_output} not found.")
-                except Exception as e:
-                    print(f"Step 3 failed: {e}")
-
-            # --- Step 4: Run DRAMPower CLI ---
-            if DO_DRAMPOWER_CLI:
-                print(f"\n--- Step 4: Calculating Energy with DRAMPower ---")
-                try:
-                    result = subprocess.run([
-                        drampower_bin, "-m", dram_spec_json, "-t", drampower_trace_input, "-c", cli_config_json
-                    ], capture_output=True, text=True, check=True)
-                    
-
-                    with open(drampower_report_output, "w") as f_report:
-                        f_report.write(result.stdout)
-                    print(f"Report saved: {drampower_report_output}")
-                except Exception as e:
-                    print(f"Step 4 failed: {e}")
-
-            if os.path.exists(temp_config_name):
-                os.remove(temp_config_name)
+            if not disk_budget_ok():
+                print(f"Warning: over the {DISK_BUDGET_GB} GB disk budget ({_disk_budget.used / 1024**3:.1f} GB used)")
+            run_config(base_config, trace_name, chunk_trace, chunk_tag, tREFI, interval)
+        retire_chunk(chunk_trace)
 
     print("\nAll tasks complete!")
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        automate_pipeline(sys.argv[1])
-    else:
-        print("Usage: python3 automation.py <dpc_trace_file_name.xz>")
+    parser = argparse.ArgumentParser(description="Run the DPC -> Ramulator2 -> DRAMPower pipeline for one trace")
+    parser.add_argument("dpc_trace", help="DPC trace file name (.xz) inside ../trace_files")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream converted chunks to Ramulator2 through named pipes (no .trace files)")
+    parser.add_argument("--stream-depth", type=int, default=2,
+                        help="Chunks simulated concurrently in --stream mode (default=2)")
+    parser.add_argument("--simpoints", action="store_true",
+                        help="Simulate only SimPoint-style representative chunks (see simpoint.py)")
+    parser.add_argument("--simpoint-max-chunks", type=int, default=0,
+                        help="Chunks considered by the phase analysis (0 = whole trace)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always reconvert the DPC trace instead of reusing cached chunks")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip steps whose manifest shows unchanged inputs and intact outputs")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Run chunk x tREFI jobs on this many worker processes (see scheduler.py)")
+    parser.add_argument("--pipe-stages", action="store_true",
+                        help="Run simulation, conversion and energy concurrently through named pipes")
+    parser.add_argument("--energy-backend", choices=["drampower", "model"], default=ENERGY_BACKEND,
+                        help="DRAMPower CLI, or the fast in-process estimate from energy_model.py")
+    parser.add_argument("--intermediates", choices=artifacts.POLICIES, default=INTERMEDIATES,
+                        help="Delete (default), compress or keep command traces and DRAMPower CSVs once consumed")
+    parser.add_argument("--disk-budget-gb", type=float, default=DISK_BUDGET_GB,
+                        help="Hold back new simulations while result/ and the chunk traces use more (0 = no limit)")
+    parser.add_argument("--ramulator2", default=ramulator_bin, help=f"Ramulator2 binary (default: {ramulator_bin})")
+    parser.add_argument("--drampower", default=drampower_bin, help=f"DRAMPower CLI (default: {drampower_bin})")
+    parser.add_argument("--standins", action="store_true",
+                        help="Use standin_ramulator2.py / standin_drampower.py instead of the real tools")
+    args = parser.parse_args()
+    if args.no_cache:
+        USE_TRACE_CACHE = False
+    ENERGY_BACKEND = args.energy_backend
+    RESUME = args.resume
+    INTERMEDIATES = args.intermediates
+    DISK_BUDGET_GB = args.disk_budget_gb
+    if args.pipe_stages:
+        PIPE_STAGES = True
+    ramulator_bin, drampower_bin = args.ramulator2, args.drampower
+    if args.standins:
+        ramulator_bin, drampower_bin = standin_ramulator_bin, standin_drampower_bin
+
+    automate_pipeline(args.dpc_trace, stream=args.stream, stream_depth=args.stream_depth,
+                      simpoints=args.simpoints, simpoint_max_chunks=args.simpoint_max_chunks, jobs=args.jobs)
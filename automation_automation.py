@@ -2,9 +2,33 @@ import subprocess
 import sys
 import os
 import glob
+import argparse
+import runlog   # sets the run id every automation.py process of this batch logs under
 
-def run_batch_simulations():
-    trace_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "trace_files")
+def run_batch_dag(trace_files, jobs, simpoints=False, resume=False, intermediates="delete", disk_budget_gb=0,
+                  standins=False):
+    # One job graph over every trace: chunk x tREFI jobs of all traces share the worker pool
+    import automation
+    from scheduler import run_dag
+    if standins:
+        automation.ramulator_bin = automation.standin_ramulator_bin
+        automation.drampower_bin = automation.standin_drampower_bin
+    automation.RESUME = resume
+    automation.INTERMEDIATES = intermediates
+    automation.DISK_BUDGET_GB = disk_budget_gb
+    base_config = automation.load_base_config()
+    nodes = []
+    for trace in trace_files:
+        nodes += automation.pipeline_nodes(trace, base_config, simpoints)
+    status = run_dag(nodes, jobs)
+    failed = [trace for trace in trace_files if status.get(f"{trace}/convert") != "done"]
+    for trace in failed:
+        print(f"!!! Error occurred while processing {trace} !!!")
+
+def run_batch_simulations(jobs=1, simpoints=False, resume=False, intermediates="delete", disk_budget_gb=0,
+                          standins=False):
+    trace_dir = os.path.join(os.environ.get("PIPELINE_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")),
+                             "trace_files")
     trace_files = [os.path.basename(f) for f in glob.glob(os.path.join(trace_dir, "*.xz"))]
     if not trace_files:
         print(f"No .xz traces found in {trace_dir}!")
@@ -13,11 +37,21 @@ def run_batch_simulations():
     print(f"Starting batch processing of {len(trace_files)} traces...")
     print("-" * 50)
 
+    if jobs > 1:
+        run_batch_dag(trace_files, jobs, simpoints, resume, intermediates, disk_budget_gb, standins)
+        print("-" * 50)
+        print("Batch processing complete!")
+        print(f"Stage timings: python3 runlog.py summary --run {runlog.RUN_ID}")
+        return
+
     for i, trace in enumerate(trace_files, 1):
         print(f"[{i}/{len(trace_files)}] Processing: {trace}")
         
         try:
-            subprocess.run(["python3", "automation.py", trace], check=True)
+            flags = (["--simpoints"] if simpoints else []) + (["--resume"] if resume else []) + \
+                (["--standins"] if standins else []) + \
+                ["--intermediates", intermediates, "--disk-budget-gb", str(disk_budget_gb)]
+            subprocess.run(["python3", "automation.py", trace] + flags, check=True)
             print(f"Successfully finished: {trace}\n")
             
         except subprocess.CalledProcessError as e:
@@ -28,6 +62,20 @@ def run_batch_simulations():
 
     print("-" * 50)
     print("Batch processing complete!")
+    print(f"Stage timings: python3 runlog.py summary --run {runlog.RUN_ID}")
 
 if __name__ == "__main__":
-    run_batch_simulations()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run automation.py over every trace in ../trace_files")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes shared by all traces' jobs (default=1: one trace after another)")
+    parser.add_argument("--simpoints", action="store_true", help="Simulate only representative chunks")
+    parser.add_argument("--resume", action="store_true", help="Skip jobs already completed by an earlier run")
+    parser.add_argument("--intermediates", choices=["delete", "compress", "keep"], default="delete",
+                        help="What happens to command traces and DRAMPower CSVs once consumed")
+    parser.add_argument("--disk-budget-gb", type=float, default=0,
+                        help="Hold back new simulations above this much disk use (0 = no limit)")
+    parser.add_argument("--standins", action="store_true",
+                        help="Use the stand-in simulators instead of Ramulator2 / DRAMPower builds")
+    args = parser.parse_args()
+    run_batch_simulations(args.jobs, args.simpoints, args.resume, args.intermediates, args.disk_budget_gb,
+                          args.standins)
\ No newline at end of file
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import time
+import numpy as np
+from pareto_sweep import ParetoSweep
+
+# Benchmark of pareto_sweep.py on synthetic traces: the nested gamma x trace x config
+# loop test_pareto.py / DRAM_Project used, the broadcast grid() and the exact curve(),
+# checking that all three agree (the curve at every grid gamma that is not a breakpoint).
+
+
+def synthetic_data(n_traces, configs, seed=0):
+    # Longer tREFI: M down by a per-trace factor, SER up with the run time
+    rng = np.random.default_rng(seed)
+    data = {}
+    for t in range(n_traces):
+        m0, gain, ser_slope = rng.uniform(1.0, 2.0), rng.uniform(0.75, 1.05), rng.uniform(0.0, 0.2)
+        data[f"trace_{t}"] = {c: {"M": m0 * gain ** i * 1e-12, "SER": 1e-9 * (1 + ser_slope * i)}
+                              for i, c in enumerate(configs)}
+    return data
+
+def loop_sweep(data, traces, configs, coeffs, baseline, gammas):
+    # The scripts' original loops (without the selections bookkeeping)
+    geomean = lambda v: math.exp(sum(math.log(x) for x in v if x > 0) / len([x for x in v if x > 0]))
+    out = []
+    for gamma in gammas:
+        M_norms, ratios = [], []
+        for t in traces:
+            M_b, SER_b = data[t][baseline]["M"], max(data[t][baseline]["SER"], 1e-30)
+            best = (float("inf"), 0, 0)
+            for cfg in configs:
+                M, ratio = data[t][cfg]["M"], max(data[t][cfg]["SER"], 1e-30) / SER_b
+                score = M * ratio * coeffs[cfg] ** gamma
+                if score < best[0]:
+                    best = (score, M, ratio)
+            M_norms.append(best[1] / M_b)
+            ratios.append(best[2])
+        out.append((1.0 - geomean(M_norms), geomean(ratios)))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Loop vs broadcast vs exact Pareto gamma sweep")
+    ap.add_argument("--traces", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--configs", type=int, default=3, help="tREFI settings (32ms, 48ms, ... in 16 ms steps)")
+    ap.add_argument("--gammas", type=int, default=6, help="Grid points over [0.1, 0.225]")
+    args = ap.parse_args()
+
+    configs = [f"{32 + 16 * i}ms" for i in range(args.configs)]
+    coeffs = {c: (1 + 16 * i / 32) ** 2 for i, c in enumerate(configs)}   # ~ the retention error ratios
+    gammas = np.linspace(0.1, 0.225, args.gammas)
+    print(f"{len(configs)} configs, {len(gammas)} grid gammas")
+    print(f"{'traces':>8}{'loop ms':>10}{'grid ms':>10}{'curve ms':>10}{'segments':>10}{'speedup':>9}")
+    for n in args.traces:
+        data = synthetic_data(n, configs)
+        traces = sorted(data)
+        t0 = time.perf_counter()
+        ref = loop_sweep(data, traces, configs, coeffs, configs[0], gammas)
+        t1 = time.perf_counter()
+        sweep = ParetoSweep(data, traces, configs, coeffs, configs[0])
+        grid = sweep.grid(gammas)
+        t2 = time.perf_counter()
+        curve = sweep.curve(gammas[0], gammas[-1])
+        t3 = time.perf_counter()
+
+        for (m_impr, rel), r in zip(ref, grid):
+            assert np.isclose(m_impr, r["M_impr"], atol=1e-9) and np.isclose(rel, r["rel_deg_gm"], rtol=1e-9)
+        for g, r in zip(gammas, grid):
+            k = np.searchsorted(curve["hi"], g)
+            if curve["lo"][k] < g < curve["hi"][k]:
+                assert np.isclose(curve["M_impr"][k], r["M_impr"], atol=1e-9)
+        print(f"{n:>8}{(t1 - t0) * 1e3:>10.1f}{(t2 - t1) * 1e3:>10.1f}{(t3 - t2) * 1e3:>10.1f}"
+              f"{len(curve['lo']):>10}{(t1 - t0) / (t2 - t1):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+# Orchestration benchmark of automation.py on the stand-in simulators
+# (standin_ramulator2.py / standin_drampower.py) in a throwaway PIPELINE_ROOT, so it
+# runs anywhere numpy and PyYAML are installed. Measures the scheduler's per-node
+# overhead, the parallel scaling of the chunk x tREFI job graph and what --resume
+# reruns. The stand-ins' synthetic delay (--delay) stands for simulator run time.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_FILE = "600.bench_s.xz"
+
+
+def write_dpc_trace(path, n_records, seed=0):
+    # Synthetic DPC trace: ~30% loads, ~10% stores, half of them streaming through rows
+    from dpc2ram import RECORD_DTYPE
+    rng = np.random.default_rng(seed)
+    recs = np.zeros(n_records, dtype=RECORD_DTYPE)
+    recs["ip"] = 0x400000 + 4 * np.arange(n_records, dtype=np.uint64)
+    stream = (1 << 30) + 64 * np.arange(n_records, dtype=np.uint64)
+    scatter = rng.integers(0, 1 << 34, n_records, dtype=np.uint64) & ~np.uint64(63)
+    addr = np.where(rng.random(n_records) < 0.5, stream, scatter)
+    recs["src_mem"][:, 0] = np.where(rng.random(n_records) < 0.3, addr, 0)
+    recs["dst_mem"][:, 0] = np.where(rng.random(n_records) < 0.1, addr ^ np.uint64(1 << 20), 0)
+    with lzma.open(path, "wb", preset=0) as f:
+        f.write(recs.tobytes())
+
+def noop(i):
+    return i
+
+@contextmanager
+def quiet(enabled=True):
+    # Silences the pipeline's progress output, including that of forked workers and tools
+    if not enabled:
+        yield
+        return
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, copy in zip((1, 2), saved):
+            os.dup2(copy, fd)
+            os.close(copy)
+        os.close(devnull)
+
+
+def bench_scheduler(jobs_list, n_nodes, verbose):
+    # Wall time per no-op node: 4 independent chains of n_nodes / 4
+    from scheduler import Node, run_dag
+    rows = []
+    for jobs in jobs_list:
+        nodes = [Node(f"c{i % 4}/{i}", noop, (i,), [f"c{i % 4}/{i - 4}"] if i >= 4 else [], "noop")
+                 for i in range(n_nodes)]
+        t0 = time.perf_counter()
+        with quiet(not verbose):
+            status = run_dag(nodes, jobs)
+        wall = time.perf_counter() - t0
+        assert all(s == "done" for s in status.values())
+        rows.append({"jobs": jobs, "nodes": n_nodes, "wall_s": wall, "ms_per_node": wall / n_nodes * 1000})
+    return rows
+
+def run_pipeline(automation, runlog, jobs, run_id, verbose):
+    # One run of the trace's job graph under its own run id; returns (wall, stage counts, status)
+    from scheduler import run_dag
+    os.environ["PIPELINE_RUN_ID"] = runlog.RUN_ID = run_id
+    nodes = automation.pipeline_nodes(TRACE_FILE, automation.load_base_config())
+    t0 = time.perf_counter()
+    with quiet(not verbose):
+        status = run_dag(nodes, jobs)
+    wall = time.perf_counter() - t0
+    records = runlog.load(runlog.LOG_PATH, run_id) if os.path.exists(runlog.LOG_PATH) else []
+    stages = Counter(r["stage"] for r in records)
+    failed = [name for name, s in status.items() if s != "done"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} nodes did not finish, e.g. {failed[0]}")
+    return wall, dict(stages), status
+
+def bench_scaling(automation, runlog, jobs_list, verbose):
+    rows = []
+    for jobs in jobs_list:
+        # Fresh results each time; the trace cache keeps Step 1 a cache hit after the first run
+        for path in (automation.result_dir, automation.chunk_root):
+            shutil.rmtree(path, ignore_errors=True)
+        wall, stages, status = run_pipeline(automation, runlog, jobs, f"bench-scaling-{jobs}", verbose)
+        rows.append({"jobs": jobs, "wall_s": wall, "nodes": len(status),
+                     "simulations": stages.get("ramulator2", 0), "stages": stages})
+    base = rows[0]["wall_s"] * rows[0]["jobs"]
+    for row in rows:
+        row["speedup"] = base / row["wall_s"]
+        row["efficiency"] = row["speedup"] / row["jobs"]
+    return rows
+
+def bench_resume(automation, runlog, jobs, verbose):
+    # Rerun of a finished graph, then after losing one job's energy report
+    automation.RESUME = True
+    rows = []
+    wall, stages, _ = run_pipeline(automation, runlog, jobs, "bench-resume-complete", verbose)
+    rows.append({"case": "all complete", "wall_s": wall, "stages": stages})
+    reports = sorted(os.path.join(root, f) for root, _, files in os.walk(automation.result_dir)
+                     for f in files if f.endswith("drampower_report.txt"))
+    os.remove(reports[0])
+    wall, stages, _ = run_pipeline(automation, runlog, jobs, "bench-resume-one-lost", verbose)
+    rows.append({"case": "one report lost", "wall_s": wall, "stages": stages})
+    automation.RESUME = False
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scheduler / scaling / resume benchmark of the pipeline on stand-in tools")
+    ap.add_argument("--chunks", type=int, default=4, help="Chunks of the synthetic trace (x3 tREFI settings)")
+    ap.add_argument("--chunk-lines", type=int, default=20000, help="Memory requests per chunk")
+    ap.add_argument("--delay", type=float, default=0.5, help="Synthetic delay per stand-in run, seconds")
+    ap.add_argument("--busy", action="store_true", help="Busy-wait the delay (CPU-bound) instead of sleeping")
+    ap.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    ap.add_argument("--noop-nodes", type=int, default=400, help="Nodes of the scheduler overhead graph")
+    ap.add_argument("--energy-backend", choices=["drampower", "model"], default="drampower")
+    ap.add_argument("--pipe-stages", action="store_true", help="Benchmark the --pipe-stages mode")
+    ap.add_argument("--root", help="Workspace to use (default: a temporary directory, removed afterwards)")
+    ap.add_argument("--json", help="Also write the results to this file")
+    ap.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = ap.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(os.path.join(root, "trace_files"), exist_ok=True)
+    # Read by automation.py / runlog.py at import and inherited by the stand-ins
+    os.environ.update({
+        "PIPELINE_ROOT": root,
+        "PIPELINE_RUN_LOG": os.path.join(root, "result", "run_log.jsonl"),
+        "RAMULATOR2_BIN": os.path.join(BASE_DIR, "standin_ramulator2.py"),
+        "DRAMPOWER_BIN": os.path.join(BASE_DIR, "standin_drampower.py"),
+        "STANDIN_DELAY": str(args.delay),
+        "STANDIN_BUSY": "1" if args.busy else "0",
+    })
+    import automation
+    import runlog
+
+    automation.baseline_config_file = os.path.join(BASE_DIR, "automation.yaml")
+    automation.ENERGY_BACKEND = args.energy_backend
+    automation.PIPE_STAGES = args.pipe_stages
+    automation.CHUNK_LINES = args.chunk_lines
+    automation.DPC2RAM_ARGS = ["--chunk-lines", str(args.chunk_lines), "--inst-limit", "0", "--line-limit", "0",
+                               "--shift", "0", "--max-chunks", str(args.chunks)]
+    try:
+        # ~0.4 memory requests per record, plus a margin so the last chunk is full
+        write_dpc_trace(os.path.join(root, "trace_files", TRACE_FILE), int(args.chunks * args.chunk_lines / 0.4 * 1.05))
+        print(f"Workspace: {root}  ({args.chunks} chunks x {len(automation.tREFI_list)} tREFI, "
+              f"{args.chunk_lines} requests/chunk, {args.delay}s {'busy' if args.busy else 'sleep'} delay, "
+              f"{os.cpu_count()} CPUs)")
+
+        results = {"config": vars(args)}
+        results["scheduler"] = bench_scheduler(args.jobs, args.noop_nodes, args.verbose)
+        print(f"\nScheduler overhead ({args.noop_nodes} no-op nodes)")
+        print(f"{'jobs':>6}{'wall s':>10}{'ms/node':>10}")
+        for r in results["scheduler"]:
+            print(f"{r['jobs']:>6}{r['wall_s']:>10.2f}{r['ms_per_node']:>10.2f}")
+
+        results["scaling"] = bench_scaling(automation, runlog, args.jobs, args.verbose)
+        print("\nParallel scaling (whole job graph, fresh results)")
+        print(f"{'jobs':>6}{'nodes':>7}{'sims':>6}{'wall s':>10}{'speedup':>9}{'eff':>7}")
+        for r in results["scaling"]:
+            print(f"{r['jobs']:>6}{r['nodes']:>7}{r['simulations']:>6}{r['wall_s']:>10.2f}"
+                  f"{r['speedup']:>9.2f}{r['efficiency']:>7.0%}")
+
+        results["resume"] = bench_resume(automation, runlog, max(args.jobs), args.verbose)
+        print(f"\nResume ({max(args.jobs)} workers)")
+        for r in results["resume"]:
+            stages = ", ".join(f"{k} {v}" for k, v in sorted(r["stages"].items())) or "nothing rerun"
+            print(f"  {r['case']:<16}{r['wall_s']:>8.2f}s  {stages}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nSaved: {args.json}")
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+from results_store import ResultsStore, parse_stats, report_columns, DB_NAME, REPORT_KEYS
+
+# Micro-benchmark of report parsing in results_store.py (the full single-pass
+# tokenizer and the keyed lookup the store uses) against one regex search per
+# statistic (the approach graph_v4.py / test_pareto.py used), on a report with all
+# keys and one without the llc_* keys (older Ramulator2 builds), where every
+# alternation of the baseline scans the whole text. Then whole-directory indexing
+# on one process vs a process pool.
+REGEX_BASELINE = {
+    "lat_cycles":    re.compile(r"avg_read_latency_0:\s*([\d\.]+)"),
+    "cycles":        re.compile(r"memory_system_cycles:\s*([\d\.]+)"),
+    "reads":         re.compile(r"num_read_reqs_0:\s*([\d\.]+)|number_of_read_requests:\s*([\d\.]+)"),
+    "writes":        re.compile(r"num_write_reqs_0:\s*([\d\.]+)|number_of_write_requests:\s*([\d\.]+)"),
+    "row_hits":      re.compile(r"row_hits_0:\s*([\d\.]+)|row_hits:\s*([\d\.]+)"),
+    "row_misses":    re.compile(r"row_misses_0:\s*([\d\.]+)|row_misses:\s*([\d\.]+)"),
+    "row_conflicts": re.compile(r"row_conflicts_0:\s*([\d\.]+)|row_conflicts:\s*([\d\.]+)"),
+    "llc_misses":    re.compile(r"llc_read_misses:\s*([\d\.]+)|cache_read_misses:\s*([\d\.]+)"),
+    "llc_access":    re.compile(r"llc_read_access:\s*([\d\.]+)|cache_read_access:\s*([\d\.]+)"),
+}
+
+
+def safe_float(regex, text):
+    m = regex.search(text)
+    if not m:
+        return 0.0
+    return next((float(g) for g in m.groups() if g is not None), 0.0)
+
+def tokenized_columns(stats):
+    return {col: float(next((stats[k] for k in keys if k in stats), 0.0)) for col, keys in REPORT_KEYS.items()}
+
+def synthetic_report(channels=2, extra_stats=60, seed=1, llc=True):
+    # Ramulator2-style YAML statistics: frontend, memory system and per-controller blocks
+    lines = ["Frontend:", "  impl: SimpleO3", f"  num_expected_insts: {200000 + seed}"]
+    if llc:
+        lines += ["  llc_read_access: 812345", "  llc_read_misses: 301234"]
+    lines += ["MemorySystem:", "  impl: GenericDRAM", f"  memory_system_cycles: {3992046 + seed}", "  Controller:"]
+    for ch in range(channels):
+        lines += [f"    - impl: Generic", f"      id: Channel {ch}",
+                  f"      avg_read_latency_{ch}: {556.834579 + ch + seed / 1000}",
+                  f"      num_read_reqs_{ch}: {176000 + ch}", f"      num_write_reqs_{ch}: {52000 + ch}",
+                  f"      row_hits_{ch}: {11876 + ch}", f"      row_misses_{ch}: {32701 + ch}",
+                  f"      row_conflicts_{ch}: {184937 + ch}"]
+        lines += [f"      stat_{k}_{ch}: {k * 17.25}" for k in range(extra_stats)]
+    return "\n".join(lines) + "\n"
+
+def time_it(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+def write_tree(root, n_dirs):
+    # n_dirs run directories shaped like result/<trace>/<trace>_<chunk>/<chunk>_<trace>_<cfg>
+    for i in range(n_dirs):
+        chunk = f"bench_s_chunk_{i // 3 + 1:03d}"
+        cfg = ["32ms", "48ms", "64ms"][i % 3]
+        path = os.path.join(root, "bench_s", f"bench_s_{chunk}", f"{chunk}_bench_s_{cfg}")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f"bench_s_{cfg}_ramulator2_report.txt"), "w") as f:
+            f.write(synthetic_report(seed=i))
+        with open(os.path.join(path, f"bench_s_{cfg}_drampower_report.txt"), "w") as f:
+            f.write(f"ACT energy: 1.2e-04\nRD energy: 3.4e-04\nTotal Energy -> {5.8e-4 + i * 1e-9:.9e}\n")
+        with open(os.path.join(path, f"bench_s_{cfg}_drampower_trace_input.stats.json"), "w") as f:
+            f.write('{"commands": {"REFab": %d}}' % (1000 + i))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Report parsing micro-benchmark (tokenizer vs per-statistic regexes)")
+    ap.add_argument("--channels", type=int, default=2, help="Controllers in the synthetic report")
+    ap.add_argument("--extra-stats", type=int, default=60, help="Other statistics per controller")
+    ap.add_argument("--repeat", type=int, default=2000, help="Parses per timing")
+    ap.add_argument("--dirs", type=int, default=600, help="Run directories for the indexing benchmark")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processes of the parallel indexing run")
+    args = ap.parse_args()
+
+    parsers = [
+        ("regex per statistic", lambda text: {k: safe_float(regex, text) for k, regex in REGEX_BASELINE.items()}),
+        ("single-pass tokenizer", lambda text: tokenized_columns(parse_stats(text))),
+        ("keyed lookup (store)", report_columns),
+    ]
+    for llc in (True, False):
+        text = synthetic_report(args.channels, args.extra_stats, llc=llc)
+        results = [parse(text) for _, parse in parsers]
+        assert all(r == results[0] for r in results), results
+        print(f"\nReport {'with' if llc else 'without'} llc_* keys: {len(text.splitlines())} lines, "
+              f"{len(text)} bytes, {len(parse_stats(text))} statistics")
+        print(f"{'parser':<28}{'us/report':>12}{'speedup':>9}")
+        t_base = None
+        for label, parse in parsers:
+            t = time_it(lambda: parse(text), args.repeat)
+            t_base = t_base or t
+            print(f"{label:<28}{t * 1e6:>12.1f}{t_base / t:>9.2f}")
+
+    root = tempfile.mkdtemp(prefix="bench_report_parse_")
+    try:
+        write_tree(root, args.dirs)
+        print(f"\nIndexing {args.dirs} run directories")
+        print(f"{'':<28}{'wall s':>12}{'dirs/s':>9}")
+        for label, jobs in [("1 process", 1), (f"{args.jobs} processes", args.jobs)]:
+            if os.path.exists(os.path.join(root, DB_NAME)):
+                os.remove(os.path.join(root, DB_NAME))
+            store = ResultsStore(root)
+            t0 = time.perf_counter()
+            counts = store.update(jobs=jobs)
+            wall = time.perf_counter() - t0
+            store.close()
+            assert counts["parsed"] == args.dirs, counts
+            print(f"{label:<28}{wall:>12.2f}{args.dirs / wall:>9.0f}")
+        store = ResultsStore(root)
+        t0 = time.perf_counter()
+        store.update()
+        print(f"{'unchanged (signatures only)':<28}{time.perf_counter() - t0:>12.2f}")
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
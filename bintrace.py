@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import struct
+import numpy as np
+
+# Packed SimpleO3 trace for "bubble load_addr [wb_addr]" lines.
+# Each line is one 64-bit word: load address in the low addr_bits, the bubble
+# count above it and a has-writeback flag in bit 63. Writeback addresses are
+# stored densely in a second column, with a rank table (writebacks before every
+# RANK_STRIDE-th line) so any line range maps to a slice of both columns.
+MAGIC = b"TTBT"
+VERSION = 1
+HEADER_FMT = "<4s H B B I I Q Q Q H"
+HEADER = struct.Struct(HEADER_FMT)
+"""
+i) magic, version
+ii) address bits, reserved
+iii) chunk id (0 = whole trace), --shift
+iv) --phys-capacity, number of lines, number of writebacks
+v) trace name length (UTF-8 name follows, data starts at the next 64B boundary)
+"""
+DATA_ALIGN = 64
+RANK_STRIDE = 1 << 16
+WB_FLAG = np.uint64(1 << 63)
+WORD = np.dtype("<u8")
+
+
+def _data_offset(name_len: int) -> int:
+    return -(-(HEADER.size + name_len) // DATA_ALIGN) * DATA_ALIGN
+
+
+class BinTraceWriter:
+    """
+    Streams converted lines into a packed trace. Writebacks are spooled to a side
+    file and appended, with the rank table and final header, on close(). Use as a
+    drop-in for the text f_out of dpc2ram: write() takes the
+    (line_bubble, load_addr, wb_addr, has_wb) arrays of decode_batch.
+    """
+
+    def __init__(self, path: str, trace_name: str, chunk_id: int, shift: int, phys_capacity: int):
+        self.addr_bits = max(1, (phys_capacity - 1).bit_length())
+        if self.addr_bits > 47:
+            raise ValueError("phys_capacity too large for the packed trace format (max 2^47)")
+        self.max_bubble = (1 << (63 - self.addr_bits)) - 1
+        self.name = trace_name.encode()
+        self.chunk_id, self.shift, self.phys_capacity = chunk_id, shift, phys_capacity
+        self.n_lines, self.n_wb = 0, 0
+        self.rank = []
+        self.path = path
+        self.f = open(path, "wb", buffering=10 * 1024 * 1024)
+        self.f_wb = open(path + ".wb.tmp", "wb", buffering=10 * 1024 * 1024)
+        self._write_header()
+
+    def _write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, self.addr_bits, 0, self.chunk_id, self.shift,
+                             self.phys_capacity, self.n_lines, self.n_wb, len(self.name)) + self.name
+        self.f.seek(0)
+        self.f.write(header.ljust(_data_offset(len(self.name)), b"\x00"))
+
+    def write(self, columns):
+        line_bubble, load_addr, wb_addr, has_wb = columns
+        n = len(has_wb)
+        if n == 0:
+            return
+        line_bubble = np.asarray(line_bubble, dtype=np.uint64)
+        if line_bubble.max() > self.max_bubble:
+            raise ValueError(f"bubble count above {self.max_bubble} does not fit the packed trace format")
+
+        # Rank entries for every stride boundary that falls inside this block
+        first = -(-self.n_lines // RANK_STRIDE) * RANK_STRIDE
+        if first < self.n_lines + n:
+            wb_before = np.concatenate(([0], np.cumsum(has_wb)))
+            for line in range(first, self.n_lines + n, RANK_STRIDE):
+                self.rank.append(self.n_wb + int(wb_before[line - self.n_lines]))
+
+        words = np.array(load_addr, dtype=np.uint64)
+        words |= line_bubble << np.uint64(self.addr_bits)
+        words[has_wb] |= WB_FLAG
+        self.f.write(words.astype(WORD, copy=False).tobytes())
+        wb = np.asarray(wb_addr, dtype=np.uint64)[has_wb]
+        self.f_wb.write(wb.astype(WORD, copy=False).tobytes())
+        self.n_lines += n
+        self.n_wb += len(wb)
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f_wb.close()
+        with open(self.path + ".wb.tmp", "rb") as f_wb:
+            while True:
+                buf = f_wb.read(16 * 1024 * 1024)
+                if not buf:
+                    break
+                self.f.write(buf)
+        os.remove(self.path + ".wb.tmp")
+        self.f.write(np.asarray(self.rank, dtype=WORD).tobytes())
+        self._write_header()
+        self.f.close()
+
+
+class BinTrace:
+    """
+    Memory-mapped packed trace. Line ranges map to zero-copy views of the word and
+    writeback columns; only the bit-field decode allocates.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+            (magic, version, self.addr_bits, _, self.chunk_id, self.shift,
+             self.phys_capacity, self.n_lines, self.n_wb, name_len) = HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a packed trace (v{VERSION})")
+            self.trace_name = f.read(name_len).decode()
+        self.path = path
+        n_rank = -(-self.n_lines // RANK_STRIDE)
+        if self.n_lines:
+            mm = np.memmap(path, dtype=WORD, mode="r", offset=_data_offset(name_len),
+                           shape=(self.n_lines + self.n_wb + n_rank,))
+        else:
+            mm = np.zeros(0, dtype=WORD)
+        self.words = mm[:self.n_lines]
+        self.wb = mm[self.n_lines:self.n_lines + self.n_wb]
+        self.rank = mm[self.n_lines + self.n_wb:]
+        self.addr_mask = np.uint64((1 << self.addr_bits) - 1)
+        self.bubble_mask = np.uint64((1 << (63 - self.addr_bits)) - 1)
+
+    def __len__(self):
+        return self.n_lines
+
+    def n_chunks(self, chunk_lines: int) -> int:
+        return -(-self.n_lines // chunk_lines)
+
+    def wb_rank(self, line: int) -> int:
+        # Number of writebacks stored before `line`
+        base = (line // RANK_STRIDE) * RANK_STRIDE
+        if base >= self.n_lines:
+            return self.n_wb
+        return int(self.rank[line // RANK_STRIDE]) + int(np.count_nonzero(self.words[base:line] & WB_FLAG))
+
+    def slice(self, start: int, stop: int):
+        """
+        Zero-copy (words, wb) views for lines [start, stop).
+        """
+        stop = min(stop, self.n_lines)
+        return self.words[start:stop], self.wb[self.wb_rank(start):self.wb_rank(stop)]
+
+    def chunk(self, chunk_id: int, chunk_lines: int):
+        # 1-based, same numbering as dpc2ram's *_chunk_NNN.trace files
+        start = (chunk_id - 1) * chunk_lines
+        return self.slice(start, start + chunk_lines)
+
+    def decode(self, words: np.ndarray, wb: np.ndarray):
+        # -> (line_bubble, load_addr, wb_addr, has_wb) as produced by dpc2ram.decode_batch
+        has_wb = (words & WB_FLAG) != 0
+        load = words & self.addr_mask
+        bubble = (words >> np.uint64(self.addr_bits)) & self.bubble_mask
+        wb_addr = np.zeros(len(words), dtype=np.uint64)
+        wb_addr[has_wb] = wb
+        return bubble, load, wb_addr, has_wb
+
+    def write_text(self, f_out, start: int = 0, stop: int = None, block_lines: int = 1 << 18):
+        # Ramulator2 SimpleO3 text, byte-identical to dpc2ram's direct output
+        from dpc2ram import format_lines
+        stop = self.n_lines if stop is None else min(stop, self.n_lines)
+        for block in range(start, stop, block_lines):
+            words, wb = self.slice(block, min(block + block_lines, stop))
+            f_out.write(format_lines(*self.decode(words, wb)))
+
+    def stats(self) -> dict:
+        bubble, load, _, _ = self.decode(self.words, self.wb)
+        return {
+            "lines": self.n_lines,
+            "writebacks": self.n_wb,
+            "bubbles": int(bubble.sum(dtype=np.uint64)),
+            "mean_bubble": float(bubble.mean()) if self.n_lines else 0.0,
+            "unique_cachelines": int(np.unique(load >> np.uint64(6)).size),
+            "bytes_per_line": os.path.getsize(self.path) / max(self.n_lines, 1),
+        }
+
+
+def export_chunks(trace: BinTrace, out_dir: str, chunk_lines: int, first: int = 1, count: int = 0, trace_name: str = None):
+    os.makedirs(out_dir, exist_ok=True)
+    name = trace_name or trace.trace_name
+    last = trace.n_chunks(chunk_lines) if chunk_lines else 1
+    if count:
+        last = min(last, first + count - 1)
+    for chunk_id in range(first, last + 1):
+        start = (chunk_id - 1) * chunk_lines
+        stop = start + chunk_lines if chunk_lines else trace.n_lines
+        path = os.path.join(out_dir, f"{name}_chunk_{chunk_id:03d}.trace")
+        with open(path, "w", buffering=10 * 1024 * 1024) as f_out:
+            trace.write_text(f_out, start, stop)
+        print(f"Wrote {path} ({min(stop, trace.n_lines) - start:,} lines)")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or export packed SimpleO3 traces written by dpc2ram.py --out-bin")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_info = sub.add_parser("info", help="Print header and trace statistics")
+    p_info.add_argument("input", help="Packed trace (.bin)")
+
+    p_export = sub.add_parser("export", help="Write Ramulator2 text traces")
+    p_export.add_argument("input", help="Packed trace (.bin)")
+    p_export.add_argument("--out", help="Single output trace file")
+    p_export.add_argument("--out-dir", help="Directory for chunked output traces")
+    p_export.add_argument("--chunk-lines", type=int, default=0, help="Lines per chunk (0 = no chunking)")
+    p_export.add_argument("--start-chunk", type=int, default=1, help="First chunk to export")
+    p_export.add_argument("--chunks", type=int, default=0, help="Number of chunks to export (0 = all)")
+    p_export.add_argument("--trace-name", type=str, default=None, help="Base name for chunk files (default from header)")
+    args = ap.parse_args()
+
+    trace = BinTrace(args.input)
+    if args.cmd == "info":
+        print(f"Trace:          {trace.trace_name} (chunk {trace.chunk_id})")
+        print(f"Shift:          {trace.shift}")
+        print(f"Phys capacity:  {trace.phys_capacity:,}")
+        for k, v in trace.stats().items():
+            print(f"{k + ':':<19} {v:,}" if isinstance(v, int) else f"{k + ':':<19} {v:.3f}")
+    elif args.out:
+        with open(args.out, "w", buffering=10 * 1024 * 1024) as f_out:
+            trace.write_text(f_out)
+        print(f"Output: {args.out}")
+    elif args.out_dir:
+        export_chunks(trace, args.out_dir, args.chunk_lines, args.start_chunk, args.chunks, args.trace_name)
+    else:
+        raise ValueError("Specify either --out or --out-dir")
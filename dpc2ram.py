@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import argparse
 import lzma
+import json
+import math
 import os
 import struct
+import subprocess
+import sys
+import time
+import numpy as np
 from tqdm import tqdm
 from typing import Optional
+from bintrace import BinTraceWriter
+from xz_index import XzBlockReader, list_xz_blocks
 
 # DPC3 record: 64 bytes
 STRUCT_FMT = "<Q B B 2B 4B 2Q 4Q"
@@ -19,8 +27,21 @@ vii) memory sources (4x8B)
 """
 
 RECORD_SIZE = 64
+INDEX_VERSION = 1
 UNPACKER = struct.Struct(STRUCT_FMT)
 
+# Same layout as STRUCT_FMT, for viewing whole blocks of records at once
+RECORD_DTYPE = np.dtype([
+    ("ip", "<u8"),
+    ("is_branch", "u1"),
+    ("taken", "u1"),
+    ("dst_regs", "u1", (2,)),
+    ("src_regs", "u1", (4,)),
+    ("dst_mem", "<u8", (2,)),
+    ("src_mem", "<u8", (4,)),
+])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE == UNPACKER.size
+
 def mask_addr(addr: int, phys_capacity: int) -> int:
     if (phys_capacity & (phys_capacity - 1)) == 0:
         return addr & (phys_capacity - 1)
@@ -30,6 +51,233 @@ def convert_addr(raw: int, phys_capacity: int, shift: int) -> int:
     # shift=6 if raw is cacheline address; shift=0 if raw is already byte address
     return mask_addr(raw << shift, phys_capacity)
 
+def convert_addr_array(raw: np.ndarray, phys_capacity: int, shift: int) -> np.ndarray:
+    # Vectorized convert_addr(); falls back to Python ints whenever uint64
+    # arithmetic could overflow and change the result of a non power-of-two modulo
+    raw = raw.astype(np.uint64, copy=False)
+    if (phys_capacity & (phys_capacity - 1)) == 0 and phys_capacity <= 2**64:
+        return (raw << np.uint64(shift)) & np.uint64(phys_capacity - 1)
+    if shift == 0 and phys_capacity < 2**64:
+        return raw % np.uint64(phys_capacity)
+    return np.array([convert_addr(int(a), phys_capacity, shift) for a in raw.tolist()], dtype=object)
+
+class FifoTee:
+    """
+    Writes a chunk to one named pipe per consumer (e.g. one Ramulator2 run per tREFI).
+    Each FIFO is unlinked once both ends are open, and a consumer that exits early is
+    dropped instead of killing the conversion for the others.
+    """
+
+    def __init__(self, paths):
+        self.sinks = []
+        for path in paths:
+            f = open(path, "w", buffering=1024 * 1024)
+            os.unlink(path)
+            self.sinks.append((path, f))
+
+    def write(self, text: str):
+        for sink in list(self.sinks):
+            try:
+                sink[1].write(text)
+            except BrokenPipeError:
+                print(f"Consumer of {sink[0]} exited early, dropping it", file=sys.stderr)
+                self.sinks.remove(sink)
+
+    def close(self):
+        for path, f in self.sinks:
+            try:
+                f.close()
+            except BrokenPipeError:
+                pass
+        self.sinks = []
+
+def record_line_counts(recs: np.ndarray) -> np.ndarray:
+    # One line per load, or a single read+writeback line for store-only records
+    n_loads = np.count_nonzero(recs["src_mem"], axis=1)
+    has_store = (recs["dst_mem"] != 0).any(axis=1)
+    return np.where(n_loads > 0, n_loads, has_store.astype(n_loads.dtype))
+
+def decode_batch(recs: np.ndarray, bubble: int, phys_capacity: int, shift: int):
+    """
+    Vectorized equivalent of the per-record loop in main() for a block of records.
+    Returns (line_bubble, load_addr, wb_addr, has_wb, line_rec, bubble_out) where
+    line_rec is the index of the record each output line came from and bubble_out
+    is the bubble count still pending after the last record.
+    """
+    src = recs["src_mem"]
+    dst = recs["dst_mem"]
+    src_nz = src != 0
+    n_loads = src_nz.sum(axis=1)
+    has_store = (dst != 0).any(axis=1)
+    first_store = np.where(dst[:, 0] != 0, dst[:, 0], dst[:, 1])
+
+    n_lines = record_line_counts(recs)
+    is_mem = n_lines > 0
+    mem_idx = np.flatnonzero(is_mem)
+
+    # Bubbles = records without memory ops since the previous memory record
+    no_mem = np.cumsum(~is_mem)
+    if mem_idx.size == 0:
+        empty = np.zeros(0, dtype=np.uint64)
+        bubble_out = bubble + (int(no_mem[-1]) if len(recs) else 0)
+        return empty, empty, empty, np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64), bubble_out
+    seen = no_mem[mem_idx]
+    rec_bubble = np.diff(seen, prepend=0).astype(np.uint64)
+    rec_bubble[0] += np.uint64(bubble)
+    bubble_out = int(no_mem[-1] - seen[-1])
+
+    lines_per_rec = n_lines[mem_idx]
+    line_rec = np.repeat(mem_idx, lines_per_rec)
+    total = line_rec.size
+    first_line = np.zeros(total, dtype=bool)
+    first_line[np.cumsum(lines_per_rec) - lines_per_rec] = True
+
+    # np.nonzero walks row-major, so loads come out in record order, s0..s3
+    load_line = np.repeat(n_loads[mem_idx] > 0, lines_per_rec)
+    load_raw = np.empty(total, dtype=np.uint64)
+    load_raw[load_line] = src[src_nz]
+    load_raw[~load_line] = first_store[line_rec[~load_line]]
+
+    has_wb = first_line & has_store[line_rec]
+    line_bubble = np.zeros(total, dtype=np.uint64)
+    line_bubble[first_line] = rec_bubble
+
+    load_addr = convert_addr_array(load_raw, phys_capacity, shift)
+    wb_addr = convert_addr_array(first_store[line_rec], phys_capacity, shift)
+    return line_bubble, load_addr, wb_addr, has_wb, line_rec, bubble_out
+
+def format_lines(line_bubble, load_addr, wb_addr, has_wb) -> str:
+    # Builds "bubble load [wb]\n" lines with one %-format call instead of one f-string per line
+    if len(has_wb) == 0:
+        return ""
+    width = 2 + has_wb.astype(np.int64)
+    ends = np.cumsum(width)
+    flat = np.empty(int(ends[-1]), dtype=object)
+    flat[ends - width] = line_bubble.tolist()
+    flat[ends - width + 1] = load_addr.tolist()
+    flat[(ends - 1)[has_wb]] = np.asarray(wb_addr)[has_wb].tolist()
+    fmt = "".join(np.where(has_wb, "%d %d %d\n", "%d %d\n").tolist())
+    return fmt % tuple(flat.tolist())
+
+def build_record_index(input_xz: str, threads: int = 1, batch_records: int = 1 << 18) -> dict:
+    """
+    One pass over the trace recording, for every xz block, the first record that starts
+    in it plus the output line count and pending bubble at that record. The line layout
+    only depends on which address fields are non-zero, so one index serves every
+    --shift/--phys-capacity/--chunk-lines combination.
+    """
+    blocks = list_xz_blocks(input_xz)
+    for b in blocks:
+        b["first_record"] = -(-b["uoffset"] // RECORD_SIZE)
+        b["skip_bytes"] = b["first_record"] * RECORD_SIZE - b["uoffset"]
+
+    n_seen, total_lines, bubble = 0, 0, 0
+    next_b = 0
+    with XzBlockReader(input_xz, blocks, threads=threads) as f_in:
+        while True:
+            buf = f_in.read(batch_records * RECORD_SIZE)
+            n_recs = len(buf) // RECORD_SIZE
+            if n_recs == 0:
+                break
+            recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=n_recs)
+            n_lines = record_line_counts(recs)
+            csum = np.cumsum(n_lines)
+            mem_idx = np.flatnonzero(n_lines > 0)
+
+            while next_b < len(blocks) and blocks[next_b]["first_record"] < n_seen + n_recs:
+                j = blocks[next_b]["first_record"] - n_seen
+                k = int(np.searchsorted(mem_idx, j))
+                blocks[next_b]["lines_before"] = total_lines + (int(csum[j - 1]) if j else 0)
+                blocks[next_b]["bubble_before"] = j - 1 - int(mem_idx[k - 1]) if k else bubble + j
+                next_b += 1
+
+            total_lines += int(csum[-1])
+            bubble = n_recs - 1 - int(mem_idx[-1]) if mem_idx.size else bubble + n_recs
+            n_seen += n_recs
+
+    # Blocks holding only the tail of the last record
+    for b in blocks[next_b:]:
+        b["lines_before"], b["bubble_before"] = total_lines, bubble
+
+    st = os.stat(input_xz)
+    return {
+        "version": INDEX_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "total_records": n_seen,
+        "total_lines": total_lines,
+        "blocks": blocks,
+    }
+
+def load_record_index(input_xz: str, index_path: Optional[str] = None, threads: int = 1) -> dict:
+    # Reuses <input>.idx.json when it still matches the trace, otherwise rebuilds it
+    index_path = index_path or input_xz + ".idx.json"
+    st = os.stat(input_xz)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        if (index.get("version") == INDEX_VERSION and index.get("size") == st.st_size
+                and index.get("mtime_ns") == st.st_mtime_ns):
+            return index
+
+    print(f"Building record index: {index_path}")
+    index = build_record_index(input_xz, threads)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    if len(index["blocks"]) == 1:
+        print("Note: single xz block, so seeking still decodes from the start "
+              "(recompress with `xz -T0` for a multi-block file)")
+    return index
+
+def locate_line(index: dict, line: int):
+    # Last block whose first record starts at or before output line `line`
+    start = 0
+    for i, b in enumerate(index["blocks"]):
+        if b["lines_before"] <= line and b["first_record"] < max(index["total_records"], 1):
+            start = i
+    return index["blocks"][start], start
+
+def lines_before_record(input_xz: str, index: dict, record: int, threads: int = 1) -> int:
+    # Output lines of the records before `record`, decoding only the xz block it falls in
+    if record >= index["total_records"]:
+        return index["total_lines"]
+    block, start_block = index["blocks"][0], 0
+    for i, b in enumerate(index["blocks"]):
+        if b["first_record"] <= record:
+            block, start_block = b, i
+    n_recs = record - block["first_record"]
+    with XzBlockReader(input_xz, index["blocks"], start_block, block["skip_bytes"], threads) as f_in:
+        buf = f_in.read(n_recs * RECORD_SIZE)
+    recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=len(buf) // RECORD_SIZE)
+    return block["lines_before"] + int(record_line_counts(recs).sum())
+
+def run_parallel_chunks(args, lines_total: int):
+    # Splits the requested chunk range over --jobs independent dpc2ram processes
+    last = math.ceil(lines_total / args.chunk_lines)
+    if args.max_chunks:
+        last = min(last, args.max_chunks)
+    if args.chunks:
+        last = min(last, args.start_chunk + args.chunks - 1)
+    chunk_ids = list(range(args.start_chunk, last + 1))
+    if not chunk_ids:
+        print(f"Nothing to convert: chunk {args.start_chunk} is past the last chunk ({last})")
+        return
+    per_job = math.ceil(len(chunk_ids) / args.jobs)
+
+    procs = []
+    for i in range(0, len(chunk_ids), per_job):
+        part = chunk_ids[i:i + per_job]
+        cmd = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:] + [
+            "--start-chunk", str(part[0]), "--chunks", str(len(part)), "--jobs", "1"]
+        print(f"Launching chunks {part[0]:03d}-{part[-1]:03d}")
+        procs.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL))
+    failed = sum(p.wait() != 0 for p in procs)
+    if failed:
+        raise SystemExit(f"{failed} of {len(procs)} chunk jobs failed")
+    print(f"\nDone. {len(chunk_ids)} chunks written to {args.out_dir} by {len(procs)} jobs")
+
 def main():
     ap = argparse.ArgumentParser(
         description="Convert DPC3 .xz trace to Ramulator2 SimpleO3 Trace format with optional chunking"
@@ -38,6 +286,7 @@ def main():
     ap.add_argument("--max-chunks", type=int, default=50,
                     help="Maximum number of chunks to generate (0 = unlimited)")
     ap.add_argument("--out", help="Single output trace file (disables chunking)")
+    ap.add_argument("--out-bin", help="Single packed binary trace (see bintrace.py; implies --batch, disables chunking)")
     ap.add_argument("--out-dir", help="Directory for chunked output traces")
     ap.add_argument("--chunk-lines", type=int, default=0, help="Lines per chunk (0 = no chunking)")
     ap.add_argument("--inst-limit", type=int, default=0, help="Max instructions to process (0 = unlimited)")
@@ -46,11 +295,33 @@ def main():
                     help="Physical address space in bytes (default 32GB)")
     ap.add_argument("--shift", type=int, default=0, help="Address left shift (0 if byte addr, 6 if cacheline addr)")
     ap.add_argument("--trace-name", type=str, default="trace", help="Base name for chunk files")
+    ap.add_argument("--batch", action="store_true",
+                    help="Decode records in large NumPy blocks instead of one at a time (same output)")
+    ap.add_argument("--batch-records", type=int, default=1 << 18,
+                    help="Records per block in --batch mode (default 262144 = 16MB)")
+    ap.add_argument("--index", action="store_true",
+                    help="Read through the xz block index (built once as <input>.idx.json)")
+    ap.add_argument("--index-path", help="Record index location (default <input>.idx.json)")
+    ap.add_argument("--xz-threads", type=int, default=1,
+                    help="Threads decompressing xz blocks in parallel (implies --index)")
+    ap.add_argument("--start-chunk", type=int, default=1,
+                    help="First chunk to write; earlier chunks are skipped via the index")
+    ap.add_argument("--chunks", type=int, default=0,
+                    help="Number of chunks to write from --start-chunk (0 = up to --max-chunks)")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="Convert the chunk range with this many parallel processes (implies --index)")
+    ap.add_argument("--fifo-suffixes", type=str, default="",
+                    help="Stream each chunk into named pipes <trace>_chunk_NNN_<suffix>.fifo instead of "
+                         "files, one per comma-separated suffix (e.g. 32ms,48ms,64ms)")
     args = ap.parse_args()
 
     if not os.path.exists(args.input_xz):
         raise FileNotFoundError(args.input_xz)
 
+    if args.out_bin:
+        # Packed output is one file per trace; bintrace.py re-slices it into chunks
+        args.out, args.batch = args.out_bin, True
+
     if not args.out and not args.out_dir:
         raise ValueError("Specify either --out or --out-dir")
 
@@ -58,47 +329,178 @@ def main():
     if args.chunk_lines and not args.out_dir and not args.out:
         raise ValueError("Chunking requires --out-dir")
 
+    if (args.start_chunk > 1 or args.chunks or args.jobs > 1) and (args.out or not args.chunk_lines):
+        raise ValueError("--start-chunk/--chunks/--jobs require --out-dir and --chunk-lines")
+
+    if args.fifo_suffixes and (args.out or args.jobs > 1):
+        raise ValueError("--fifo-suffixes requires --out-dir and --jobs 1")
+
     if args.out_dir:
         os.makedirs(args.out_dir, exist_ok=True)
 
+    use_index = args.index or args.xz_threads > 1 or args.start_chunk > 1 or args.jobs > 1
+    index = load_record_index(args.input_xz, args.index_path, args.xz_threads) if use_index else None
+    if index:
+        # Output lines the run can reach, within --inst-limit and --line-limit
+        lines_total = index["total_lines"]
+        if args.inst_limit:
+            lines_total = lines_before_record(args.input_xz, index, args.inst_limit, args.xz_threads)
+        if args.line_limit:
+            lines_total = min(lines_total, args.line_limit)
+    if args.jobs > 1:
+        run_parallel_chunks(args, lines_total)
+        return
+
     bubble = 0
     insts = 0
     lines = 0
-    chunk_id = 1
+    skip_lines = 0
+    chunk_id = args.start_chunk
     lines_in_chunk = 0
     f_out = None
     stop_conversion = False
 
+    start_block, skip_bytes = 0, 0
+    if index:
+        # Resume from the xz block holding the first line of --start-chunk
+        first_line = (args.start_chunk - 1) * args.chunk_lines
+        if first_line >= lines_total:
+            print(f"Nothing to convert: chunk {args.start_chunk} starts at line {first_line:,}, "
+                  f"past the {lines_total:,} lines to convert")
+            return
+        block, start_block = locate_line(index, first_line)
+        skip_bytes = block["skip_bytes"]
+        insts = block["first_record"]
+        lines = block["lines_before"]
+        bubble = block["bubble_before"]
+        skip_lines = first_line - lines
+    insts_start, lines_start = insts, lines + skip_lines
+
     def open_new_chunk() -> bool:
         nonlocal f_out, chunk_id, lines_in_chunk
 
         # Enforce max chunks (0 means unlimited)
         if args.max_chunks and chunk_id > args.max_chunks:
             return False
+        if args.chunks and chunk_id >= args.start_chunk + args.chunks:
+            return False
 
         if f_out:
             f_out.close()
 
-        path = os.path.join(args.out_dir, f"{args.trace_name}_chunk_{chunk_id:03d}.trace")
-        f_out = open(path, "w", buffering=10 * 1024 * 1024)
-        print(f"Opened {path}")
+        if args.fifo_suffixes:
+            # Announce the pipes (the driver starts their readers), then block until all are open
+            fifos = [os.path.join(args.out_dir, f"{args.trace_name}_chunk_{chunk_id:03d}_{s}.fifo")
+                     for s in args.fifo_suffixes.split(",")]
+            for path in fifos:
+                if os.path.exists(path):
+                    os.unlink(path)
+                os.mkfifo(path)
+            print(f"FIFO {chunk_id} {' '.join(fifos)}", flush=True)
+            f_out = FifoTee(fifos)
+        else:
+            path = os.path.join(args.out_dir, f"{args.trace_name}_chunk_{chunk_id:03d}.trace")
+            f_out = open(path, "w", buffering=10 * 1024 * 1024)
+            print(f"Opened {path}")
         lines_in_chunk = 0
         chunk_id += 1
         return True
 
+    def need_chunk() -> bool:
+        # Chunk files are opened on their first line, so a range past the data leaves none behind
+        return not args.out and (f_out is None or (args.chunk_lines and lines_in_chunk >= args.chunk_lines))
+
     # Open first output
-    if args.out:
+    if args.out_bin:
+        f_out = BinTraceWriter(args.out_bin, args.trace_name, 0, args.shift, args.phys_capacity)
+    elif args.out:
         # Single-file mode: ignore chunking
         f_out = open(args.out, "w", buffering=10 * 1024 * 1024)
+    elif args.max_chunks and chunk_id > args.max_chunks:
+        # Chunked mode, nothing left below --max-chunks
+        print(f"Stopped after max_chunks={args.max_chunks}")
+        return
+
+    def write_lines(text_lines, n_lines: int) -> int:
+        """
+        Writes up to n_lines already formatted lines (text_lines(start, stop) -> str),
+        rolling chunks and honouring --line-limit. Returns how many were written.
+        """
+        nonlocal lines, lines_in_chunk, stop_conversion, skip_lines
+        written = 0
+        while written < n_lines and not stop_conversion:
+            if skip_lines:
+                # Lines belonging to chunks before --start-chunk
+                take = min(skip_lines, n_lines - written)
+                skip_lines -= take
+                written += take
+                lines += take
+                if args.line_limit and lines >= args.line_limit:
+                    stop_conversion = True
+                continue
+            if need_chunk():
+                if not open_new_chunk():
+                    stop_conversion = True
+                    break
+            take = n_lines - written
+            if not args.out and args.chunk_lines:
+                take = min(take, args.chunk_lines - lines_in_chunk)
+            if args.line_limit:
+                take = min(take, args.line_limit - lines)
+            f_out.write(text_lines(written, written + take))
+            written += take
+            lines += take
+            lines_in_chunk += take
+            if args.line_limit and lines >= args.line_limit:
+                stop_conversion = True
+        return written
+
+    t_start = time.perf_counter()
+    if index:
+        f_in = XzBlockReader(args.input_xz, index["blocks"], start_block, skip_bytes, args.xz_threads)
     else:
-        # Chunked mode
-        if not open_new_chunk():
-            print(f"Stopped after max_chunks={args.max_chunks}")
-            return
-
-    with lzma.open(args.input_xz, "rb") as f_in:
+        f_in = lzma.open(args.input_xz, "rb")
+    with f_in:
         with tqdm(unit="rec", desc="Converting") as pbar:
-            while True:
+            while args.batch:
+                if stop_conversion:
+                    break
+                want = args.batch_records
+                if args.inst_limit:
+                    want = min(want, args.inst_limit - insts)
+                    if want <= 0:
+                        break
+                if args.line_limit and lines >= args.line_limit:
+                    break
+
+                buf = f_in.read(want * RECORD_SIZE)
+                n_recs = len(buf) // RECORD_SIZE
+                if n_recs == 0:
+                    break
+                recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=n_recs)
+                line_bubble, load_addr, wb_addr, has_wb, line_rec, bubble_next = decode_batch(
+                    recs, bubble, args.phys_capacity, args.shift)
+
+                def block_text(start, stop):
+                    columns = (line_bubble[start:stop], load_addr[start:stop], wb_addr[start:stop], has_wb[start:stop])
+                    return columns if args.out_bin else format_lines(*columns)
+
+                written = write_lines(block_text, len(line_rec))
+                if stop_conversion:
+                    # Count records up to the one that stopped conversion, like the per-record loop:
+                    # the last written line for --line-limit, the first dropped line for --max-chunks
+                    last = written - 1 if args.line_limit and lines >= args.line_limit else written
+                    used = int(line_rec[last]) + 1
+                    insts += used
+                    pbar.update(used)
+                    break
+                insts += n_recs
+                bubble = bubble_next
+                pbar.update(n_recs)
+                if n_recs < want:
+                    break
+
+            while not args.batch:
                 if stop_conversion:
                     break
                 if args.inst_limit and insts >= args.inst_limit:
@@ -133,13 +535,22 @@ def main():
                     continue
 
                 def emit(load_raw: int, wb_raw: Optional[int]):
-                    nonlocal bubble, lines, lines_in_chunk, f_out, stop_conversion
+                    nonlocal bubble, lines, lines_in_chunk, f_out, stop_conversion, skip_lines
 
                     if stop_conversion:
                         return
 
+                    # Lines belonging to chunks before --start-chunk
+                    if skip_lines:
+                        skip_lines -= 1
+                        bubble = 0
+                        lines += 1
+                        if args.line_limit and lines >= args.line_limit:
+                            stop_conversion = True
+                        return
+
                     # If chunking enabled, roll over to next chunk file
-                    if not args.out and args.chunk_lines and lines_in_chunk >= args.chunk_lines:
+                    if need_chunk():
                         if not open_new_chunk():
                             stop_conversion = True
                             return
@@ -181,8 +592,11 @@ def main():
         print(f"Stopped after max_chunks={args.max_chunks}")
 
     print("\nDone.")
-    print(f"Instructions processed: {insts:,}")
-    print(f"Lines written:          {lines:,}")
+    print(f"Instructions processed: {insts - insts_start:,}")
+    print(f"Lines written:          {lines - lines_start:,}")
+    elapsed = time.perf_counter() - t_start
+    rate = (insts - insts_start) / elapsed if elapsed > 0 else 0
+    print(f"Throughput:             {rate:,.0f} rec/s ({elapsed:.2f}s)")
     if args.out:
         print(f"Output:                {args.out}")
     else:
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+from ram2drampower import read_blocks, parse_int_column, command_masks, COMMA, NEWLINE
+from manifest import atomic_write
+from artifacts import open_artifact, EXTENSIONS
+
+# In-process estimate of the DRAMPower core energy from a converted DRAMPower CSV
+# (ts,CMD,rank,bg,bank,row,col[,data]), following the DDR5 core equations of
+# DRAMPower 5: per-command energies on top of rank/bank background residency.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SPEC = os.path.join(BASE_DIR, "ddr5.json")
+ENERGY_RE = re.compile(r"Total Energy ->\s*([\d\.eE\-\+]+)")
+BACKEND_TAG = "Backend: energy_model.py"
+CSV_NAMES = tuple("drampower_trace_input.csv" + ext for ext in ("",) + EXTENSIONS)
+COMMANDS = ["ACT", "PRE", "PREA", "PREsb", "PRESB", "RD", "RDA", "WR", "WRA", "REFA", "REFB", "REFSB", "END"]
+
+
+def parse_csv_block(buf):
+    """
+    Rows with at least 7 fields -> (start, bounds), bounds[j] being the offset of the
+    comma after field j (ts, cmd, rank, bg, bank, row); the data column is ignored.
+    """
+    nl = np.flatnonzero(buf == NEWLINE)
+    starts = np.concatenate(([0], nl[:-1] + 1))
+    commas = np.flatnonzero(buf == COMMA)
+    first = np.searchsorted(commas, starts)
+    keep = np.searchsorted(commas, nl) - first >= 6
+    first = first[keep]
+    return starts[keep], np.stack([commas[first + j] for j in range(6)])
+
+def union_length(rank, start, end, n_ranks):
+    # Per-rank length of the union of [start, end) intervals
+    if rank.size == 0:
+        return np.zeros(n_ranks)
+    span = int(max(end.max(), 1)) + 1
+    s, e = start + rank * span, end + rank * span
+    order = np.argsort(s, kind="stable")
+    s, e, r = s[order], e[order], rank[order]
+    reach = np.maximum.accumulate(e)
+    new = np.concatenate(([True], s[1:] > reach[:-1]))
+    seg_start = s[new]
+    seg_end = np.maximum.reduceat(e, np.flatnonzero(new))
+    return np.bincount(r[new], weights=seg_end - seg_start, minlength=n_ranks)[:n_ranks]
+
+
+class EnergyModel:
+    """
+    Streams a DRAMPower CSV once, counting commands and tracking which banks are
+    open (ACT .. PRE/PREA/PREsb/RDA/WRA) to get per-rank active and precharged
+    background time, then applies the IDD/IPP model of the memspec.
+    """
+
+    def __init__(self, spec_file: str = DEFAULT_SPEC):
+        with open(spec_file) as f:
+            spec = json.load(f)["memspec"]
+        arch, power, timing = spec["memarchitecturespec"], spec["mempowerspec"], spec["memtimingspec"]
+        self.ranks = max(arch["nbrOfRanks"], 1)
+        self.banks = arch["nbrOfBanks"]
+        self.groups = max(arch["nbrOfBankGroups"], 1)
+        self.banks_per_group = self.banks // self.groups
+        self.devices = max(arch["nbrOfDevices"], 1)
+        self.burst = arch["burstLength"] / arch["dataRate"]
+        self.tck = timing["tCK"]
+        self.tRAS, self.tRP = timing["RAS"], timing["RP"]
+        self.tRFC, self.tRFCsb = timing["RFC1"], timing["RFCsb"]
+        self.rho = spec.get("bankwisespec", {}).get("factRho", 1.0)
+        # (voltage, currents, I_beta) for the VDD and VPP domains
+        self.domains = [
+            (power["vdd"], {k[3:]: v for k, v in power.items() if k.startswith("idd")}, power.get("iBeta_vdd", power["idd0"])),
+            (power["vpp"], {k[3:]: v for k, v in power.items() if k.startswith("ipp")}, power.get("iBeta_vpp", power.get("ipp0", 0.0))),
+        ]
+
+    def stream(self, csv_path: str, block_bytes: int = 4 * 1024 * 1024) -> dict:
+        # One pass over the trace -> command counts and residency in clock cycles
+        n_banks = self.ranks * self.banks
+        open_since = np.full(n_banks, -1, dtype=np.int64)
+        ref_until = np.zeros(self.ranks, dtype=np.int64)
+        counts = dict.fromkeys(["act", "pre", "rd", "wr", "refab", "refsb"], 0)
+        rank_active = np.zeros(self.ranks)
+        bank_active = 0.0
+        t_prev = 0
+
+        with open_artifact(csv_path) as f_in:
+            for buf in read_blocks(f_in, block_bytes):
+                start, bounds = parse_csv_block(buf)
+                if start.size == 0:
+                    continue
+                ts = parse_int_column(buf, start, bounds[0])[0]
+                cmd = command_masks(buf, bounds, COMMANDS)
+                rank, bg, bank = (parse_int_column(buf, bounds[j - 1] + 1, bounds[j], default=0)[0] for j in (2, 3, 4))
+                rank = np.clip(rank, 0, self.ranks - 1)
+                g = rank * self.banks + np.clip(bg, 0, self.groups - 1) * self.banks_per_group + np.clip(bank, 0, self.banks_per_group - 1)
+                t_cur = max(t_prev, int(ts.max()))
+                row = np.arange(ts.size)
+
+                counts["act"] += int(cmd["ACT"].sum())
+                counts["rd"] += int((cmd["RD"] | cmd["RDA"]).sum())
+                counts["wr"] += int((cmd["WR"] | cmd["WRA"]).sum())
+                counts["refab"] += int(cmd["REFA"].sum())
+                counts["refsb"] += int((cmd["REFSB"] | cmd["REFB"]).sum())
+
+                # Bank open/close events; rank- and same-bank-wide commands close several banks
+                single = cmd["ACT"] | cmd["PRE"] | cmd["RDA"] | cmd["WRA"]
+                all_banks = cmd["PREA"] | cmd["REFA"]
+                same_bank = cmd["PREsb"] | cmd["PRESB"]
+                ev_row = [row[single]]
+                ev_g = [g[single]]
+                for sel, offsets in [(all_banks, np.arange(self.banks)),
+                                     (same_bank, np.arange(self.groups) * self.banks_per_group)]:
+                    if sel.any():
+                        base = rank[sel] * self.banks + (0 if sel is all_banks else bank[sel].clip(0, self.banks_per_group - 1))
+                        ev_row.append(np.repeat(row[sel], offsets.size))
+                        ev_g.append((base[:, None] + offsets).ravel())
+                ev_row, ev_g = np.concatenate(ev_row), np.concatenate(ev_g)
+                order = np.lexsort((ev_row, ev_g))
+                ev_row, ev_g = ev_row[order], ev_g[order]
+                ev_ts, ev_open = ts[ev_row], cmd["ACT"][ev_row]
+
+                # Open time before each event: previous event of the same bank, or the carried state
+                first = np.concatenate(([True], ev_g[1:] != ev_g[:-1]))
+                prev_open = np.where(first, open_since[ev_g], np.concatenate(([-1], np.where(ev_open[:-1], ev_ts[:-1], -1))))
+                was_open = prev_open >= 0
+                counts["pre"] += int((was_open & ~ev_open).sum())
+                iv_g, iv_s, iv_e = ev_g[was_open], np.maximum(prev_open[was_open], t_prev), ev_ts[was_open]
+
+                last = np.concatenate((ev_g[1:] != ev_g[:-1], [True])) if ev_g.size else np.zeros(0, dtype=bool)
+                open_since[ev_g[last]] = np.where(ev_open[last], ev_ts[last], -1)
+                still = np.flatnonzero(open_since >= 0)
+                iv_g = np.concatenate((iv_g, still))
+                iv_s = np.concatenate((iv_s, np.maximum(open_since[still], t_prev)))
+                iv_e = np.concatenate((iv_e, np.full(still.size, t_cur)))
+                open_since[still] = t_cur
+                bank_active += float(np.maximum(iv_e - iv_s, 0).sum())
+
+                # Refresh keeps the rank in the active background state for tRFC / tRFCsb
+                refs = [(np.arange(self.ranks), np.full(self.ranks, t_prev), ref_until.copy())]
+                for sel, dur in [(cmd["REFA"], self.tRFC), (cmd["REFSB"] | cmd["REFB"], self.tRFCsb)]:
+                    refs.append((rank[sel], ts[sel], ts[sel] + dur))
+                    if sel.any():
+                        np.maximum.at(ref_until, rank[sel], ts[sel] + dur)
+                ref_rank, ref_s, ref_e = (np.concatenate(x) for x in zip(*refs))
+
+                r_all = np.concatenate((iv_g // self.banks, ref_rank))
+                s_all = np.concatenate((iv_s, ref_s))
+                e_all = np.minimum(np.concatenate((iv_e, ref_e)), t_cur)
+                live = e_all > s_all
+                rank_active += union_length(r_all[live], s_all[live] - t_prev, e_all[live] - t_prev, self.ranks)
+                t_prev = t_cur
+
+        return {**counts, "cycles": t_prev, "rank_active": rank_active.sum(),
+                "rank_precharged": self.ranks * t_prev - rank_active.sum(), "bank_active": bank_active}
+
+    def energy(self, usage: dict) -> dict:
+        """
+        Energy in J per component from the stream() counts and residencies:
+        E_act = V (I_theta - I_1) tRAS, E_pre = V (I_beta - I_2N) tRP, E_rd/wr = V (I_4R/W - I_3N) tBurst,
+        E_ref = V (I_5B - I_3N) tRFC, background V I_rho / (I_3N - I_rho)/B / I_2N over the residencies.
+        """
+        B, tck = self.banks, self.tck
+        out = dict.fromkeys(["ACT", "PRE", "RD", "WR", "REFab", "REFsb", "Background act", "Background pre"], 0.0)
+        for v, i, i_beta in self.domains:
+            if not i or v == 0:
+                continue
+            i_rho = self.rho * (i["3n"] - i["2n"]) + i["2n"]
+            i_theta = (i["0"] * (self.tRP + self.tRAS) - i_beta * self.tRP) / self.tRAS
+            i_1 = (i["3n"] + (B - 1) * i_rho) / B
+            out["ACT"] += v * (i_theta - i_1) * self.tRAS * tck * usage["act"]
+            out["PRE"] += v * (i_beta - i["2n"]) * self.tRP * tck * usage["pre"]
+            out["RD"] += v * (i["4r"] - i["3n"]) * self.burst * tck * usage["rd"]
+            out["WR"] += v * (i["4w"] - i["3n"]) * self.burst * tck * usage["wr"]
+            out["REFab"] += v * (i["5b"] - i["3n"]) * self.tRFC * tck * usage["refab"]
+            # A same-bank refresh covers one bank per bank group
+            out["REFsb"] += v * (i["5b"] - i["3n"]) * self.tRFCsb * tck * usage["refsb"] * self.groups / B
+            out["Background act"] += v * (i_rho * usage["rank_active"] + (i["3n"] - i_rho) / B * usage["bank_active"]) * tck
+            out["Background pre"] += v * i["2n"] * usage["rank_precharged"] * tck
+        out = {k: e * self.devices for k, e in out.items()}
+        out["Total"] = sum(out.values())
+        return out
+
+    def estimate(self, csv_path: str) -> dict:
+        return self.energy(self.stream(csv_path))
+
+
+def write_report(energy: dict, path: str):
+    # Same "Total Energy ->" line the DRAMPower CLI prints, so existing parsers work
+    with atomic_write(path) as f:
+        f.write(f"{BACKEND_TAG} (estimate)\n")
+        for k, e in energy.items():
+            if k != "Total":
+                f.write(f"{k} energy: {e:.6e}\n")
+        f.write(f"Total Energy -> {energy['Total']:.9e}\n")
+
+def aggregate_reports(channel_reports: list, path: str) -> float:
+    # Per-channel reports (CLI or model) -> one report whose single "Total Energy ->" is the sum
+    totals = []
+    for report in channel_reports:
+        with open(report) as f:
+            m = ENERGY_RE.search(f.read())
+        if not m:
+            raise ValueError(f"No total energy in {report}")
+        totals.append(float(m.group(1)))
+    with atomic_write(path) as f:
+        f.write(f"Channels: {len(totals)}\n")
+        for report, total in zip(channel_reports, totals):
+            f.write(f"{os.path.basename(report)}: {total:.9e}\n")
+        f.write(f"Total Energy -> {sum(totals):.9e}\n")
+    return sum(totals)
+
+def validate(result_root: str, model: EnergyModel, out_csv: str = None) -> list:
+    """
+    Compares the model with every DRAMPower CLI report under result_root (runs whose
+    report came from this backend are skipped). Returns one dict per run.
+    """
+    rows = []
+    for root, _, files in sorted(os.walk(result_root)):
+        csv_file = next((f for f in files if f.endswith(CSV_NAMES)), None)
+        report = next((f for f in files if f.endswith("drampower_report.txt")), None)
+        if not csv_file or not report:
+            continue
+        with open(os.path.join(root, report)) as f:
+            text = f.read()
+        m = ENERGY_RE.search(text)
+        if BACKEND_TAG in text or not m:
+            continue
+        t0 = time.time()
+        est = model.estimate(os.path.join(root, csv_file))["Total"]
+        cli = float(m.group(1))
+        rows.append({"run": os.path.relpath(root, result_root), "cli": cli, "model": est,
+                     "rel_err": (est - cli) / cli if cli else float("nan"), "model_s": time.time() - t0})
+
+    for r in rows:
+        print(f"{r['run']:<60} cli {r['cli']:.4e}  model {r['model']:.4e}  err {r['rel_err'] * 100:+7.2f}%  ({r['model_s']:.2f}s)")
+    if rows:
+        err = np.array([r["rel_err"] for r in rows])
+        ratio = np.array([r["cli"] / r["model"] for r in rows if r["model"]])
+        print(f"\nRuns: {len(rows)}  mean |err|: {np.nanmean(np.abs(err)) * 100:.2f}%  "
+              f"max |err|: {np.nanmax(np.abs(err)) * 100:.2f}%  bias: {np.nanmean(err) * 100:+.2f}%  "
+              f"median CLI/model: {np.median(ratio):.4f}")
+    else:
+        print("No DRAMPower CLI reports found.")
+    if out_csv:
+        with open(out_csv, "w") as f:
+            f.write("run,cli,model,rel_err,model_s\n")
+            for r in rows:
+                f.write(f"{r['run']},{r['cli']},{r['model']},{r['rel_err']},{r['model_s']}\n")
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fast DRAM energy estimate from DRAMPower CSV traces")
+    ap.add_argument("--spec", default=DEFAULT_SPEC, help="DRAMPower memspec JSON (default: ddr5.json)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_est = sub.add_parser("estimate", help="Estimate the energy of one trace")
+    p_est.add_argument("trace", help="DRAMPower CSV (from ram2drampower.py)")
+    p_est.add_argument("--report", help="Write a DRAMPower-style report here")
+
+    p_val = sub.add_parser("validate", help="Compare against DRAMPower CLI reports under a result tree")
+    p_val.add_argument("result_root", help="Result directory (e.g. ../result)")
+    p_val.add_argument("--out", help="Per-run comparison CSV")
+    args = ap.parse_args()
+
+    model = EnergyModel(args.spec)
+    if args.cmd == "estimate":
+        t0 = time.time()
+        energy = model.estimate(args.trace)
+        for k, e in energy.items():
+            print(f"{k + ':':<16} {e:.6e} J")
+        print(f"({time.time() - t0:.2f}s)")
+        if args.report:
+            write_report(energy, args.report)
+            print(f"Report saved: {args.report}")
+    else:
+        validate(args.result_root, model, args.out)
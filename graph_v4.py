@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
-import os
-import re
+import argparse
+import hashlib
+import inspect
 import math
-import statistics
-from collections import defaultdict, Counter
+import os
+import time
+from array import array
 import numpy as np
-import pandas as pd
 from pathlib import Path
-import matplotlib.pyplot as plt
+from manifest import Manifest, atomic_write
+from results_store import stream_runs
+from stream_agg import GroupedStats
 
+# Figures of the tREFI study, split into a loader (results.sqlite -> aggregate table,
+# persisted as <out>/graph_aggregates.npz and rebuilt only when a run changes) and one
+# function per figure. Each figure is recorded in <out>/figures.json with the hash of
+# its plotted data and of its own source, and is redrawn only when either changed.
 
 # --- Configuration & Paths ---
 BASE_PATH = os.path.expanduser('/home/eevee/Documents/team_teh_tarik/result')
@@ -23,20 +30,9 @@ EPS = 1e-30                # protect divide-by-zero
 # Using the precise coefficients from your updated math
 ratio_retent =  { "32ms": 1.0, "48ms": 2.2628, "64ms": 4.0395 }
 
-# --- Regex Patterns (Performance & AI Features) ---
-ENERGY_RE = re.compile(r"Total Energy ->\s*([\d\.eE\-\+]+)")
-LAT_RE    = re.compile(r"avg_read_latency_0:\s*([\d\.]+)")
-CYC_RE    = re.compile(r"memory_system_cycles:\s*([\d\.]+)")
-REFAB_RE  = re.compile(r"\bREFab\b")
-
-# AI Feature Regex (Supports multiple log formats)
-READ_RE   = re.compile(r"num_read_reqs_0:\s*([\d\.]+)|number_of_read_requests:\s*([\d\.]+)")
-WRITE_RE  = re.compile(r"num_write_reqs_0:\s*([\d\.]+)|number_of_write_requests:\s*([\d\.]+)")
-HITS_RE   = re.compile(r"row_hits_0:\s*([\d\.]+)|row_hits:\s*([\d\.]+)")
-RMISS_RE  = re.compile(r"row_misses_0:\s*([\d\.]+)|row_misses:\s*([\d\.]+)")
-RCONF_RE  = re.compile(r"row_conflicts_0:\s*([\d\.]+)|row_conflicts:\s*([\d\.]+)")
-LLC_M_RE  = re.compile(r"llc_read_misses:\s*([\d\.]+)|cache_read_misses:\s*([\d\.]+)")
-LLC_A_RE  = re.compile(r"llc_read_access:\s*([\d\.]+)|cache_read_access:\s*([\d\.]+)")
+AGG_FILE = "graph_aggregates.npz"
+SCATTER_MAX_POINTS = 100_000   # above this the trade-off scatter is drawn from 2-D bins
+SCATTER_BINS = 300
 
 selected_cfg = {
     "bwaves": "48ms",
@@ -60,268 +56,233 @@ def detect_trace_key(name: str) -> str:
     #print(f"Detecting trace key from name: {name}")
     return name.split('_')[0] if '_' in name else name
 
-def safe_float(regex, text, label=""):
-    m = regex.search(text)
-    if not m: return 0.0
-    # Return the first non-None group (handles OR in regex)
-    for group in m.groups():
-        if group is not None: return float(group)
-    return 0.0
-
-# --- 1. Data Collection ---
-print(f"Scanning: {BASE_PATH}")
-trace_roots = set()
-for root, dirs, _ in os.walk(BASE_PATH):
-    if any(any(cfg in d for cfg in CONFIGS) for d in dirs):
-        trace_roots.add(root)
-
-aggregated = defaultdict(lambda: {cfg: [] for cfg in CONFIGS})
-
-for trace_path in sorted(trace_roots):
-    trace_key = detect_trace_key(os.path.basename(trace_path))
-    for cfg in CONFIGS:
-        cfg_folder = next((d for d in os.listdir(trace_path) if cfg in d), None)
-        if not cfg_folder: continue
-        
-        full_path = os.path.join(trace_path, cfg_folder)
-        dp_file  = next((f for f in os.listdir(full_path) if 'drampower_report' in f), None)
-        ram_file = next((f for f in os.listdir(full_path) if 'ramulator2_report' in f), None)
-        ram_out_file = next((f for f in os.listdir(full_path) if 'ramulator2_output.txt.ch0' in f), None)
-        if not dp_file or not ram_file: continue
-
-        try:
-            with open(os.path.join(full_path, dp_file), 'r') as f:
-                dp_txt = f.read()
-                E = safe_float(ENERGY_RE, dp_txt, "Energy")
-
-            with open(os.path.join(full_path, ram_file), 'r') as f:
-                ram_txt = f.read()
-                lat_cyc = safe_float(LAT_RE, ram_txt)
-                tot_cyc = safe_float(CYC_RE, ram_txt)
-                # AI Feature extraction
-                n_read, n_write = safe_float(READ_RE, ram_txt), safe_float(WRITE_RE, ram_txt)
-                r_hit, r_miss, r_conf = safe_float(HITS_RE, ram_txt), safe_float(RMISS_RE, ram_txt), safe_float(RCONF_RE, ram_txt)
-                l_miss, l_acc = safe_float(LLC_M_RE, ram_txt), safe_float(LLC_A_RE, ram_txt)
-            
-            with open(os.path.join(full_path, ram_out_file), 'r') as f:
-                refab_count = sum(1 for line in f if 'REFab' in line)
-            
-            # Performance Math
-            freq_hz = FREQ_MHZ * 1e6
-            lat_sec = lat_cyc / freq_hz
-            duration_hours = (tot_cyc / freq_hz) / 3600.0
-            M = E * (lat_sec ** 2)
-            
-            # Reliability Math
-            mu = (FIT_PER_GB / 1e9) * DEVICE_Gb * duration_hours
-            SER = 1.0 - math.exp(-mu)
-
-            # AI Calculation
-            total_reqs = n_read + n_write
-            denom_rb = r_hit + r_miss + r_conf
-            
-            # Append all metrics to avoid KeyErrors
-            aggregated[trace_key][cfg].append({
-                "E": E, "lat_sec": lat_sec, "hours": duration_hours, "M": M, "SER": SER,
-                "Incoming_Req_Per_Cycle": total_reqs / tot_cyc if tot_cyc > 0 else 0,
-                "Read_Intensity": n_read / total_reqs if total_reqs > 0 else 0,
-                "RB_Locality": r_hit / denom_rb if denom_rb > 0 else 0,
-                "RB_Conflict_Rate": r_conf / denom_rb if denom_rb > 0 else 0,
-                "LLC_Miss_Rate": l_miss / l_acc if l_acc > 0 else 0,
-                "REFab": refab_count
-            })
-        except Exception as e:
+def digest(*parts) -> str:
+    # sha1 of strings and numpy arrays (by dtype, shape and bytes)
+    h = hashlib.sha1()
+    for p in parts:
+        if isinstance(p, np.ndarray):
+            h.update(f"{p.dtype}{p.shape}".encode())
+            h.update(np.ascontiguousarray(p).tobytes())
+        else:
+            h.update(repr(p).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# --- 1. Data Collection & Aggregation (results.sqlite, re-parsing only changed run directories) ---
+METRICS = ["M", "SER", "REFab", "E", "lat_sec"]
+
+def build_table(runs) -> dict:
+    """
+    Aggregate table of the runs with a weight and a REFab count: per (trace, cfg)
+    weighted means of METRICS ("M", ... : T x C arrays, kept as running sums while
+    the runs stream by) and the per-run energy / latency the scatter plot needs
+    ("run_*" arrays, 8 bytes per value).
+    """
+    stats = GroupedStats(METRICS)
+    trace_ids = {}
+    run_trace, run_cfg, run_E, run_lat = array("q"), array("q"), array("d"), array("d")
+    freq_hz = FREQ_MHZ * 1e6
+    for r in runs:
+        if r["weight"] <= 0 or r["refab"] is None: continue
+        # Performance & Reliability Math
+        lat_sec = r["lat_cycles"] / freq_hz
+        hours = (r["cycles"] / freq_hz) / 3600.0
+        trace = detect_trace_key(r["chunk"])
+        stats.add((trace, r["cfg"]), {"E": r["energy"], "lat_sec": lat_sec, "M": r["energy"] * lat_sec ** 2,
+                                      "SER": 1.0 - math.exp(-(FIT_PER_GB / 1e9) * DEVICE_Gb * hours),
+                                      "REFab": r["refab"]}, r["weight"])
+        run_trace.append(trace_ids.setdefault(trace, len(trace_ids)))
+        run_cfg.append(CONFIGS.index(r["cfg"]))
+        run_E.append(r["energy"])
+        run_lat.append(lat_sec)
+
+    traces = sorted(trace_ids)
+    row = {t: i for i, t in enumerate(traces)}
+    remap = np.zeros(len(traces), dtype=np.int64)
+    remap[[trace_ids[t] for t in traces]] = np.arange(len(traces))
+    table = {"traces": np.array(traces, dtype=str), "configs": np.array(CONFIGS, dtype=str),
+             "n_runs": np.zeros((len(traces), len(CONFIGS)), dtype=np.int64),
+             "run_trace": remap[np.frombuffer(run_trace, dtype=np.int64)] if len(run_trace) else np.zeros(0, np.int64),
+             "run_cfg": np.array(run_cfg, dtype=np.int64), "run_E": np.array(run_E), "run_lat": np.array(run_lat)}
+    for k in METRICS:
+        table[k] = np.full((len(traces), len(CONFIGS)), np.nan)
+    for (trace, cfg), group in stats.groups.items():
+        i, c = row[trace], CONFIGS.index(cfg)
+        table["n_runs"][i, c] = group["M"].count
+        for k in METRICS:
+            table[k][i, c] = group[k].mean
+    return table
+
+def load_table(base_path=BASE_PATH, out_path=OUT_PATH, rebuild=False):
+    """
+    Aggregate table of the runs under base_path, from out_path/AGG_FILE while the
+    runs (their store signatures) and the model constants are unchanged.
+    Returns (table, rebuilt).
+    """
+    print(f"Loading: {base_path}")
+    h = hashlib.sha1(repr((FREQ_MHZ, FIT_PER_GB, DEVICE_Gb, CONFIGS)).encode())
+    for r in stream_runs(base_path, CONFIGS):
+        h.update(f"{r['dir']}:{r['sig']}\n".encode())
+    key = h.hexdigest()
+    path = Path(out_path) / AGG_FILE
+    if path.exists() and not rebuild:
+        with np.load(path) as f:
+            if str(f["key"]) == key:
+                return {k: f[k] for k in f.files if k != "key"}, False
+    table = build_table(stream_runs(base_path, CONFIGS, refresh=False))
+    os.makedirs(out_path, exist_ok=True)
+    with atomic_write(str(path), "wb") as f:
+        np.savez(f, key=np.array(key), **table)
+    return table, True
+
+def valid_traces(table):
+    # Traces with runs of every config
+    return np.flatnonzero((table["n_runs"] > 0).all(axis=1))
+
+
+# --- 2. Data Processing & Normalization (vs the 32ms baseline of each trace) ---
+def normalized(table) -> dict:
+    valid = valid_traces(table)
+    base = CONFIGS.index("32ms")
+    # scatter: per-run energy / latency over the trace's weighted 32ms means
+    pos = np.full(len(table["traces"]), -1)
+    pos[valid] = np.arange(len(valid))
+    keep = pos[table["run_trace"]] >= 0
+    rt = table["run_trace"][keep]
+    return {
+        "traces": [str(t) for t in table["traces"][valid]],
+        "M": table["M"][valid] / table["M"][valid, base:base + 1],
+        "REFab": table["REFab"][valid] / table["REFab"][valid, base:base + 1],
+        "scatter_cfg": table["run_cfg"][keep],
+        "energy_norm": table["run_E"][keep] / table["E"][rt, base],
+        "lat_norm": table["run_lat"][keep] / table["lat_sec"][rt, base],
+    }
+
+def geo_impr(values):
+    return 1 - np.exp(np.mean(np.log(values)))
+
+def selected_values(norm, key):
+    # Normalized value of each trace's selected_cfg, skipping 32ms (the baseline) and unlisted traces
+    return [norm[key][i, CONFIGS.index(selected_cfg[t])] for i, t in enumerate(norm["traces"])
+            if selected_cfg.get(t, "32ms") != "32ms"]
+
+def print_summary(norm):
+    for key, label in [("M", "M"), ("REFab", "REFab")]:
+        for cfg in ["48ms", "64ms"]:
+            print(f"Geo-mean {label} improvement ({cfg}): {geo_impr(norm[key][:, CONFIGS.index(cfg)])*100:.2f}%")
+        print(f"Geo-mean {label} improvement (Selected t_REFI): {geo_impr(selected_values(norm, key))*100:.2f}%")
+
+
+# --- 3. Figures ---
+def render(manifest, name, out_path, draw, *inputs, force=False):
+    # Calls draw(path, *inputs) unless figures.json has this figure with the same data and draw() source
+    path = os.path.join(out_path, name)
+    key = digest(inspect.getsource(draw), *inputs)
+    if not force and manifest.done(name, key):
+        print(f"Up to date: {name}")
+        return False
+    t0 = time.time()
+    draw(path, *inputs)
+    manifest.record(name, key, [path], time.time() - t0)
+    print(f"Saved: {name} ({time.time() - t0:.1f}s)")
+    return True
+
+def bar_chart(values, traces, ylabel, title):
+    # Grouped bars per trace (one per config), a gold star above each trace's selected config
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(9, 6))
+    width = 0.8 / len(CONFIGS)
+    x = np.arange(len(traces))
+    for c, (cfg, color) in enumerate(zip(CONFIGS, ['#4C72B0', '#DD8452', '#55A868'])):
+        ax.bar(x - 0.4 + width * (c + 0.5), values[:, c], width, color=color, label=cfg)
+    for i, trace in enumerate(traces):
+        chosen = selected_cfg.get(trace)
+        if chosen is None:
             continue
-
-# --- 2. Aggregation ---
-data = defaultdict(dict)
-for trace_key, cfgs in aggregated.items():
-    for cfg, runs in cfgs.items():
-        if not runs: continue
-        data[trace_key][cfg] = {
-            "M": statistics.mean(r["M"] for r in runs),
-            "SER": statistics.mean(r["SER"] for r in runs),
-            "n_runs": len(runs),
-            "runs": runs,  # Keep raw runs for export
-            "REFab": statistics.mean(r["REFab"] for r in runs),
-        }
-
-valid_traces = [t for t in sorted(data.keys()) if all(c in data[t] for c in CONFIGS)]
-if not valid_traces: raise SystemExit("No valid traces found.")
-
-# --- 3. Data Processing & Normalization ---
-plot_records = []
-scatter_records = []
-refab_records = []
-
-for t in valid_traces:
-    # 1. Establish the 32ms baseline for this specific trace
-    # We use the mean of 32ms runs as the 1.0 reference point
-    base_e = statistics.mean(r["E"] for r in data[t]["32ms"]["runs"])
-    base_lat = statistics.mean(r["lat_sec"] for r in data[t]["32ms"]["runs"])
-    base_m = data[t]["32ms"]["M"]
-    
-    # Store data for the Bar Chart (Averages)
-    row = {"trace": t}
-    for cfg in CONFIGS:
-        row[cfg] = data[t][cfg]["M"] / base_m
-        
-        
-        # Store data for the Scatter Plot (Individual Runs)
-        for run in data[t][cfg]["runs"]:
-            scatter_records.append({
-                "trace": t,
-                "cfg": cfg,
-                "energy_norm": run["E"] / base_e,
-                "lat_norm": run["lat_sec"] / base_lat
-            })
-    plot_records.append(row)
-
-for t in valid_traces:
-    row = {"trace": t}
-    for cfg in CONFIGS:
-        #row[cfg] = data[t][cfg]["REFab"]
-        row[cfg] = data[t][cfg]["REFab"] / data[t]["32ms"]["REFab"]
-    refab_records.append(row)
-
-
-# Convert to DataFrames
-df_M = pd.DataFrame(plot_records).set_index("trace")
-df_refab = pd.DataFrame(refab_records).set_index("trace")
-df_scatter = pd.DataFrame(scatter_records)
-
-
-# Geometric mean improvement in M vs 32ms baseline
-geo_impr_48_M = 1 - np.exp(np.mean(np.log(df_M["48ms"])))
-geo_impr_64_M = 1 - np.exp(np.mean(np.log(df_M["64ms"])))
-
-print(f"Geo-mean M improvement (48ms): {geo_impr_48_M*100:.2f}%")
-print(f"Geo-mean M improvement (64ms): {geo_impr_64_M*100:.2f}%")
-
-
-selected_improvements_M = []
-
-for trace in df_M.index:
-    chosen = selected_cfg[trace]
-    if chosen == "32ms":
-        continue   # skip baseline
-    val = df_M.loc[trace, chosen]
-    selected_improvements_M.append(val)
-
-geo_selected_M = 1 - np.exp(np.mean(np.log(selected_improvements_M)))
-
-print(f"Geo-mean M improvement (Selected t_REFI): {geo_selected_M*100:.2f}%")
-
-#
-geo_impr_48_refab = 1 - np.exp(np.mean(np.log(df_refab["48ms"])))
-geo_impr_64_refab = 1 - np.exp(np.mean(np.log(df_refab["64ms"])))
-
-print(f"Geo-mean REFab improvement (48ms): {geo_impr_48_refab*100:.2f}%")
-print(f"Geo-mean REFab improvement (64ms): {geo_impr_64_refab*100:.2f}%")
-
-selected_improvements_refab = []
-
-for trace in df_refab.index:
-    chosen = selected_cfg[trace]
-    if chosen == "32ms":
-        continue   # skip baseline
-    val = df_refab.loc[trace, chosen]
-    selected_improvements_refab.append(val)
-
-geo_selected_refab = 1 - np.exp(np.mean(np.log(selected_improvements_refab)))
-
-print(f"Geo-mean REFab improvement (Selected t_REFI): {geo_selected_refab*100:.2f}%")
-
-
-
-# --- 4. Figure 5: Grouped Bar Chart of M_norm per Trace ---
-plt.clf() # Use clf() instead of .figure() per guidelines
-ax = df_M.plot(kind="bar", width=0.8, color=['#4C72B0', '#DD8452', '#55A868'], figsize=(9, 6))
-
-for i, trace in enumerate(df_M.index):
-    chosen = selected_cfg.get(trace)
-    if chosen is None:
-        continue
-
-    cfg_index = CONFIGS.index(chosen)
-    bar_index = cfg_index * len(df_M.index) + i
-    bar = ax.patches[bar_index]
-
-    ax.text(
-        bar.get_x() + bar.get_width()/2,
-        bar.get_height(),
-        "★",
-        ha='center',
-        va='bottom',
-        fontsize=10,
-        color='gold'
-    )
-
-#plt.axhline(y=1.0, color='red', linestyle='--', alpha=0.5, label="32ms Baseline")
-plt.ylabel(r"Normalized $M = E \cdot T^2$ per Trace Segment (vs 32ms-Baseline)")
-plt.xlabel("Workload Trace")
-plt.title("Performance-Energy Metric Comparison")
-plt.legend(title="$tREFI$ Config", loc='lower right')
-plt.xticks(rotation=45, ha='right')
-plt.grid(axis='y', linestyle=':', alpha=0.7)
-
-plt.tight_layout()
-plt.savefig(Path(OUT_PATH) / "fig_M_comparison.png", dpi=300)
-
-# --- 5. Figure 6: Scatter Plot (Energy vs. Latency Trade-off) ---
-plt.clf()
-colors = {'32ms': 'blue', '48ms': 'red', '64ms': 'green'}
-
-for cfg in CONFIGS:
-    sub = df_scatter[df_scatter["cfg"] == cfg]
-    if sub.empty: continue
-    plt.scatter(sub["lat_norm"], sub["energy_norm"], 
-                label=cfg, color=colors.get(cfg), alpha=0.5, edgecolors='none', s = 20)
-
-plt.axhline(y=1.0, color='black', linestyle='--', alpha=0.4)
-plt.axvline(x=1.0, color='black', linestyle='--', alpha=0.4)
-plt.xlabel("Normalized Avg Read Latency (vs 32ms-Baseline)")
-plt.ylabel("Normalized Total Energy (vs 32ms-Baseline)")
-plt.title("System Energy-Latency Trade-off")
-plt.legend(title="$tREFI$ Config")
-plt.grid(True, linestyle=':', alpha=0.4)
-
-plt.tight_layout()
-plt.savefig(Path(OUT_PATH) / "fig_tradeoff_energy_vs_latency.png", dpi=300)
-plt.close()
-
-# --- Figure: REFab Count Comparison ---
-plt.clf()
-
-ax = df_refab.plot(kind="bar", width=0.8, color=['#4C72B0', '#DD8452', '#55A868'], figsize=(9, 6))
-
-for i, trace in enumerate(df_M.index):
-    chosen = selected_cfg.get(trace)
-    if chosen is None:
-        continue
-
-    cfg_index = CONFIGS.index(chosen)
-    bar_index = cfg_index * len(df_M.index) + i
-    bar = ax.patches[bar_index]
-
-    ax.text(
-        bar.get_x() + bar.get_width()/2,
-        bar.get_height(),
-        "★",
-        ha='center',
-        va='bottom',
-        fontsize=10,
-        color='gold'
-    )
-plt.ylabel("Normalized Average REFab Count per Trace Segment (vs 32ms-Baseline)")
-plt.xlabel("Workload Trace")
-plt.title("Refresh Operations Comparison")
-plt.legend(title="$tREFI$ Config", loc='lower right')
-plt.xticks(rotation=45, ha='right')
-plt.grid(axis='y', linestyle=':', alpha=0.7)
-plt.tight_layout()
-plt.savefig(Path(OUT_PATH) / "fig_REFab_comparison.png", dpi=300)
-plt.close()
-
-
-print(f"Graphs saved successfully to {OUT_PATH}")
+        c = CONFIGS.index(chosen)
+        ax.text(x[i] - 0.4 + width * (c + 0.5), values[i, c], "★", ha='center', va='bottom', fontsize=10, color='gold')
+    ax.set_xticks(x)
+    ax.set_xticklabels(traces, rotation=45, ha='right')
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel("Workload Trace")
+    ax.set_title(title)
+    ax.legend(title="$tREFI$ Config", loc='lower right')
+    ax.grid(axis='y', linestyle=':', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+def draw_M_comparison(path, M, traces):
+    # Figure 5: Grouped Bar Chart of M_norm per Trace
+    import matplotlib.pyplot as plt
+    fig = bar_chart(M, traces, r"Normalized $M = E \cdot T^2$ per Trace Segment (vs 32ms-Baseline)",
+                    "Performance-Energy Metric Comparison")
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+def draw_REFab_comparison(path, REFab, traces):
+    import matplotlib.pyplot as plt
+    fig = bar_chart(REFab, traces, "Normalized Average REFab Count per Trace Segment (vs 32ms-Baseline)",
+                    "Refresh Operations Comparison")
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+def draw_tradeoff(path, cfg_idx, lat_norm, energy_norm):
+    # Figure 6: Scatter Plot (Energy vs. Latency Trade-off); beyond SCATTER_MAX_POINTS one
+    # marker per occupied bin of a SCATTER_BINS grid, sized by log count, stands in for the runs
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    colors = {'32ms': 'blue', '48ms': 'red', '64ms': 'green'}
+    binned = len(lat_norm) > SCATTER_MAX_POINTS
+    extent = [[lat_norm.min(), lat_norm.max()], [energy_norm.min(), energy_norm.max()]] if binned else None
+    for c, cfg in enumerate(CONFIGS):
+        x, y = lat_norm[cfg_idx == c], energy_norm[cfg_idx == c]
+        if not len(x): continue
+        if binned:
+            counts, xe, ye = np.histogram2d(x, y, bins=SCATTER_BINS, range=extent)
+            i, j = np.nonzero(counts)
+            x, y = (xe[i] + xe[i + 1]) / 2, (ye[j] + ye[j + 1]) / 2
+            size = 4 + 4 * np.log2(counts[i, j])
+        else:
+            size = 20
+        ax.scatter(x, y, label=cfg, color=colors.get(cfg), alpha=0.5, edgecolors='none', s=size, rasterized=binned)
+
+    ax.axhline(y=1.0, color='black', linestyle='--', alpha=0.4)
+    ax.axvline(x=1.0, color='black', linestyle='--', alpha=0.4)
+    ax.set_xlabel("Normalized Avg Read Latency (vs 32ms-Baseline)")
+    ax.set_ylabel("Normalized Total Energy (vs 32ms-Baseline)")
+    ax.set_title("System Energy-Latency Trade-off" + (f" ({len(lat_norm)} runs, binned)" if binned else ""))
+    ax.legend(title="$tREFI$ Config")
+    ax.grid(True, linestyle=':', alpha=0.4)
+    fig.tight_layout()
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+def render_all(norm, out_path=OUT_PATH, force=False) -> int:
+    # -> number of figures redrawn
+    os.makedirs(out_path, exist_ok=True)
+    manifest = Manifest(os.path.join(out_path, "figures.json"))
+    traces = norm["traces"]
+    return sum([
+        render(manifest, "fig_M_comparison.png", out_path, draw_M_comparison, norm["M"], traces, force=force),
+        render(manifest, "fig_tradeoff_energy_vs_latency.png", out_path, draw_tradeoff,
+               norm["scatter_cfg"], norm["lat_norm"], norm["energy_norm"], force=force),
+        render(manifest, "fig_REFab_comparison.png", out_path, draw_REFab_comparison, norm["REFab"], traces, force=force),
+    ])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="M / REFab / energy-latency figures of the tREFI study")
+    ap.add_argument("--base", default=BASE_PATH, help="Result root (results.sqlite lives there)")
+    ap.add_argument("--out", default=OUT_PATH, help="Figure directory (also holds the aggregate table)")
+    ap.add_argument("--rebuild", action="store_true", help="Re-aggregate even if the runs are unchanged")
+    ap.add_argument("--force", action="store_true", help="Redraw every figure")
+    args = ap.parse_args()
+
+    table, rebuilt = load_table(args.base, args.out, args.rebuild)
+    norm = normalized(table)
+    if not norm["traces"]: raise SystemExit("No valid traces found.")
+    print(f"{len(norm['traces'])} traces, {len(norm['lat_norm'])} runs ({'re-aggregated' if rebuilt else 'cached table'})")
+    print_summary(norm)
+    render_all(norm, args.out, args.force)
+    print(f"Graphs saved successfully to {args.out}")
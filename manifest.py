@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Per-job record of input hashes and completed pipeline stages, used by --resume
+HASH_BLOCK = 16 * 1024 * 1024
+_hashes = {}
+
+
+def file_sha256(path: str) -> str:
+    # Memoized per process on (path, size, mtime) so binaries are hashed once
+    if not os.path.isfile(path):
+        # Missing, or a pipe (streamed chunks) that must not be consumed here
+        return "missing"
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _hashes:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                buf = f.read(HASH_BLOCK)
+                if not buf:
+                    break
+                h.update(buf)
+        _hashes[memo_key] = h.hexdigest()
+    return _hashes[memo_key]
+
+def tmp_path(path: str) -> str:
+    return f"{path}.{os.getpid()}.tmp"
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w"):
+    # Write to a temp file next to path and rename it into place only on success
+    tmp = tmp_path(path)
+    try:
+        with open(tmp, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class Manifest:
+    """
+    <result dir>/manifest.json. "inputs" maps a name to the path, (size, mtime) stamp
+    and sha256 of an input file (reused while the stamp is unchanged), "stages" maps a
+    stage to the key of the inputs it ran on and the sizes of the files it produced.
+    A stage is complete when its key matches and every output is still there intact.
+    Outputs retired once consumed move to the stage's "retired" map: [name, size] of
+    their compressed copy, or None when they were deleted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"inputs": {}, "stages": {}}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def input(self, name: str, path: str) -> str:
+        st = os.stat(path) if os.path.exists(path) else None
+        stamp = f"{st.st_size}:{st.st_mtime_ns}" if st else "missing"
+        entry = self.data["inputs"].get(name)
+        if not entry or entry["path"] != os.path.abspath(path) or entry["stamp"] != stamp:
+            entry = {"path": os.path.abspath(path), "stamp": stamp, "sha256": file_sha256(path)}
+            self.data["inputs"][name] = entry
+        return entry["sha256"]
+
+    def value(self, name: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        self.data["inputs"][name] = {"sha256": digest}
+        return digest
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()[:32]
+
+    def done(self, stage: str, key: str) -> bool:
+        entry = self.data["stages"].get(stage)
+        if not entry or entry["key"] != key:
+            return False
+        base = os.path.dirname(self.path)
+        kept = [copy for copy in entry.get("retired", {}).values() if copy]
+        return all(os.path.exists(os.path.join(base, name)) and os.path.getsize(os.path.join(base, name)) == size
+                   for name, size in list(entry["outputs"].items()) + kept)
+
+    def start(self, stage: str, later: list = ()):
+        # A stage about to (re)run invalidates itself and the stages fed by it,
+        # along with the compressed copies of their retired outputs
+        for name in [stage, *later]:
+            for path in self.retired(name).values():
+                if path and os.path.exists(path):
+                    os.remove(path)
+            self.data["stages"].pop(name, None)
+        self.save()
+
+    def retire(self, stage: str, path: str, copy: str = None):
+        # An output consumed downstream was deleted, or replaced by its compressed copy
+        base = os.path.dirname(self.path)
+        entry = self.data["stages"].get(stage)
+        name = os.path.relpath(path, base)
+        if not entry or entry["outputs"].pop(name, None) is None:
+            return
+        entry.setdefault("retired", {})[name] = [os.path.relpath(copy, base), os.path.getsize(copy)] if copy else None
+        self.save()
+
+    def retired(self, stage: str) -> dict:
+        # {path: its compressed copy, or None if deleted} for a stage's retired outputs
+        base = os.path.dirname(self.path)
+        entry = self.data["stages"].get(stage) or {}
+        return {os.path.join(base, name): os.path.join(base, copy[0]) if copy else None
+                for name, copy in entry.get("retired", {}).items()}
+
+    def unretire(self, stage: str, path: str):
+        # path was restored from its compressed copy
+        entry = self.data["stages"][stage]
+        name = os.path.relpath(path, os.path.dirname(self.path))
+        entry["retired"].pop(name, None)
+        entry["outputs"][name] = os.path.getsize(path)
+        self.save()
+
+    def record(self, stage: str, key: str, outputs: list, seconds: float):
+        base = os.path.dirname(self.path)
+        self.data["stages"][stage] = {
+            "key": key, "seconds": round(seconds, 3), "finished": time.time(),
+            "outputs": {os.path.relpath(p, base): os.path.getsize(p) for p in outputs},
+        }
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump(self.data, f, indent=2)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Show which stages of the jobs under a result directory are complete")
+    ap.add_argument("result_root", help="Result directory (e.g. ../result)")
+    args = ap.parse_args()
+
+    total = 0
+    for root, _, files in sorted(os.walk(args.result_root)):
+        if "manifest.json" not in files:
+            continue
+        m = Manifest(os.path.join(root, "manifest.json"))
+        stages = [s for s, e in m.data["stages"].items() if m.done(s, e["key"])]
+        broken = [s for s in m.data["stages"] if s not in stages]
+        total += 1
+        print(f"{os.path.relpath(root, args.result_root):<60} complete: {','.join(stages) or '-'}"
+              + (f"  missing outputs: {','.join(broken)}" if broken else ""))
+    print(f"{total} manifests")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import os
+import time
+import numpy as np
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, ExtraTreesClassifier, VotingClassifier
+from sklearn.metrics import accuracy_score, confusion_matrix
+from sklearn.model_selection import GroupKFold, ParameterGrid
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import QuantileTransformer, PolynomialFeatures
+
+# Trace-grouped cross-validation and hyperparameter search for the DRAM_Project top
+# level model. Every (candidate, fold) fit is an independent joblib task, so folds and
+# candidates run in parallel across all cores; the PolynomialFeatures /
+# QuantileTransformer stages are cached in a joblib Memory directory, so candidates
+# that share a fold's training rows fit them once.
+
+# Pipeline parameters that differ between candidates (sklearn's step__param names)
+PARAM_GRID = {
+    "ensemble__rf__n_estimators": [100, 200],
+    "ensemble__et__n_estimators": [100, 200],
+    "ensemble__gb__max_depth": [3, 6],
+    "ensemble__gb__learning_rate": [0.05, 0.1],
+}
+
+
+def build_top_level_model(params=None, memory=None):
+    # RF + GB + ET soft-voting ensemble behind interaction features and a normal quantile scaler
+    clf1 = RandomForestClassifier(n_estimators=100, class_weight='balanced_subsample', random_state=42)
+    clf2 = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=6, random_state=42)
+    clf3 = ExtraTreesClassifier(n_estimators=100, class_weight='balanced_subsample', random_state=42)
+    voting_clf = VotingClassifier(estimators=[('rf', clf1), ('gb', clf2), ('et', clf3)], voting='soft')
+    model = Pipeline([
+        ('poly', PolynomialFeatures(degree=2, interaction_only=True, include_bias=False)),
+        ('scaler', QuantileTransformer(output_distribution='normal', random_state=42)),
+        ('ensemble', voting_clf)
+    ], memory=memory)
+    return model.set_params(**(params or {}))
+
+def under_refresh(y_true, y_pred, labels):
+    # Rows predicted with a longer tREFI than their label (the risky direction); labels in tREFI order
+    cm = confusion_matrix(y_true, y_pred, labels=labels)
+    return int(np.triu(cm, 1).sum())
+
+def fit_fold(model, params, X, y, train, test, labels):
+    t0 = time.perf_counter()
+    est = clone(model).set_params(**params)
+    est.fit(X.iloc[train], y.iloc[train])
+    fit_s = time.perf_counter() - t0
+    pred = est.predict(X.iloc[test])
+    return {"acc": accuracy_score(y.iloc[test], pred), "risk": under_refresh(y.iloc[test], pred, labels),
+            "n_test": len(test), "fit_s": fit_s, "wall_s": time.perf_counter() - t0, "pid": os.getpid()}
+
+def grouped_cv_search(X, y, groups, labels, param_grid=None, n_splits=5, n_jobs=-1, cache_dir=None, verbose=True):
+    """
+    GroupKFold over `groups` (one trace never spans train and test) for every
+    candidate of param_grid. Returns one dict per candidate, best first: highest
+    mean fold accuracy, then fewest under-refresh errors.
+    """
+    n_splits = min(n_splits, len(set(groups)))
+    if n_splits < 2:
+        raise ValueError(f"Grouped CV needs at least 2 traces, got {n_splits}")
+    folds = list(GroupKFold(n_splits=n_splits).split(X, y, groups))
+    candidates = list(ParameterGrid(param_grid if param_grid is not None else PARAM_GRID))
+    model = build_top_level_model(memory=Memory(cache_dir, verbose=0) if cache_dir else None)
+
+    t0 = time.perf_counter()
+    out = Parallel(n_jobs=n_jobs)(delayed(fit_fold)(model, params, X, y, train, test, labels)
+                                  for params in candidates for train, test in folds)
+    wall = time.perf_counter() - t0
+
+    results = []
+    for c, params in enumerate(candidates):
+        fold_res = out[c * n_splits:(c + 1) * n_splits]
+        results.append({"params": params, "acc": float(np.mean([f["acc"] for f in fold_res])),
+                        "acc_std": float(np.std([f["acc"] for f in fold_res])),
+                        "risk": sum(f["risk"] for f in fold_res), "folds": fold_res})
+    results.sort(key=lambda r: (-r["acc"], r["risk"]))
+    if verbose:
+        fit_total = sum(f["wall_s"] for f in out)
+        print(f" {len(candidates)} candidates x {n_splits} trace-grouped folds: {wall:.1f}s wall, "
+              f"{fit_total:.1f}s of fits ({fit_total / wall:.1f}x parallel, {len(set(f['pid'] for f in out))} workers)")
+        print(f" {'#':<3} {'acc':>7} {'std':>6} {'risk':>5}  fold wall s{'':<14} params")
+        for i, r in enumerate(results):
+            times = " ".join(f"{f['wall_s']:.1f}" for f in r["folds"])
+            short = ", ".join(f"{k.split('__', 1)[1]}={v}" for k, v in r["params"].items())
+            print(f" {i + 1:<3} {r['acc']*100:>6.2f}% {r['acc_std']*100:>5.1f} {r['risk']:>5}  {times:<25} {short}")
+    return results
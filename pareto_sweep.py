@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import numpy as np
+
+# Gamma sweep of the per-trace tREFI selection used by test_pareto.py and DRAM_Project.
+# A config's score is M * SER_ratio * prod_k coeff_k[cfg] ** gamma_k, i.e. in logs a
+# line in gamma per (trace, config): log M + log SER_ratio + gamma . log coeff[cfg].
+# grid() scores every gamma x trace x config at once by broadcasting; curve() walks a
+# segment of gamma space and returns the exact piecewise-constant Pareto curve, split
+# at the gammas where some trace's winning config changes (intersections of its lines).
+EPS = 1e-30
+BLOCK_ELEMS = 1 << 22   # gamma x trace x config scores held at once by grid()
+
+
+def point_line_distance(px, py, ax, ay, bx, by):
+    # Distance of the point(s) (px, py) from the line through (ax, ay) and (bx, by)
+    vx, vy = bx - ax, by - ay
+    wx, wy = px - ax, py - ay
+    denom = vx * vx + vy * vy
+    if denom == 0:
+        return np.hypot(wx, wy)
+    return np.abs(vx * wy - vy * wx) / np.sqrt(denom)
+
+
+class ParetoSweep:
+    """
+    Scores of `traces` x `configs` from data[trace][cfg] = {"M": ..., "SER": ...}.
+    coeffs is one {cfg: coefficient} dict (gamma is a scalar) or a list of them
+    (gamma is a vector, one weighting parameter per dict). M and SER are normalised
+    to the `baseline` config for the reported geomeans, as the scripts print them.
+    """
+
+    def __init__(self, data, traces, configs, coeffs, baseline):
+        self.traces, self.configs = list(traces), list(configs)
+        self.scalar = isinstance(coeffs, dict)
+        coeffs = [coeffs] if self.scalar else list(coeffs)
+        self.M = np.array([[data[t][c]["M"] for c in self.configs] for t in self.traces], dtype=float)
+        SER = np.maximum(np.array([[data[t][c]["SER"] for c in self.configs] for t in self.traces], dtype=float), EPS)
+        base = self.configs.index(baseline)
+        self.ratio = SER / SER[:, base:base + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.log_score = np.log(self.M) + np.log(self.ratio)   # T x C
+            self.log_coeff = np.log(np.array([[k[c] for c in self.configs] for k in coeffs], dtype=float))  # K x C
+            M_norm = self.M / self.M[:, base:base + 1]
+            log_M_norm = np.log(M_norm)
+        # geomean() of the scripts skips non-positive values: those carry no log term
+        self.M_valid = np.isfinite(log_M_norm) & (M_norm > 0)
+        self.log_M_norm = np.where(self.M_valid, log_M_norm, 0.0)
+        self.log_ratio = np.log(self.ratio)
+
+    def gamma_matrix(self, gammas):
+        # gammas -> G x K
+        g = np.asarray(gammas, dtype=float)
+        return g.reshape(-1, 1) if self.scalar else np.atleast_2d(g)
+
+    def winners(self, gammas):
+        """G x T index of the lowest-scoring config per gamma and trace (ties: first config)."""
+        G = self.gamma_matrix(gammas)
+        shift = G @ self.log_coeff                          # G x C
+        block = max(1, BLOCK_ELEMS // max(1, self.log_score.size))
+        out = np.empty((len(G), len(self.traces)), dtype=np.intp)
+        for i in range(0, len(G), block):
+            out[i:i + block] = np.argmin(self.log_score[None, :, :] + shift[i:i + block, None, :], axis=2)
+        return out
+
+    def metrics(self, win):
+        # Geomeans of the winners' M/M_base and SER ratio and the per-config counts of each row of win (G x T)
+        rows = np.arange(len(self.traces))
+        log_m, valid = self.log_M_norm[rows, win], self.M_valid[rows, win]
+        n = valid.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            M_norm_gm = np.where(n > 0, np.exp(log_m.sum(axis=1) / n), np.nan)
+        rel_deg_gm = np.exp(self.log_ratio[rows, win].mean(axis=1))
+        counts = np.stack([(win == c).sum(axis=1) for c in range(len(self.configs))], axis=1)
+        return {"M_norm_gm": M_norm_gm, "M_impr": 1.0 - M_norm_gm, "rel_deg_gm": rel_deg_gm, "counts": counts}
+
+    def grid(self, gammas) -> list:
+        """Sweep over a grid: one dict per gamma as the scripts' loops built it."""
+        m = self.metrics(self.winners(gammas))
+        return [{"gamma": g, "M_impr": m["M_impr"][i], "rel_deg_gm": m["rel_deg_gm"][i], "M_norm_gm": m["M_norm_gm"][i],
+                 "counts": dict(zip(self.configs, m["counts"][i].tolist()))} for i, g in enumerate(gammas)]
+
+    def curve(self, start, end) -> dict:
+        """
+        Exact sweep of gamma = start + s * (end - start), s in [0, 1]: arrays over the
+        segments between consecutive selection breakpoints ("lo", "hi": gamma at the
+        segment ends; "s_lo", "s_hi") with the metrics() of each segment.
+        """
+        start, end = self.gamma_matrix(start)[0], self.gamma_matrix(end)[0]
+        a = self.log_score + start @ self.log_coeff          # T x C: line intercepts in s
+        b = (end - start) @ self.log_coeff                   # C: slopes, shared by every trace
+        T, C = a.shape
+
+        # Candidate breakpoints: crossings of every config pair inside (0, 1), per trace
+        i, j = np.triu_indices(C, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cross = (a[:, j] - a[:, i]) / (b[i] - b[j])
+        cross = np.sort(np.where(np.isfinite(cross) & (cross > 0) & (cross < 1), cross, 1.0), axis=1)
+        bounds = np.concatenate([np.zeros((T, 1)), cross, np.ones((T, 1))], axis=1)
+        lo, hi = bounds[:, :-1], bounds[:, 1:]
+        win = np.argmin(a[:, None, :] + ((lo + hi) / 2)[:, :, None] * b, axis=2)   # T x P
+
+        # Zero-length intervals (repeated crossings) keep the winner of the interval before
+        nonempty = hi > lo
+        first = np.argmax(nonempty, axis=1)
+        win[:, 0] = win[np.arange(T), first]
+        fill = np.maximum.accumulate(np.where(nonempty, np.arange(nonempty.shape[1]), 0), axis=1)
+        win = np.take_along_axis(win, fill, axis=1)
+
+        # Selection changes as events (s, trace, old, new), applied to running sums in s order
+        t_ev, p_ev = np.nonzero(win[:, 1:] != win[:, :-1])
+        s_ev = lo[t_ev, p_ev + 1]
+        old, new = win[t_ev, p_ev], win[t_ev, p_ev + 1]
+        order = np.argsort(s_ev, kind="stable")
+        t_ev, s_ev, old, new = t_ev[order], s_ev[order], old[order], new[order]
+
+        w0 = win[:, 0]
+        rows = np.arange(T)
+        sum_m = np.concatenate([[self.log_M_norm[rows, w0].sum()],
+                                self.log_M_norm[t_ev, new] - self.log_M_norm[t_ev, old]]).cumsum()
+        n_m = np.concatenate([[self.M_valid[rows, w0].sum()],
+                              self.M_valid[t_ev, new].astype(int) - self.M_valid[t_ev, old]]).cumsum()
+        sum_r = np.concatenate([[self.log_ratio[rows, w0].sum()],
+                                self.log_ratio[t_ev, new] - self.log_ratio[t_ev, old]]).cumsum()
+        delta = np.zeros((len(t_ev) + 1, C), dtype=int)
+        delta[0] = np.bincount(w0, minlength=C)
+        np.subtract.at(delta[1:], (np.arange(len(t_ev)), old), 1)
+        np.add.at(delta[1:], (np.arange(len(t_ev)), new), 1)
+        counts = delta.cumsum(axis=0)
+
+        # Events at the same s form one breakpoint: keep the state after the last of them
+        s_break, last = np.unique(s_ev[::-1], return_index=True)
+        keep = np.concatenate([[0], len(s_ev) - last])
+        s_lo = np.concatenate([[0.0], s_break])
+        s_hi = np.concatenate([s_break, [1.0]])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            M_norm_gm = np.where(n_m[keep] > 0, np.exp(sum_m[keep] / n_m[keep]), np.nan)
+        to_gamma = lambda s: start + np.outer(s, end - start) if not self.scalar else start[0] + s * (end - start)[0]
+        return {"s_lo": s_lo, "s_hi": s_hi, "lo": to_gamma(s_lo), "hi": to_gamma(s_hi),
+                "M_norm_gm": M_norm_gm, "M_impr": 1.0 - M_norm_gm, "rel_deg_gm": np.exp(sum_r[keep] / T),
+                "counts": counts[keep]}
+
+    def knee(self, curve) -> int:
+        """Segment farthest from the line through the first and last segments' (rel_deg_gm, M_impr)."""
+        x, y = curve["rel_deg_gm"], curve["M_impr"]
+        return int(np.argmax(point_line_distance(x, y, x[0], y[0], x[-1], y[-1])))
+
+    def selections(self, gamma) -> dict:
+        """{trace: {"cfg", "M", "ratio"}} of the winners at one gamma."""
+        win = self.winners([gamma])[0]
+        return {t: {"cfg": self.configs[c], "M": float(self.M[i, c]), "ratio": float(self.ratio[i, c])}
+                for i, (t, c) in enumerate(zip(self.traces, win))}
@@ -1,80 +1,418 @@
 import sys
+import os
+import re
+import stat
+import glob
+import json
 import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from manifest import atomic_write
+from artifacts import open_artifact
 
+BLOCK_BYTES = 4 * 1024 * 1024
+DATA_PAD = b",0000000000000000"
+COMMA, NEWLINE, MINUS, ZERO = ord(","), ord("\n"), ord("-"), ord("0")
+SPACES = [ord(c) for c in " \t\v\f"]
+CMD_NAMES = ["REFab", "REF", "REFA", "REFpb", "REFsb", "RD", "WR", "ACT"]
+HISTOGRAMS = ["ranks", "bankgroups", "banks", "bank_acts"]
 
-def convert_ramulator_to_drampower(input_filename, output_filename, rank_num=2, trfc=710):
-    refresh_end_time = 0
-    last_ts = 0
 
-    with open(input_filename, 'r') as f_in, open(output_filename, 'w') as f_out:
+def read_blocks(f_in, block_bytes=BLOCK_BYTES):
+    """
+    Fixed-size uint8 blocks that always end on a line boundary, with the field
+    whitespace that the per-field strip() would drop already removed.
+    """
+    while True:
+        block = f_in.read(block_bytes)
+        if not block:
+            return
+        block += f_in.readline()
+        if b"\r" in block:
+            block = block.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        if not block.endswith(b"\n"):
+            block += b"\n"
+        # Common case: ", "-separated fields, where deleting every space is exact
+        compact = block.translate(None, b" ")
+        if len(block) - len(compact) == block.count(b", ") and not any(bytes([c]) in block for c in SPACES[1:]):
+            yield np.frombuffer(compact, dtype=np.uint8)
+            continue
+        buf = np.frombuffer(block, dtype=np.uint8)
+        is_space = np.isin(buf, SPACES)
+        # Whitespace between two non-separator bytes is part of a field and must stay
+        kept = np.flatnonzero(~is_space)
+        gap = np.flatnonzero(np.diff(kept) > 1)
+        left, right = buf[kept[gap]], buf[kept[gap + 1]]
+        sep = lambda b: (b == COMMA) | (b == NEWLINE)
+        if np.any(~sep(left) & ~sep(right)):
+            block = b"\n".join(b",".join(p.strip() for p in line.split(b",")) for line in block.split(b"\n"))
+            yield np.frombuffer(block, dtype=np.uint8)
+        else:
+            yield buf[kept]
 
-        for line in f_in:
-            parts = [p.strip() for p in line.split(',')]
-            if len(parts) < 8:
-                continue
+def parse_block(buf):
+    """
+    Locates the lines with exactly 8 fields (shorter lines are skipped).
+    Returns (start, bounds): bounds[j] is the offset of the comma after
+    field j for j < 7 and of the newline for j = 7.
+    """
+    nl = np.flatnonzero(buf == NEWLINE).astype(np.int32)
+    starts = np.concatenate(([0], nl[:-1] + 1)).astype(np.int32)
+    commas = np.flatnonzero(buf == COMMA).astype(np.int32)
+    if commas.size == 7 * nl.size:
+        bounds = np.empty((8, nl.size), dtype=np.int32)
+        bounds[:7] = commas.reshape(-1, 7).T
+        bounds[7] = nl
+        if np.all(bounds[0] >= starts) and np.all(bounds[6] < nl):
+            return starts, bounds
+    # Irregular block: count the commas of every line
+    line_of = np.searchsorted(nl, commas)
+    counts = np.bincount(line_of, minlength=nl.size)
+    if np.any(counts > 7):
+        bad = np.argmax(counts > 7)
+        raise ValueError(f"Too many fields: {buf[starts[bad]:nl[bad]].tobytes()!r}")
+    keep = counts == 7
+    bounds = np.empty((8, int(keep.sum())), dtype=np.int32)
+    bounds[:7] = commas[keep[line_of]].reshape(-1, 7).T
+    bounds[7] = nl[keep]
+    return starts[keep], bounds
 
-            ts_str, cmd, _, rank, bg, bank, row, col = parts
-            ts = int(ts_str)
+def _int_or(text, default):
+    if default is None:
+        return int(text)
+    try:
+        return int(text)
+    except ValueError:
+        return default
 
-            # ---- Enforce refresh blocking ----
-            if ts < refresh_end_time:
-                ts = refresh_end_time
+def parse_int_column(buf, start, stop, default=None):
+    """
+    Decimal integers in buf[start:stop] -> (values, canonical), where canonical marks
+    fields that read back unchanged through str(int(field)). Unusual fields go
+    through int(), which raises just like the per-line parser did unless a
+    default is given for unparsable fields.
+    """
+    def fallback():
+        values = [_int_or(buf[s:e].tobytes(), default) for s, e in zip(start.tolist(), stop.tolist())]
+        return np.array(values, dtype=np.int64), np.zeros(start.size, dtype=bool)
 
-            propagate_refresh = False
+    length = stop - start
+    width = int(length.max()) if length.size else 0
+    if width == 0 or length.min() == 0 or width > 18:
+        return fallback()
+    cols = np.arange(width)
+    sign = (buf[start] == MINUS) & (length > 1)
+    valid = cols >= (width - length + sign)[:, None]
+    digits = buf[np.maximum(stop[:, None] - width + cols, 0)].astype(np.int64) - ZERO
+    if not np.all(((digits >= 0) & (digits <= 9)) | ~valid):
+        return fallback()
+    values = np.where(valid, digits, 0) @ (10 ** (width - 1 - cols)).astype(np.int64)
+    lead = buf[start + sign]
+    canonical = (lead != ZERO) | ((length == 1) & ~sign)
+    return np.where(sign, -values, values), canonical
 
-            # ---- Command Mapping ----
-            if cmd in ["REFab", "REF"]:
-                cmd = "REFA"
-                propagate_refresh = True
-            elif cmd == "REFpb":
-                cmd = "REFB"
-            elif cmd == "REFsb":
-                cmd = "REFSB"
+def command_masks(buf, bounds, names=CMD_NAMES):
+    # {name: mask} for the command column, compared byte column by byte column
+    start = bounds[0] + 1
+    length = bounds[1] - start
+    head = [buf[np.minimum(start + j, buf.size - 1)] for j in range(max(map(len, names)))]
+    masks = {}
+    for name in names:
+        match = length == len(name)
+        for j, ch in enumerate(name.encode()):
+            match &= head[j] == ch
+        masks[name] = match
+    return masks
+
+def count_commands(buf, bounds):
+    # {name: count} over the command column; names are packed into one integer
+    # each so the counting is a plain integer unique (8-byte words, any length)
+    start = bounds[0] + 1
+    length = bounds[1] - start
+    width = -(-max(int(length.max()), 1) // 8) * 8
+    cols = np.arange(width)
+    head = buf[np.minimum(start[:, None] + cols, buf.size - 1)]
+    head[cols >= length[:, None]] = 0
+    words = np.ascontiguousarray(head).view("<u8")
+    if words.shape[1] == 1:
+        keys, counts = np.unique(words[:, 0], return_counts=True)
+        keys = keys[:, None]
+    else:
+        keys, counts = np.unique(words, axis=0, return_counts=True)
+    return {keys[i].tobytes().rstrip(b"\0").decode(): int(c) for i, c in enumerate(counts)}
+
+def count_tuples(fields):
+    # {(a, b, ...): count} for small non-negative integer columns
+    dims = [int(f.max()) + 1 for f in fields]
+    flat = np.ravel_multi_index(fields, dims)
+    if np.prod(dims, dtype=np.float64) <= 1 << 22:
+        counts = np.bincount(flat, minlength=int(np.prod(dims)))
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(flat, return_counts=True)
+    return dict(zip(zip(*np.unravel_index(keys, dims)), counts.tolist()))
+
+def update_stats(stats, buf, bounds, ts, clamped, cmd):
+    """
+    Accumulates the sidecar summary for one block: command counts, per rank /
+    bank group / bank activity (-1 fields excluded), timestamps and tRFC delays.
+    """
+    stats["commands"].update(count_commands(buf, bounds))
+
+    rank, bg, bank = (parse_int_column(buf, bounds[j - 1] + 1, bounds[j], default=-1)[0] for j in (3, 4, 5))
+    for key, sel, hist in [((rank,), rank >= 0, "ranks"),
+                           ((rank, bg), (rank >= 0) & (bg >= 0), "bankgroups"),
+                           ((rank, bg, bank), (rank >= 0) & (bg >= 0) & (bank >= 0), "banks"),
+                           ((rank, bg, bank), (rank >= 0) & (bg >= 0) & (bank >= 0) & cmd["ACT"], "bank_acts")]:
+        if not sel.any():
+            continue
+        for row, count in count_tuples([k[sel] for k in key]).items():
+            stats[hist][".".join(map(str, row))] += count
+
+    if stats["first_ts"] is None:
+        stats["first_ts"] = int(clamped[0])
+    stats["last_ts"] = int(clamped[-1])
+    delayed = clamped > ts
+    stats["delayed"] += int(delayed.sum())
+    stats["delay_cycles"] += int((clamped - ts)[delayed].sum())
+    stats["lines"] += int(ts.size)
+
+def stats_path(output_filename):
+    # <name>.csv -> <name>.stats.json next to the DRAMPower trace
+    return os.path.splitext(output_filename)[0] + ".stats.json"
+
+def sort_stats(stats):
+    stats["commands"] = dict(sorted(stats["commands"].items()))
+    for hist in HISTOGRAMS:
+        stats[hist] = dict(sorted(stats[hist].items(), key=lambda kv: tuple(map(int, kv[0].split(".")))))
+    return stats
+
+def merge_stats(parts):
+    # Per-channel sidecars -> one summary with the same layout, plus the channel inputs
+    merged = {"lines": 0, "delayed": 0, "delay_cycles": 0, "commands": Counter(),
+              **{hist: Counter() for hist in HISTOGRAMS}}
+    for part in parts:
+        for key in ["lines", "delayed", "delay_cycles"]:
+            merged[key] += part[key]
+        for key in ["commands"] + HISTOGRAMS:
+            merged[key].update(part[key])
+    starts = [p["first_ts"] for p in parts if p["first_ts"] is not None]
+    merged.update({
+        "first_ts": min(starts) if starts else None,
+        "last_ts": max((p["last_ts"] for p in parts if p["last_ts"] is not None), default=None),
+        "end_ts": max(p["end_ts"] for p in parts),
+        "rank_num": parts[0]["rank_num"], "trfc": parts[0]["trfc"],
+        "channels": [p["input"] for p in parts],
+    })
+    return sort_stats(merged)
+
+def channel_files(base, ext=""):
+    # [(channel, path)] for every <base>.chN<ext>, in channel order
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"\.ch(\d+)" + re.escape(ext) + "$")
+    found = []
+    for path in glob.glob(glob.escape(base) + ".ch*" + ext):
+        m = pattern.match(os.path.basename(path))
+        if m:
+            found.append((int(m.group(1)), path))
+    return sorted(found)
+
+def channel_output(path, channel):
+    # <name>.csv -> <name>.chN.csv
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.ch{channel}{ext}"
+
+def config_org(config_file):
+    # (channels, ranks) from the DRAM org of a Ramulator2 YAML; None where unset
+    import yaml
+    with open(config_file) as f:
+        org = yaml.safe_load(f)["MemorySystem"]["DRAM"].get("org", {})
+    return org.get("channel"), org.get("rank")
+
+def refresh_clamp(ts, is_ref, refresh_end_time, trfc):
+    """
+    Array form of "a command issued before the last all-bank refresh finished waits
+    for it". Refresh k ends at E_k = trfc + max(t_k, E_{k-1}), which unrolls to
+    (k+1)*trfc + max(E_-1, cummax(t_j - j*trfc)). Returns (clamped ts, new E).
+    """
+    ref_pos = np.flatnonzero(is_ref)
+    if ref_pos.size == 0:
+        return np.maximum(ts, refresh_end_time), refresh_end_time
+    k = np.arange(ref_pos.size, dtype=np.int64)
+    ends = (k + 1) * trfc + np.maximum(refresh_end_time, np.maximum.accumulate(ts[ref_pos] - k * trfc))
+    # End of the latest refresh strictly before each command
+    prev = np.cumsum(is_ref) - is_ref - 1
+    before = np.where(prev >= 0, ends[np.maximum(prev, 0)], refresh_end_time)
+    return np.maximum(ts, before), int(ends[-1])
+
+def format_block(buf, start, bounds, ts, keep_ts, cmd, rank_num):
+    """
+    Builds the DRAMPower rows as (offset, length) segments into one source array
+    (block bytes, rewritten timestamps, constants) and gathers them in one pass.
+    """
+    n = ts.size
+    # Timestamps are copied from the input unless the clamp moved them
+    ts_off, ts_len = start.copy(), bounds[0] - start
+    moved = np.flatnonzero(~keep_ts)
+    ts_str = list(map(str, ts[moved].tolist()))
+    new_len = np.fromiter(map(len, ts_str), dtype=np.int32, count=moved.size)
+    ts_off[moved], ts_len[moved] = buf.size + np.cumsum(new_len) - new_len, new_len
+    ts_bytes = "".join(ts_str).encode()
 
-            # ---- Replace -1 placeholders ----
-            rank = '0' if rank == '-1' else rank
-            bg   = '0' if bg == '-1' else bg
-            bank = '0' if bank == '-1' else bank
-            row  = '0' if row == '-1' else row
-            col  = '0' if col == '-1' else col
+    consts = [b",0", b",REFB", b",REFSB", DATA_PAD, b"\n"] + [f",REFA,{r},0,0,0,0\n".encode() for r in range(rank_num)]
+    c_len = np.array([len(c) for c in consts], dtype=np.int32)
+    c_off = buf.size + len(ts_bytes) + np.cumsum(c_len) - c_len
+    src = np.concatenate([buf, np.frombuffer(ts_bytes + b"".join(consts), dtype=np.uint8)])
 
-            # ---- Handle Refresh ----
-            if cmd == "REFA":
-                refresh_end_time = ts + trfc
+    # One row of segments per slot; empty segments are skipped by the gather
+    slots = max(9, 2 * rank_num)
+    seg_off = np.zeros((slots, n), dtype=np.int32)
+    seg_len = np.zeros((slots, n), dtype=np.int32)
+    seg_off[0], seg_len[0] = ts_off, ts_len
 
-                for r in range(rank_num):
-                    out_row = [str(ts), cmd, str(r), '0', '0', '0', '0']
-                    f_out.write(",".join(out_row) + "\n")
+    # ",CMD" copied from the input unless it is renamed
+    seg_off[1], seg_len[1] = bounds[0], bounds[1] - bounds[0]
+    for name, c in [("REFpb", 1), ("REFsb", 2)]:
+        np.putmask(seg_off[1], cmd[name], c_off[c])
+        np.putmask(seg_len[1], cmd[name], c_len[c])
 
-            else:
-                out_row = [str(ts), cmd, rank, bg, bank, row, col]
+    # Rank, bank group, bank, row, column (the channel field is dropped); -1 -> 0
+    for slot, j in enumerate(range(3, 8), start=2):
+        comma = bounds[j - 1]
+        seg_off[slot], seg_len[slot] = comma, bounds[j] - comma
+        sel = (seg_len[slot] == 3) & (buf[comma + 1] == MINUS) & (buf[np.minimum(comma + 2, buf.size - 1)] == ZERO + 1)
+        np.putmask(seg_off[slot], sel, c_off[0])
+        np.putmask(seg_len[slot], sel, c_len[0])
 
-                if cmd in ["RD", "WR"]:
-                    out_row.append("0000000000000000")
+    data = cmd["RD"] | cmd["WR"]
+    seg_off[7], seg_len[7] = c_off[3], np.where(data, c_len[3], 0)
+    seg_off[8], seg_len[8] = c_off[4], c_len[4]
 
-                f_out.write(",".join(out_row) + "\n")
+    # An all-bank refresh becomes one REFA per rank
+    ref = np.flatnonzero(cmd["REFA"])
+    if ref.size:
+        seg_len[:, ref] = 0
+        for r in range(rank_num):
+            seg_off[2 * r, ref], seg_len[2 * r, ref] = ts_off[ref], ts_len[ref]
+            seg_off[2 * r + 1, ref], seg_len[2 * r + 1, ref] = c_off[5 + r], c_len[5 + r]
 
-            last_ts = ts
+    # Gather with 32-bit indices (blocks are far below 2 GB)
+    seg_off, seg_len = seg_off.T.ravel(), seg_len.T.ravel()
+    dst = np.cumsum(seg_len, dtype=np.int32) - seg_len
+    idx = np.arange(int(seg_len.sum()), dtype=np.int32) + np.repeat(seg_off - dst, seg_len)
+    return src[idx].tobytes()
+
+
+def convert_ramulator_to_drampower(input_filename, output_filename, rank_num=2, trfc=710, block_bytes=BLOCK_BYTES,
+                                   stats_filename=None):
+    refresh_end_time = 0
+    last_ts = 0
+    stats = {"lines": 0, "commands": Counter(), "ranks": Counter(), "bankgroups": Counter(),
+             "banks": Counter(), "bank_acts": Counter(), "first_ts": None, "last_ts": None,
+             "delayed": 0, "delay_cycles": 0}
+
+    # Block-at-a-time: memory is bounded by block_bytes regardless of trace length
+    # Regular files go through a temp name so a crash never leaves a truncated CSV behind;
+    # a named pipe (automation.py --pipe-stages) is written directly
+    pipe = os.path.exists(output_filename) and stat.S_ISFIFO(os.stat(output_filename).st_mode)
+    with open_artifact(input_filename) as f_in, (open(output_filename, 'wb') if pipe else atomic_write(output_filename, 'wb')) as f_out:
+
+        for buf in read_blocks(f_in, block_bytes):
+            start, bounds = parse_block(buf)
+            if start.size == 0:
+                continue
+
+            ts, canonical = parse_int_column(buf, start, bounds[0])
+
+            # ---- Command Mapping ----
+            cmd = command_masks(buf, bounds)
+            cmd["REFA"] = cmd["REFA"] | cmd["REFab"] | cmd["REF"]
+
+            # ---- Enforce refresh blocking ----
+            clamped, refresh_end_time = refresh_clamp(ts, cmd["REFA"], refresh_end_time, trfc)
+            update_stats(stats, buf, bounds, ts, clamped, cmd)
+
+            f_out.write(format_block(buf, start, bounds, clamped, canonical & (clamped == ts), cmd, rank_num))
+            last_ts = int(clamped[-1])
 
         # ---- Add END with sufficient slack ----
         end_time = last_ts + trfc + 100
-        f_out.write(f"{end_time},END,0,0,0,0,0\n")
+        f_out.write(f"{end_time},END,0,0,0,0,0\n".encode())
+
+    # ---- Sidecar summary (read by graph_v4.py instead of re-scanning the .ch0) ----
+    stats.update({"input": os.path.basename(input_filename), "rank_num": rank_num, "trfc": trfc, "end_ts": end_time})
+    with atomic_write(stats_filename or stats_path(output_filename)) as f_stats:
+        json.dump(sort_stats(stats), f_stats, indent=2)
 
     print(f"Conversion complete. Last timestamp: {last_ts}")
+    return stats
+
+def convert_channels(trace_base, output_filename, rank_num=2, trfc=710, block_bytes=BLOCK_BYTES,
+                     jobs=None, channels=None):
+    """
+    Converts every <trace_base>.chN written by the TraceRecorder, one worker process
+    per channel up to `jobs` (default: all cores). A single channel goes to
+    output_filename as before; several go to <output>.chN.csv, with the merged
+    command statistics in <output>.stats.json. Returns the CSV paths in channel order.
+    """
+    inputs = channel_files(trace_base)
+    if not inputs:
+        raise FileNotFoundError(f"No {trace_base}.chN traces found")
+    if channels and len(inputs) != channels:
+        print(f"Warning: config has {channels} channels but {len(inputs)} traces were found")
+
+    # Drop outputs of the other layout so downstream steps never mix runs
+    if len(inputs) > 1:
+        stale = [output_filename]
+    else:
+        stale = [p for _, p in channel_files(os.path.splitext(output_filename)[0], ".csv")]
+        stale += [stats_path(p) for p in stale]
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+
+    if len(inputs) == 1:
+        convert_ramulator_to_drampower(inputs[0][1], output_filename, rank_num, trfc, block_bytes)
+        return [output_filename]
+
+    outputs = [channel_output(output_filename, ch) for ch, _ in inputs]
+    n = len(inputs)
+    with ProcessPoolExecutor(max_workers=min(n, jobs or os.cpu_count() or 1)) as pool:
+        parts = list(pool.map(convert_ramulator_to_drampower, [p for _, p in inputs], outputs,
+                              [rank_num] * n, [trfc] * n, [block_bytes] * n))
+    with atomic_write(stats_path(output_filename)) as f_stats:
+        json.dump(merge_stats(parts), f_stats, indent=2)
+    print(f"Converted {n} channels: {', '.join(os.path.basename(p) for p in outputs)}")
+    return outputs
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("input", help="Ramulator2 trace input")
+    parser.add_argument("input", help="Ramulator2 trace input (the TraceRecorder path with --channels)")
     parser.add_argument("output", help="DRAMPower CSV output")
-    parser.add_argument("--rank_num", type=int, default=2, help="Number of ranks (default=2)")
+    parser.add_argument("--rank_num", type=int, default=None, help="Number of ranks (default: --config, else 2)")
     parser.add_argument("--trfc", type=int, default=710, help="tRFC cycles (default=710)")
+    parser.add_argument("--block_bytes", type=int, default=BLOCK_BYTES, help="Input bytes parsed per block (default=4M)")
+    parser.add_argument("--stats", default=None, help="Command statistics JSON (default=<output>.stats.json)")
+    parser.add_argument("--channels", action="store_true", help="Convert every <input>.chN in parallel")
+    parser.add_argument("--config", default=None, help="Ramulator2 YAML to take the rank and channel counts from")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for --channels (default: all cores)")
 
     args = parser.parse_args()
+    n_channels, n_ranks = config_org(args.config) if args.config else (None, None)
+    if args.rank_num is None:
+        args.rank_num = n_ranks or 2
 
-    convert_ramulator_to_drampower(
-        args.input,
-        args.output,
-        rank_num=args.rank_num,
-        trfc=args.trfc
-    )
\ No newline at end of file
+    if args.channels:
+        convert_channels(args.input, args.output, rank_num=args.rank_num, trfc=args.trfc,
+                         block_bytes=args.block_bytes, jobs=args.jobs, channels=n_channels)
+    else:
+        convert_ramulator_to_drampower(
+            args.input,
+            args.output,
+            rank_num=args.rank_num,
+            trfc=args.trfc,
+            block_bytes=args.block_bytes,
+            stats_filename=args.stats
+        )
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from artifacts import open_artifact
+from simpoint import chunk_weight
+
+# SQLite index of the finished runs under a result root, one row per run directory
+# (<trace>/<trace>_<chunk_tag>/<..._32ms>) with the raw report counters and the
+# workload features as columns. update() re-parses only directories whose listing
+# (names, sizes, mtimes) or simpoints.json changed since the last update, so
+# graph_v4.py, test_pareto.py and DRAM_Project load thousands of runs without
+# re-reading their reports. Derived metrics that depend on a script's constants
+# (clock, device size: M, SER) are left to the scripts.
+DB_NAME = "results.sqlite"
+SCHEMA_VERSION = 2   # bump when the columns or the parsing change; the store is rebuilt
+PARALLEL_MIN = 32    # changed directories before update() parses on a process pool
+
+# "key: value" (Ramulator2 YAML stats) and "key -> value" (DRAMPower) lines, one scan per report
+# (keys may contain single spaces, e.g. "Total Energy"; anything after the number is ignored)
+STAT_RE = re.compile(r"^[ \t-]*(\w+(?: \w+)*)[ \t]*(?::|->)[ \t]*([-+]?[\d.]+(?:[eE][-+]?\d+)?)\b", re.MULTILINE)
+VALUE_PATTERN = r"[ \t]*(?::|->)[ \t]*([-+]?[\d.]+(?:[eE][-+]?\d+)?)\b"
+# Column <- report keys, in order of preference (statistic names differ between Ramulator2 versions)
+REPORT_KEYS = {
+    "lat_cycles":    ("avg_read_latency_0",),
+    "cycles":        ("memory_system_cycles",),
+    "reads":         ("num_read_reqs_0", "number_of_read_requests"),
+    "writes":        ("num_write_reqs_0", "number_of_write_requests"),
+    "row_hits":      ("row_hits_0", "row_hits"),
+    "row_misses":    ("row_misses_0", "row_misses"),
+    "row_conflicts": ("row_conflicts_0", "row_conflicts"),
+    "llc_misses":    ("llc_read_misses", "cache_read_misses"),
+    "llc_access":    ("llc_read_access", "cache_read_access"),
+}
+KEY_RES = {}   # key -> compiled "key: value" search; a literal prefix keeps it a fast scan even when the key is missing
+INTERVAL_RE = re.compile(r"(\d+)ms")
+FEATURES = ["Incoming_Req_Per_Cycle", "Read_Intensity", "RB_Locality", "RB_Conflict_Rate", "LLC_Miss_Rate"]
+# refab is NULL when neither the stats sidecar nor the command trace is left
+COLUMNS = (["dir", "trace_dir", "chunk", "cfg", "interval_ms", "sig", "weight", "energy"]
+           + list(REPORT_KEYS) + ["refab"] + FEATURES)
+
+
+def typed(value):
+    return int(value) if value.isdigit() else float(value)
+
+def find_stat(text, key):
+    # First "key: value" / "key -> value" of a report, or None; the key must not be the tail of a longer name
+    regex = KEY_RES.get(key)
+    if regex is None:
+        regex = KEY_RES[key] = re.compile(re.escape(key) + VALUE_PATTERN)
+    m = regex.search(text)
+    while m and m.start() and (text[m.start() - 1].isalnum() or text[m.start() - 1] == "_"):
+        m = regex.search(text, m.start() + 1)
+    return typed(m.group(1)) if m else None
+
+def parse_stats(text: str, keys=None) -> dict:
+    """
+    Numeric statistics of a report: {key: int or float}. A key that occurs more
+    than once (e.g. per controller) keeps its first value. keys=None tokenizes
+    every line in one scan; with keys, only those are looked up (one literal-prefixed
+    search per key, far cheaper than the scan when a few statistics are needed).
+    """
+    if keys is not None:
+        stats = {}
+        for key in keys:
+            value = find_stat(text, key)
+            if value is not None:
+                stats[key] = value
+        return stats
+    stats = {}
+    for key, value in STAT_RE.findall(text):
+        if key not in stats:
+            stats[key] = typed(value)
+    return stats
+
+def report_columns(text: str) -> dict:
+    # REPORT_KEYS columns of a Ramulator2 report, looking up variants only until one is found; 0.0 where none is
+    columns = {}
+    for col, keys in REPORT_KEYS.items():
+        value = None
+        for key in keys:
+            value = find_stat(text, key)
+            if value is not None:
+                break
+        columns[col] = float(value or 0.0)
+    return columns
+
+def report_files(names):
+    # (DRAMPower report, Ramulator2 report, stats sidecar, channel-0 command trace) of a run directory
+    pick = lambda cond: next((n for n in sorted(names) if cond(n)), None)
+    return (pick(lambda n: n.endswith("drampower_report.txt")), pick(lambda n: "ramulator2_report" in n),
+            pick(lambda n: n.endswith("drampower_trace_input.stats.json")),
+            pick(lambda n: "ramulator2_output.txt.ch0" in n))
+
+def dir_signature(path, entries):
+    # Listing of the run directory plus the simpoints.json that sets its chunk's weight
+    parts = [f"{e.name}:{e.stat().st_size}:{e.stat().st_mtime_ns}" for e in sorted(entries, key=lambda e: e.name)]
+    simpoints = os.path.join(os.path.dirname(os.path.dirname(path)), "simpoints.json")
+    if os.path.exists(simpoints):
+        st = os.stat(simpoints)
+        parts.append(f"simpoints.json:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+def parse_run(path, names):
+    # -> column dict of one run directory, or None if it has no pair of reports
+    dp_file, ram_file, stats_file, ram_out_file = report_files(names)
+    m = INTERVAL_RE.findall(os.path.basename(path))
+    if not dp_file or not ram_file or not m:
+        return None
+    with open(os.path.join(path, dp_file)) as f:
+        row = {"energy": float(find_stat(f.read(), "Total Energy") or 0.0)}
+    with open(os.path.join(path, ram_file)) as f:
+        row.update(report_columns(f.read()))
+
+    # Command counts come from the ram2drampower.py sidecar; older runs fall back to a scan
+    row["refab"] = None
+    if stats_file:
+        with open(os.path.join(path, stats_file)) as f:
+            row["refab"] = json.load(f)["commands"].get("REFab", 0)
+    elif ram_out_file:
+        with open_artifact(os.path.join(path, ram_out_file), "r") as f:
+            row["refab"] = sum(1 for line in f if "REFab" in line)
+
+    total_reqs = row["reads"] + row["writes"]
+    denom_rb = row["row_hits"] + row["row_misses"] + row["row_conflicts"]
+    row.update({
+        "cfg": m[-1] + "ms",
+        "interval_ms": int(m[-1]),
+        "weight": chunk_weight(os.path.dirname(path)),
+        "Incoming_Req_Per_Cycle": total_reqs / row["cycles"] if row["cycles"] > 0 else 0,
+        "Read_Intensity": row["reads"] / total_reqs if total_reqs > 0 else 0,
+        "RB_Locality": row["row_hits"] / denom_rb if denom_rb > 0 else 0,
+        "RB_Conflict_Rate": row["row_conflicts"] / denom_rb if denom_rb > 0 else 0,
+        "LLC_Miss_Rate": row["llc_misses"] / row["llc_access"] if row["llc_access"] > 0 else 0,
+    })
+    return row
+
+def parse_run_safe(path, names):
+    # parse_run for a worker process: (row or None, error message or None)
+    try:
+        return parse_run(path, names), None
+    except (OSError, ValueError, KeyError) as e:
+        return None, str(e)
+
+
+class ResultsStore:
+    """
+    Run table of one result root, kept in <root>/results.sqlite (or db_path).
+    Directory names listed in `exclude` are skipped at any depth.
+    """
+
+    def __init__(self, root, db_path=None, exclude=()):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or os.path.join(self.root, DB_NAME)
+        self.exclude = set(exclude)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS runs")
+            self.db.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        types = {"dir": "TEXT PRIMARY KEY", "trace_dir": "TEXT", "chunk": "TEXT", "cfg": "TEXT", "sig": "TEXT",
+                 "interval_ms": "INTEGER", "refab": "REAL"}
+        columns = ", ".join(f"{c} {types.get(c, 'REAL NOT NULL')}" for c in COLUMNS)
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS runs ({columns})")
+        self.db.execute("CREATE INDEX IF NOT EXISTS runs_cfg ON runs (cfg)")
+        self.db.commit()
+
+    def run_dirs(self):
+        # (relative path, absolute path, entries) of every directory with both reports
+        for path, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if d not in self.exclude)
+            if any("ramulator2_report" in f for f in files) and any(f.endswith("drampower_report.txt") for f in files):
+                entries = [e for e in os.scandir(path) if e.is_file()]
+                yield os.path.relpath(path, self.root), path, entries
+
+    def update(self, verbose=False, jobs=None) -> dict:
+        """
+        Brings the table in line with the directory tree; returns the number of
+        parsed, unchanged and removed run directories. Changed directories are
+        parsed on `jobs` processes (default: all CPUs) when there are PARALLEL_MIN or more.
+        """
+        known = dict(self.db.execute("SELECT dir, sig FROM runs").fetchall())
+        seen, changed, parsed, failed = set(), [], 0, 0
+        for rel, path, entries in self.run_dirs():
+            seen.add(rel)
+            sig = dir_signature(path, entries)
+            if known.get(rel) != sig:
+                changed.append((rel, path, [e.name for e in entries], sig))
+
+        jobs = jobs or os.cpu_count() or 1
+        args = ([path for _, path, _, _ in changed], [names for _, _, names, _ in changed])
+        if jobs > 1 and len(changed) >= PARALLEL_MIN:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(parse_run_safe, *args, chunksize=max(1, len(changed) // (4 * jobs))))
+        else:
+            results = list(map(parse_run_safe, *args))
+
+        for (rel, path, _, sig), (row, error) in zip(changed, results):
+            if error and verbose:
+                print(f"Skipping {rel}: {error}")
+            if row is None:
+                failed += 1
+                self.db.execute("DELETE FROM runs WHERE dir = ?", (rel,))
+                continue
+            row.update({"dir": rel, "trace_dir": os.path.dirname(rel),
+                        "chunk": os.path.basename(os.path.dirname(path)), "sig": sig})
+            self.db.execute(f"INSERT OR REPLACE INTO runs ({', '.join(COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(COLUMNS))})", [row[c] for c in COLUMNS])
+            parsed += 1
+        removed = [d for d in known if d not in seen]
+        self.db.executemany("DELETE FROM runs WHERE dir = ?", [(d,) for d in removed])
+        self.db.commit()
+        return {"parsed": parsed, "unchanged": len(seen) - parsed - failed, "unreadable": failed, "removed": len(removed)}
+
+    def iter_runs(self, configs=None):
+        """
+        Rows as dicts, one per (chunk directory, cfg): the first run directory by name
+        if several match. configs (e.g. ['32ms', '48ms', '64ms']) limits the cfg values.
+        Rows are read from the cursor as they are consumed.
+        """
+        query = ("SELECT * FROM runs WHERE dir IN (SELECT MIN(dir) FROM runs GROUP BY trace_dir, cfg)"
+                 " ORDER BY trace_dir, dir")
+        for r in self.db.execute(query):
+            if not configs or r["cfg"] in configs:
+                yield dict(r)
+
+    def runs(self, configs=None) -> list:
+        return list(self.iter_runs(configs))
+
+    def close(self):
+        self.db.close()
+
+
+def load_runs(root, configs=None, exclude=(), refresh=True) -> list:
+    # Rows of the finished runs under root, re-parsing only what changed (refresh=False: table as is)
+    return list(stream_runs(root, configs, exclude, refresh))
+
+def stream_runs(root, configs=None, exclude=(), refresh=True):
+    # load_runs() one row at a time, for aggregation in constant memory
+    if not os.path.isdir(root):
+        return
+    store = ResultsStore(root, exclude=exclude)
+    try:
+        if refresh:
+            store.update()
+        yield from store.iter_runs(configs)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Index the finished runs under a result root into results.sqlite")
+    ap.add_argument("root", help="Result root (e.g. ../result)")
+    ap.add_argument("--db", help=f"Store location (default: <root>/{DB_NAME})")
+    ap.add_argument("--exclude", nargs="*", default=[], help="Directory names to skip")
+    ap.add_argument("--rebuild", action="store_true", help="Re-parse every run directory")
+    ap.add_argument("--jobs", type=int, default=0, help="Parser processes (default: all CPUs)")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    if args.rebuild:
+        db = args.db or os.path.join(args.root, DB_NAME)
+        if os.path.exists(db):
+            os.remove(db)
+    t0 = time.time()
+    store = ResultsStore(args.root, args.db, args.exclude)
+    counts = store.update(args.verbose, args.jobs)
+    t1 = time.time()
+    rows = store.runs()
+    print(f"{store.db_path}: {len(rows)} runs ({counts['parsed']} parsed, {counts['unchanged']} unchanged, "
+          f"{counts['unreadable']} unreadable, {counts['removed']} removed) in {t1 - t0:.2f}s; "
+          f"loaded in {(time.time() - t1) * 1000:.0f} ms")
+    store.close()
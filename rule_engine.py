@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+# Standalone evaluator of the hardware_rules.json that DRAM_Project extracts from the
+# base level tree (one rule per leaf: the path's "feature <=/> value" conditions and
+# the prediction). RuleTable rebuilds the tree from the shared path prefixes into
+# flat arrays (feature, threshold, left, right, leaf label per node) and walks all
+# rows one level per step with NumPy; no scikit-learn needed. Features are compared
+# as float32, as DecisionTreeClassifier does, so the labels match the tree's exactly.
+CHUNK_ROWS = 1 << 20
+
+# Features derived in DRAM_Project from the five measured ones
+DERIVED = {
+    "Traffic_Risk": (("Incoming_Req_Per_Cycle", "RB_Locality"), lambda req, loc: req * (1.0 - loc)),
+    "Conflict_Load": (("RB_Conflict_Rate", "Read_Intensity"), lambda conf, ri: conf * ri),
+}
+
+
+class RuleTable:
+    """
+    Flat decision table of a rule list. Node arrays: feature (column index, -1 for
+    a leaf), threshold, left ("<=" child), right (">" child) and label (index into
+    labels, -1 where no rule covers the node).
+    """
+
+    def __init__(self, rules):
+        self.features, self.labels = [], []
+        feature, threshold, left, right, label = [-1], [np.nan], [-1], [-1], [-1]
+
+        def child(side, node):
+            if side[node] < 0:
+                side[node] = len(feature)
+                for arr, v in ((feature, -1), (threshold, np.nan), (left, -1), (right, -1), (label, -1)):
+                    arr.append(v)
+            return side[node]
+
+        for r in rules:
+            node = 0
+            for cond in r["rules"]:
+                if cond["feature"] not in self.features:
+                    self.features.append(cond["feature"])
+                f, thr = self.features.index(cond["feature"]), float(cond["value"])
+                if feature[node] < 0 and label[node] >= 0:
+                    raise ValueError(f"Rule {r} continues below another rule's leaf")
+                if feature[node] < 0:
+                    feature[node], threshold[node] = f, thr
+                elif (feature[node], threshold[node]) != (f, thr):
+                    raise ValueError(f"Rules disagree on the split of node {node}: {cond}")
+                node = child(left if cond["op"] == "<=" else right, node)
+            if feature[node] >= 0 or label[node] >= 0:
+                raise ValueError(f"Rule {r} ends on an inner node or repeats another rule")
+            if r["prediction"] not in self.labels:
+                self.labels.append(r["prediction"])
+            label[node] = self.labels.index(r["prediction"])
+
+        self.feature = np.array(feature, dtype=np.int32)
+        self.threshold = np.array(threshold, dtype=np.float64)
+        self.left, self.right = np.array(left, dtype=np.int32), np.array(right, dtype=np.int32)
+        self.label = np.array(label, dtype=np.int32)
+        self.depth = max((len(r["rules"]) for r in rules), default=0)
+        # A split with one side and no rule under it leaves rows unlabelled
+        self.uncovered = int(((self.feature >= 0) & ((self.left < 0) | (self.right < 0))).sum())
+
+        # Walk arrays: leaves (NaN threshold, so always "right") and a trailing unlabelled
+        # node that stands for the missing children loop onto themselves
+        n = len(feature)
+        self.walk_feature = np.append(np.maximum(self.feature, 0), 0).astype(np.intp)
+        self.walk_threshold = np.append(self.threshold, np.nan)
+        leaf = np.append(self.feature < 0, True)
+        self.walk_left = np.where(leaf, np.arange(n + 1), np.append(np.where(self.left < 0, n, self.left), n))
+        self.walk_right = np.where(leaf, np.arange(n + 1), np.append(np.where(self.right < 0, n, self.right), n))
+        self.walk_label = np.append(self.label, -1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def matrix(self, columns: dict) -> np.ndarray:
+        # rows x features float32 matrix from {name: array}, deriving DERIVED features when missing
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        cols = []
+        for name in self.features:
+            if name in columns:
+                cols.append(np.asarray(columns[name], dtype=np.float64))
+            elif name in DERIVED and all(s in columns for s in DERIVED[name][0]):
+                src, fn = DERIVED[name]
+                cols.append(fn(*(np.asarray(columns[s], dtype=np.float64) for s in src)))
+            else:
+                raise KeyError(f"Feature {name} is missing from the input")
+        # A single-leaf tree has no conditions: one empty row per input row
+        return np.column_stack(cols).astype(np.float32) if cols else np.zeros((n_rows, 0), dtype=np.float32)
+
+    def predict_index(self, X: np.ndarray) -> np.ndarray:
+        """Label index per row of X (rows x self.features, float32); -1 where no rule applies."""
+        out = np.empty(len(X), dtype=np.int32)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = np.ascontiguousarray(X[start:start + CHUNK_ROWS])
+            x, base = chunk.ravel(), np.arange(len(chunk)) * chunk.shape[1]   # flat index of each row's first feature
+            node = np.zeros(len(base), dtype=np.intp)
+            for _ in range(self.depth):
+                go_left = x[base + self.walk_feature[node]] <= self.walk_threshold[node]
+                node = np.where(go_left, self.walk_left[node], self.walk_right[node])
+            out[start:start + len(base)] = self.walk_label[node]
+        return out
+
+    def predict(self, X: np.ndarray, missing="") -> np.ndarray:
+        names = np.array(self.labels + [missing], dtype=object)
+        return names[self.predict_index(X)]
+
+
+def read_table(path):
+    import pandas as pd
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+def write_table(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Label feature windows with hardware_rules.json (no scikit-learn)")
+    ap.add_argument("rules", help="hardware_rules.json from DRAM_Project")
+    ap.add_argument("input", nargs="?", help="CSV or Parquet of feature windows (one column per feature)")
+    ap.add_argument("-o", "--output", help="Labelled copy of the input (default: <input>.labelled.<ext>)")
+    ap.add_argument("--column", default="Predicted", help="Name of the label column to add")
+    ap.add_argument("--check", help="Existing label column to compare the rules against (e.g. Label)")
+    ap.add_argument("--bench", type=int, default=0, help="Also time the evaluation on this many random rows")
+    args = ap.parse_args()
+
+    table = RuleTable.load(args.rules)
+    print(f"{args.rules}: {len(table.label[table.label >= 0])} rules, {len(table.feature)} nodes, depth {table.depth}, "
+          f"features {', '.join(table.features)}" + (f"; {table.uncovered} uncovered branches" if table.uncovered else ""))
+
+    if args.input:
+        t0 = time.perf_counter()
+        df = read_table(args.input)
+        X = table.matrix({c: df[c].to_numpy() for c in df.columns})
+        t1 = time.perf_counter()
+        df[args.column] = table.predict(X)
+        t2 = time.perf_counter()
+        print(f"{len(df)} rows: read {t1 - t0:.2f}s, labelled {t2 - t1:.3f}s ({len(df) / max(t2 - t1, 1e-9) / 1e6:.1f} M rows/s)")
+        print("  " + ", ".join(f"{k}: {v}" for k, v in df[args.column].value_counts().sort_index().items()))
+        if args.check:
+            agree = (df[args.check].astype(str) == df[args.column]).mean()
+            print(f"  agreement with {args.check}: {agree * 100:.2f}%")
+        root, ext = os.path.splitext(args.input)
+        out = args.output or f"{root}.labelled{ext}"
+        write_table(df, out)
+        print(f"Saved: {out}")
+
+    if args.bench:
+        # Uniform over each feature's threshold range, widened by 10% on both sides. The
+        # DERIVED sources are always present, so a table without features still gets rows
+        rng = np.random.default_rng(0)
+        columns = {s: rng.uniform(0.0, 1.0, args.bench) for src, _ in DERIVED.values() for s in src}
+        for f, name in enumerate(table.features):
+            thr = table.threshold[table.feature == f]
+            lo, hi = thr.min(), thr.max()
+            columns[name] = rng.uniform(lo - 0.1 * abs(lo), hi + 0.1 * abs(hi), args.bench)
+        X = table.matrix(columns)
+        t0 = time.perf_counter()
+        table.predict_index(X)
+        dt = time.perf_counter() - t0
+        print(f"bench: {args.bench} rows in {dt:.3f}s ({args.bench / dt / 1e6:.1f} M rows/s)")
+        # A single-leaf tree (every training trace had the same winner) exports one rule without conditions
+        leaf = RuleTable([{"rules": [], "prediction": "leaf"}])
+        n_leaf = int((leaf.predict(leaf.matrix(columns)) == "leaf").sum())
+        print(f"single-leaf table: {n_leaf} of {args.bench} rows labelled")
+        if n_leaf != args.bench:
+            raise SystemExit("single-leaf table does not label every row")
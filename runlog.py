@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Per-stage run log: every pipeline stage appends one JSON line with its tags
+# (trace, chunk, interval, ...), wall and CPU time, peak RSS, bytes read/written
+# and exit status. External tools run under `runlog.py exec`, which reaps the child
+# with wait4() so concurrent stages (e.g. --pipe-stages) are measured separately.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.environ.get("PIPELINE_ROOT", os.path.join(BASE_DIR, ".."))
+LOG_PATH = os.environ.get("PIPELINE_RUN_LOG", os.path.join(WORK_DIR, "result", "run_log.jsonl"))
+# One id per batch, inherited by every process the batch starts
+RUN_ID = os.environ.setdefault("PIPELINE_RUN_ID", f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+
+def append(record: dict):
+    # A single O_APPEND write per line keeps records from parallel workers whole
+    os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+    fd = os.open(LOG_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (json.dumps(record) + "\n").encode())
+    finally:
+        os.close(fd)
+
+def proc_io(path: str) -> dict:
+    # rchar/wchar count every read()/write(), pipes included; {} where /proc is unavailable
+    try:
+        with open(path) as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except (OSError, ValueError):
+        return {}
+
+def record(stage: str, tags: dict, t0: float, wall: float, user: float, sys_: float, rss_kb: int,
+           read: int, written: int, exit_code: int, **extra):
+    append({"run": RUN_ID, "stage": stage, **{k: str(v) for k, v in tags.items()},
+            "start": round(t0, 3), "wall_s": round(wall, 4), "user_s": round(user, 4), "sys_s": round(sys_, 4),
+            "max_rss_mb": round(rss_kb / 1024, 1),
+            "read_bytes": read, "write_bytes": written, "exit": exit_code, **extra})
+
+def wrap(cmd: list, stage: str, **tags) -> list:
+    # cmd run under the instrumentation wrapper; stdio and exit status pass through
+    flags = [arg for k, v in tags.items() for arg in ("--tag", f"{k}={v}")]
+    return [sys.executable, os.path.abspath(__file__), "exec", "--stage", stage] + flags + ["--"] + list(cmd)
+
+def exec_stage(cmd: list, stage: str, tags: dict) -> int:
+    t0 = time.time()
+    try:
+        child = subprocess.Popen(cmd)
+    except OSError as e:
+        print(f"{stage}: {e}", file=sys.stderr)
+        record(stage, tags, t0, time.time() - t0, 0.0, 0.0, 0, 0, 0, 127, error=str(e))
+        return 127
+    signal.signal(signal.SIGTERM, lambda signum, frame: child.send_signal(signum))
+    # Wait without reaping so /proc/<pid>/io is still readable, then collect rusage
+    os.waitid(os.P_PID, child.pid, os.WEXITED | os.WNOWAIT)
+    io = proc_io(f"/proc/{child.pid}/io")
+    _, status, ru = os.wait4(child.pid, 0)
+    child.returncode = os.waitstatus_to_exitcode(status)
+    record(stage, tags, t0, time.time() - t0, ru.ru_utime, ru.ru_stime, ru.ru_maxrss,
+           io.get("rchar", ru.ru_inblock * 512), io.get("wchar", ru.ru_oublock * 512), child.returncode)
+    return child.returncode if child.returncode >= 0 else 128 - child.returncode
+
+@contextmanager
+def timed(stage: str, **tags):
+    # In-process stage (e.g. the energy model) on the calling thread; peak RSS is the process's
+    who = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+    io0, ru0, t0 = proc_io("/proc/thread-self/io"), resource.getrusage(who), time.time()
+    exit_code = 1
+    try:
+        yield
+        exit_code = 0
+    finally:
+        io1, ru1 = proc_io("/proc/thread-self/io"), resource.getrusage(who)
+        record(stage, tags, t0, time.time() - t0, ru1.ru_utime - ru0.ru_utime, ru1.ru_stime - ru0.ru_stime,
+               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               io1.get("rchar", 0) - io0.get("rchar", 0), io1.get("wchar", 0) - io0.get("wchar", 0), exit_code)
+
+
+def load(path: str, run: str = None) -> list:
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue   # a line cut short by a killed writer
+    if run == "last" and records:
+        run = records[-1]["run"]
+    return [r for r in records if not run or r["run"] == run]
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def outliers(records: list, k: float = 5.0) -> list:
+    """
+    Records whose wall time exceeds their stage's median by more than k robust standard
+    deviations (1.4826 * MAD) and by at least 50%, slowest first.
+    """
+    by_stage = defaultdict(list)
+    for r in records:
+        by_stage[r["stage"]].append(r)
+    found = []
+    for runs in by_stage.values():
+        walls = [r["wall_s"] for r in runs]
+        med = statistics.median(walls)
+        mad = statistics.median(abs(w - med) for w in walls) * 1.4826
+        found += [(r, r["wall_s"] / med if med else float("inf")) for r in runs
+                  if r["wall_s"] > med + k * mad and r["wall_s"] > 1.5 * med]
+    return sorted(found, key=lambda x: -x[0]["wall_s"])
+
+def summary(records: list, by: str = "stage", top: int = 10):
+    groups = defaultdict(list)
+    for r in records:
+        groups[str(r.get(by, "-"))].append(r)
+    total = sum(r["wall_s"] for r in records) or 1.0
+    runs = sorted({r["run"] for r in records})
+    print(f"{len(records)} records from {len(runs)} run(s): {', '.join(runs[-3:])}{' ...' if len(runs) > 3 else ''}")
+    print(f"{by:<16}{'n':>6}{'fail':>6}{'wall s':>11}{'share':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}"
+          f"{'cpu/wall':>9}{'rss MB':>9}{'read GB':>9}{'write GB':>9}")
+    for name, rs in sorted(groups.items(), key=lambda g: -sum(r["wall_s"] for r in g[1])):
+        walls = [r["wall_s"] for r in rs]
+        wall = sum(walls)
+        cpu = sum(r["user_s"] + r["sys_s"] for r in rs)
+        print(f"{name:<16}{len(rs):>6}{sum(r['exit'] != 0 for r in rs):>6}{wall:>11.1f}{wall / total:>7.1%}"
+              f"{wall / len(rs):>9.2f}{percentile(walls, 0.5):>9.2f}{percentile(walls, 0.95):>9.2f}{max(walls):>9.2f}"
+              f"{cpu / wall if wall else 0.0:>9.2f}{max(r['max_rss_mb'] for r in rs):>9.1f}"
+              f"{sum(r['read_bytes'] for r in rs) / 1024**3:>9.2f}{sum(r['write_bytes'] for r in rs) / 1024**3:>9.2f}")
+
+    tags = lambda r: " ".join(f"{k}={r[k]}" for k in ("trace", "chunk", "interval", "channel") if k in r)
+    slow = outliers(records)
+    if slow:
+        print(f"\nOutliers ({len(slow)}, wall time far above the stage median):")
+        for r, ratio in slow[:top]:
+            print(f"  {r['stage']:<14}{r['wall_s']:>9.2f}s  {ratio:5.1f}x median  {tags(r)}")
+    failed = [r for r in records if r["exit"] != 0]
+    if failed:
+        print(f"\nFailed stages ({len(failed)}):")
+        for r in failed[:top]:
+            print(f"  {r['stage']:<14} exit {r['exit']:<5} {tags(r)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-stage run log of the simulation pipeline")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("exec", help="Run a command and append its record to the log")
+    ex.add_argument("--stage", required=True)
+    ex.add_argument("--tag", action="append", default=[], help="key=value tag (repeatable)")
+    ex.add_argument("command", nargs=argparse.REMAINDER)
+    sm = sub.add_parser("summary", help="Where the time goes across the logged stages")
+    sm.add_argument("--log", default=LOG_PATH, help=f"Run log (default: {LOG_PATH})")
+    sm.add_argument("--run", help="Only this run id ('last' for the most recent run)")
+    sm.add_argument("--by", default="stage", help="Group by this field (stage, trace, chunk, interval, ...)")
+    sm.add_argument("--top", type=int, default=10, help="Outliers and failures to list")
+    args = ap.parse_args()
+
+    if args.cmd == "exec":
+        command = args.command[1:] if args.command[:1] == ["--"] else args.command
+        sys.exit(exec_stage(command, args.stage, dict(t.split("=", 1) for t in args.tag)))
+    records = load(args.log, args.run)
+    if not records:
+        raise SystemExit(f"No records in {args.log}")
+    summary(records, args.by, args.top)
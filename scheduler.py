@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Bounded process-pool runner for the pipeline job graph built by automation.py
+CACHED = "cached"   # returned by a node that found its outputs already complete
+
+
+class Node:
+    """
+    One unit of work: fn(*args) runs in a worker process once every node named in
+    deps has succeeded. expand(result), called in the scheduler, may return further
+    nodes (e.g. the per-chunk jobs once a trace is converted). Ready nodes with a
+    higher priority start first. A ready node whose gate() is False (e.g. over the
+    disk budget) waits while other nodes are running.
+    """
+
+    def __init__(self, name, fn, args=(), deps=(), stage="", priority=0, expand=None, gate=None):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.deps = tuple(deps)
+        self.stage = stage
+        self.priority = priority
+        self.expand = expand
+        self.gate = gate
+
+
+def _timed(fn, args):
+    t0 = time.time()
+    result = fn(*args)
+    return result, time.time() - t0
+
+
+def run_dag(nodes, jobs=1, throughput_stages=("simulate",)) -> dict:
+    """
+    Runs the graph on `jobs` worker processes (forked, so module settings changed
+    by the caller's CLI carry over). A failed node skips everything downstream of it.
+    Returns {name: "done" | "failed" | "skipped"} and prints the throughput in
+    simulations (nodes of throughput_stages) per hour.
+    """
+    pending = {n.name: n for n in nodes}
+    status = {}
+    stage_time = Counter()
+    stage_done = Counter()
+    running = {}
+    cached = 0
+    held = set()
+    t0 = time.time()
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork")) as pool:
+        while pending or running:
+            skipped = False
+            for node in sorted(pending.values(), key=lambda n: -n.priority):
+                dep_status = [status.get(d) for d in node.deps]
+                if any(s in ("failed", "skipped") for s in dep_status):
+                    status[node.name] = "skipped"
+                    del pending[node.name]
+                    skipped = True
+                elif all(s == "done" for s in dep_status) and len(running) < jobs:
+                    if running and node.gate and not node.gate():
+                        held.add(node.name)
+                        continue
+                    running[pool.submit(_timed, node.fn, node.args)] = node
+                    del pending[node.name]
+            if not running:
+                if not skipped:
+                    # Only nodes waiting on names that are not in the graph are left
+                    status.update(dict.fromkeys(pending, "skipped"))
+                    pending.clear()
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    status[node.name] = "failed"
+                    print(f"[scheduler] FAILED {node.name}: {e}")
+                    continue
+                status[node.name] = "done"
+                if result == CACHED:
+                    cached += 1
+                else:
+                    stage_time[node.stage] += seconds
+                    stage_done[node.stage] += 1
+                for child in (node.expand(result) if node.expand else None) or []:
+                    pending[child.name] = child
+                known = len(status) + len(pending) + len(running)
+                print(f"[scheduler] {len(status)}/{known} done {node.name} ({seconds:.1f}s)")
+
+    elapsed = time.time() - t0
+    counts = Counter(status.values())
+    sims = sum(stage_done[s] for s in throughput_stages)
+    print(f"\n[scheduler] {counts['done']} done ({cached} already complete), {counts['failed']} failed, "
+          f"{counts['skipped']} skipped in {elapsed:.1f}s on {jobs} workers")
+    for stage in sorted(stage_done):
+        print(f"  {stage:<10} {stage_done[stage]:5d} jobs  {stage_time[stage]:9.1f}s busy")
+    if held:
+        print(f"  {len(held)} nodes held back by their gate (disk budget)")
+    print(f"  Throughput: {sims / elapsed * 3600 if elapsed else 0.0:.1f} simulations/hour")
+    return status
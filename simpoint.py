@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import lzma
+import os
+import re
+import numpy as np
+from tqdm import tqdm
+from manifest import atomic_write
+
+# SimPoint-style phase analysis over the chunks dpc2ram.py would produce
+BBV_BUCKETS = 4096      # hashed IP histogram size
+PROJ_DIMS = 15          # SimPoint's random projection dimension
+PAGE_BITS = 12
+SEED = 42
+CHUNK_RE = re.compile(r"_chunk_(\d+)")
+
+SIGNATURE = ["mem_frac", "loads_per_inst", "store_frac", "branch_frac", "taken_frac", "pages_per_kinst"]
+
+
+class ChunkProfile:
+    def __init__(self):
+        self.bbv = np.zeros(BBV_BUCKETS, dtype=np.float64)
+        self.pages = np.zeros(0, dtype=np.uint64)
+        self.insts = self.mem = self.loads = self.stores = self.branches = self.taken = 0
+
+    def signature(self) -> np.ndarray:
+        n = max(self.insts, 1)
+        return np.array([self.mem / n, self.loads / n, self.stores / n, self.branches / n,
+                         self.taken / max(self.branches, 1), 1000.0 * len(self.pages) / n])
+
+
+def profile_chunks(input_xz: str, chunk_lines: int, max_chunks: int = 0, batch_records: int = 1 << 18) -> list:
+    """
+    One pass over the DPC records, assigning each record to the chunk holding its
+    first output line (bubble-only records go with the next line, as in dpc2ram).
+    """
+    from dpc2ram import RECORD_DTYPE, RECORD_SIZE, record_line_counts
+    profiles = []
+    lines = 0
+    with lzma.open(input_xz, "rb") as f_in, tqdm(unit="rec", desc="Profiling") as pbar:
+        while True:
+            buf = f_in.read(batch_records * RECORD_SIZE)
+            n_recs = len(buf) // RECORD_SIZE
+            if n_recs == 0:
+                break
+            recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=n_recs)
+            n_lines = record_line_counts(recs)
+            before = lines + np.cumsum(n_lines) - n_lines
+            chunk = before // chunk_lines
+            lines = int(before[-1] + n_lines[-1])
+            if max_chunks:
+                keep = chunk < max_chunks
+                recs, chunk, n_lines = recs[keep], chunk[keep], n_lines[keep]
+
+            ip_bucket = ((recs["ip"] * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(52)).astype(np.int64)
+            n_loads = np.count_nonzero(recs["src_mem"], axis=1)
+            n_stores = np.count_nonzero(recs["dst_mem"], axis=1)
+            for c in np.unique(chunk):
+                sel = chunk == c
+                while len(profiles) <= c:
+                    profiles.append(ChunkProfile())
+                p = profiles[c]
+                p.bbv += np.bincount(ip_bucket[sel], minlength=BBV_BUCKETS)
+                p.insts += int(sel.sum())
+                p.mem += int(np.count_nonzero(n_lines[sel]))
+                p.loads += int(n_loads[sel].sum())
+                p.stores += int(np.count_nonzero(n_stores[sel]))
+                p.branches += int(np.count_nonzero(recs["is_branch"][sel]))
+                p.taken += int(np.count_nonzero(recs["taken"][sel] & recs["is_branch"][sel]))
+                addrs = np.concatenate([recs["src_mem"][sel].ravel(), recs["dst_mem"][sel].ravel()])
+                p.pages = np.union1d(p.pages, np.unique(addrs[addrs != 0] >> np.uint64(PAGE_BITS)))
+            pbar.update(n_recs)
+            if max_chunks and lines >= max_chunks * chunk_lines:
+                break
+    return profiles
+
+def chunk_vectors(profiles: list, mem_weight: float = 1.0) -> np.ndarray:
+    # Projected, L1-normalized BBVs plus z-scored memory signature
+    rng = np.random.default_rng(SEED)
+    proj = rng.uniform(-1.0, 1.0, size=(BBV_BUCKETS, PROJ_DIMS))
+    bbv = np.array([p.bbv / max(p.bbv.sum(), 1) for p in profiles])
+    x_bbv = bbv @ proj
+    sig = np.array([p.signature() for p in profiles])
+    sig = (sig - sig.mean(axis=0)) / np.where(sig.std(axis=0) > 0, sig.std(axis=0), 1.0)
+    # Scale the signature so both halves have comparable spread
+    scale = mem_weight * np.sqrt((x_bbv.var(axis=0).sum() + 1e-12) / sig.shape[1])
+    return np.hstack([x_bbv, sig * scale])
+
+def kmeans(x: np.ndarray, k: int, rng, iters: int = 100):
+    # k-means++ seeding followed by Lloyd iterations
+    centers = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        d2 = np.min(((x[:, None, :] - np.array(centers)[None]) ** 2).sum(axis=2), axis=1)
+        centers.append(x[rng.choice(len(x), p=d2 / d2.sum())] if d2.sum() > 0 else x[rng.integers(len(x))])
+    centers = np.array(centers)
+    for _ in range(iters):
+        d2 = ((x[:, None, :] - centers[None]) ** 2).sum(axis=2)
+        labels = d2.argmin(axis=1)
+        new = np.array([x[labels == j].mean(axis=0) if np.any(labels == j) else centers[j] for j in range(k)])
+        if np.allclose(new, centers):
+            break
+        centers = new
+    d2 = ((x[:, None, :] - centers[None]) ** 2).sum(axis=2)
+    labels = d2.argmin(axis=1)
+    return labels, centers, float(d2[np.arange(len(x)), labels].sum())
+
+def bic(x: np.ndarray, labels: np.ndarray, k: int, inertia: float) -> float:
+    # Spherical-Gaussian BIC as used by SimPoint / X-means
+    r, m = x.shape
+    if r <= k:
+        return -np.inf
+    var = max(inertia / (m * (r - k)), 1e-12)
+    sizes = np.bincount(labels, minlength=k)
+    sizes = sizes[sizes > 0]
+    loglik = np.sum(sizes * np.log(sizes) - sizes * np.log(r)
+                    - sizes * m / 2 * np.log(2 * np.pi * var) - (sizes - k) / 2)
+    return float(loglik - (k - 1 + m * k + 1) / 2 * np.log(r))
+
+def select_simpoints(x: np.ndarray, max_k: int = 10, bic_threshold: float = 0.9, seeds: int = 5) -> list:
+    """
+    Smallest k whose BIC reaches bic_threshold of the best score's range, then the chunk
+    closest to each centroid, weighted by cluster size.
+    """
+    rng = np.random.default_rng(SEED)
+    runs = []
+    for k in range(1, min(max_k, len(x)) + 1):
+        best = min((kmeans(x, k, rng) for _ in range(seeds)), key=lambda r: r[2])
+        runs.append((k, best, bic(x, best[0], k, best[2])))
+    scores = np.array([r[2] for r in runs])
+    finite = scores[np.isfinite(scores)]
+    chosen = runs[0]
+    if finite.size:
+        cutoff = finite.min() + bic_threshold * (finite.max() - finite.min())
+        chosen = next(r for r in runs if np.isfinite(r[2]) and r[2] >= cutoff)
+    k, (labels, centers, _), _ = chosen
+
+    points = []
+    for j in range(k):
+        members = np.flatnonzero(labels == j)
+        if members.size == 0:
+            continue
+        rep = members[np.argmin(((x[members] - centers[j]) ** 2).sum(axis=1))]
+        points.append({"chunk": int(rep) + 1, "cluster": j, "weight": members.size / len(x),
+                       "members": [int(m) + 1 for m in members]})
+    return sorted(points, key=lambda p: p["chunk"])
+
+def input_stamp(path: str) -> str:
+    # size:mtime of the trace, so a file replaced under the same name is noticed
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def is_current(meta: dict, input_xz: str, chunk_lines: int, max_chunks: int) -> bool:
+    # Whether a simpoints.json was selected from this trace file with these chunk settings
+    return (meta.get("input") == os.path.basename(input_xz) and meta.get("input_stamp") == input_stamp(input_xz)
+            and meta.get("chunk_lines") == chunk_lines and meta.get("max_chunks") == max_chunks)
+
+def chunk_weight(chunk_dir: str) -> float:
+    """
+    Weight of a result/<trace>/<trace>_<chunk_tag> directory from the simpoints.json next
+    to it; 1.0 when the trace was not reduced to representative chunks.
+    """
+    path = os.path.join(os.path.dirname(os.path.normpath(chunk_dir)), "simpoints.json")
+    m = CHUNK_RE.search(os.path.basename(os.path.normpath(chunk_dir)))
+    if not m or not os.path.exists(path):
+        return 1.0
+    with open(path) as f:
+        weights = {p["chunk"]: p["weight"] for p in json.load(f)["simpoints"]}
+    return weights.get(int(m.group(1)), 0.0)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Pick weighted representative chunks of a DPC trace (SimPoint-style)")
+    ap.add_argument("input_xz", help="Input DPC trace (.xz)")
+    ap.add_argument("--chunk-lines", type=int, default=200000, help="Lines per chunk, as passed to dpc2ram.py")
+    ap.add_argument("--max-chunks", type=int, default=0, help="Only consider the first N chunks (0 = all)")
+    ap.add_argument("--max-k", type=int, default=10, help="Maximum number of clusters / simulation points")
+    ap.add_argument("--bic-threshold", type=float, default=0.9, help="Fraction of the best BIC to accept")
+    ap.add_argument("--mem-weight", type=float, default=1.0, help="Weight of the memory signature vs the IP vector")
+    ap.add_argument("--out", required=True, help="Output simpoints JSON")
+    args = ap.parse_args()
+
+    profiles = profile_chunks(args.input_xz, args.chunk_lines, args.max_chunks)
+    if not profiles:
+        raise SystemExit("No chunks found.")
+    x = chunk_vectors(profiles, args.mem_weight)
+    points = select_simpoints(x, args.max_k, args.bic_threshold)
+
+    with atomic_write(args.out) as f:
+        json.dump({
+            "input": os.path.basename(args.input_xz),
+            "input_stamp": input_stamp(args.input_xz),
+            "chunk_lines": args.chunk_lines,
+            "max_chunks": args.max_chunks,
+            "n_chunks": len(profiles),
+            "simpoints": points,
+            "signature": {str(i + 1): dict(zip(SIGNATURE, p.signature().round(6).tolist()))
+                          for i, p in enumerate(profiles)},
+        }, f, indent=2)
+
+    print(f"{len(points)} representative chunks out of {len(profiles)}:")
+    for p in points:
+        print(f"  chunk {p['chunk']:03d}  weight {p['weight']:.3f}  ({len(p['members'])} chunks)")
+    print(f"Saved: {args.out}")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from energy_model import EnergyModel, DEFAULT_SPEC
+from standin_ramulator2 import synthetic_delay
+
+# Stand-in for the DRAMPower CLI (build/bin/cli), for running and benchmarking
+# automation.py without a DRAMPower build: same command line and "Total Energy ->"
+# line, with the energy estimated by energy_model.py. A memspec that does not exist
+# falls back to the repo's ddr5.json; the CLI config is accepted and ignored.
+# STANDIN_DELAY / STANDIN_BUSY add a synthetic delay as in standin_ramulator2.py.
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stand-in for the DRAMPower CLI (see module comment)")
+    ap.add_argument("-m", "--memspec", required=True)
+    ap.add_argument("-t", "--trace", required=True, help="DRAMPower command trace (CSV)")
+    ap.add_argument("-c", "--config", help="CLI config (ignored)")
+    args = ap.parse_args()
+
+    energy = EnergyModel(args.memspec if os.path.exists(args.memspec) else DEFAULT_SPEC).estimate(args.trace)
+    synthetic_delay()
+    for k, e in energy.items():
+        if k != "Total":
+            sys.stdout.write(f"{k} energy: {e:.6e}\n")
+    sys.stdout.write(f"Total Energy -> {energy['Total']:.9e}\n")
+
+
+if __name__ == "__main__":
+    main()
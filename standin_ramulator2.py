@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+from collections import deque
+import numpy as np
+import yaml
+from trace_features import AddrMapping, CLOCK_RATIO, IPC
+
+# Stand-in for the ramulator2 binary, for running and benchmarking automation.py
+# without a Ramulator2 build: same command line (-f config.yaml), TraceRecorder
+# .chN command traces and report keys. Commands come from a simple open-page bank
+# model (BankModel) with an all-bank refresh every tREFI; the numbers follow the
+# workload and tREFI but are not cycle-accurate.
+# STANDIN_DELAY adds that many seconds to every run (busy-waiting if STANDIN_BUSY=1).
+TIMING = {"nCL": 40, "nRCD": 39, "nRP": 39, "nBL": 8, "nRFC": 710}   # DDR5_4800 preset
+BLOCK_LINES = 65536
+
+
+def synthetic_delay():
+    delay = float(os.environ.get("STANDIN_DELAY", "0") or 0)
+    if os.environ.get("STANDIN_BUSY") == "1":
+        end = time.perf_counter() + delay
+        while time.perf_counter() < end:
+            pass
+    elif delay > 0:
+        time.sleep(delay)
+
+def read_blocks(path, block_lines=BLOCK_LINES):
+    # SimpleO3 trace lines "bubble load_addr [wb_addr]" -> (bubble, addr, has_wb, wb_addr) arrays
+    with open(path) as f:
+        while True:
+            lines = [line.split() for _, line in zip(range(block_lines), f)]
+            lines = [p for p in lines if p]
+            if not lines:
+                return
+            bubble = np.array([int(p[0]) for p in lines], dtype=np.int64)
+            load = np.array([int(p[1]) for p in lines], dtype=np.uint64)
+            has_wb = np.array([len(p) > 2 for p in lines])
+            wb = np.array([int(p[2]) if len(p) > 2 else 0 for p in lines], dtype=np.uint64)
+            yield bubble, load, has_wb, wb
+
+
+class BankModel:
+    """
+    Open-page command generator for one memory system. A request issues RD/WR (row
+    hit), ACT+RD/WR (bank closed) or PRE+ACT+RD/WR (row conflict) once its bank is
+    free, column commands share the data bus (nBL apart) and an all-bank refresh
+    blocks every bank for nRFC. At most QUEUE_DEPTH requests are outstanding; the
+    frontend stalls behind them as SimpleO3 does behind a full request queue.
+    """
+
+    QUEUE_DEPTH = 32
+
+    def __init__(self, n_channels, n_ranks, tREFI, outputs):
+        self.n_channels, self.n_ranks = n_channels, n_ranks
+        self.tREFI = tREFI
+        self.outputs = outputs
+        self.open_row = {}
+        self.bank_ready = {}
+        self.inflight = deque(maxlen=self.QUEUE_DEPTH)
+        self.clk = 0.0
+        self.data_free = 0
+        self.next_ref = tREFI
+        self.ref_end = 0
+        self.end = 0
+        self.stats = dict(reads=0, writes=0, read_latency=0, hits=0, misses=0, conflicts=0, refreshes=0)
+
+    def refresh_until(self, t, cmds):
+        while t >= self.next_ref:
+            ts = max(self.next_ref, self.ref_end)
+            for ch in range(self.n_channels):
+                for rank in range(self.n_ranks):
+                    cmds.append((ts, ch, f"PREA, {ch}, {rank}, -1, -1, -1, -1"))
+                    cmds.append((ts + TIMING["nRP"], ch, f"REFab, {ch}, {rank}, -1, -1, -1, -1"))
+            self.open_row.clear()
+            self.ref_end = ts + TIMING["nRP"] + TIMING["nRFC"]
+            self.next_ref += self.tREFI
+            self.stats["refreshes"] += 1
+
+    def request(self, gap, is_write, ch, rank, bg, bank, row, col, cmds):
+        self.clk += gap
+        if len(self.inflight) == self.QUEUE_DEPTH:
+            self.clk = max(self.clk, self.inflight[0])
+        arrive = int(self.clk)
+        self.refresh_until(arrive, cmds)
+        key = (ch, rank, bg, bank)
+        where = f"{ch}, {rank}, {bg}, {bank}"
+        t = max(arrive, self.ref_end, self.bank_ready.get(key, 0))
+        open_row = self.open_row.get(key)
+        if open_row == row:
+            self.stats["hits"] += 1
+        else:
+            if open_row is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["conflicts"] += 1
+                cmds.append((t, ch, f"PRE, {where}, -1, -1"))
+                t += TIMING["nRP"]
+            cmds.append((t, ch, f"ACT, {where}, {row}, -1"))
+            t += TIMING["nRCD"]
+            self.open_row[key] = row
+        t = max(t, self.data_free)
+        cmds.append((t, ch, f"{'WR' if is_write else 'RD'}, {where}, {row}, {col}"))
+        self.data_free = self.bank_ready[key] = t + TIMING["nBL"]
+        done = t + TIMING["nCL"] + TIMING["nBL"]
+        self.inflight.append(done)
+        self.end = max(self.end, done)
+        if is_write:
+            self.stats["writes"] += 1
+        else:
+            self.stats["reads"] += 1
+            self.stats["read_latency"] += done - arrive
+
+    def run(self, trace, mapping):
+        for bubble, load, has_wb, wb in read_blocks(trace):
+            # Request order as issued by SimpleO3: each load, then its writeback (no gap)
+            slot = np.arange(len(load)) + np.concatenate(([0], np.cumsum(has_wb)[:-1]))
+            addr = np.empty(len(load) + int(has_wb.sum()), dtype=np.uint64)
+            is_write = np.zeros(len(addr), dtype=bool)
+            gap = np.zeros(len(addr))
+            addr[slot] = load
+            addr[slot[has_wb] + 1] = wb[has_wb]
+            is_write[slot[has_wb] + 1] = True
+            gap[slot] = (bubble + 1) / IPC * CLOCK_RATIO
+
+            f = mapping.fields(addr)
+            cmds = []
+            for i in range(len(addr)):
+                self.request(gap[i], is_write[i], int(f["channel"][i]), int(f["rank"][i]), int(f["bankgroup"][i]),
+                             int(f["bank"][i]), int(f["row"][i]), int(f["column"][i]), cmds)
+            # TraceRecorder logs commands in issue (time) order
+            cmds.sort(key=lambda c: c[0])
+            lines = [[] for _ in range(self.n_channels)]
+            for ts, ch, text in cmds:
+                lines[ch].append(f"{ts}, {text}\n")
+            for out, ch_lines in zip(self.outputs, lines):
+                out.writelines(ch_lines)
+        return max(int(self.clk), self.end)
+
+
+def report(config, cycles, stats):
+    # Subset of the YAML statistics Ramulator2 prints, with the keys the analysis scripts read
+    reads = stats["reads"]
+    return yaml.dump({
+        "Frontend": {"impl": config["Frontend"]["impl"]},
+        "MemorySystem": {
+            "impl": config["MemorySystem"]["impl"],
+            "memory_system_cycles": cycles,
+            "total_num_read_requests": reads,
+            "total_num_write_requests": stats["writes"],
+            "Controller": {
+                "impl": config["MemorySystem"]["Controller"]["impl"],
+                "id": "Channel 0",
+                "avg_read_latency_0": stats["read_latency"] / reads if reads else 0.0,
+                "num_read_reqs_0": reads,
+                "num_write_reqs_0": stats["writes"],
+                "row_hits_0": stats["hits"],
+                "row_misses_0": stats["misses"],
+                "row_conflicts_0": stats["conflicts"],
+                "num_refreshes_0": stats["refreshes"],
+            },
+        },
+    }, sort_keys=False)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stand-in for the ramulator2 binary (see module comment)")
+    ap.add_argument("-f", "--config_file", required=True, help="Ramulator2 YAML config")
+    args = ap.parse_args()
+
+    with open(args.config_file) as f:
+        config = yaml.safe_load(f)
+    mem = config["MemorySystem"]
+    org = mem["DRAM"]["org"]
+    n_channels, n_ranks = org.get("channel", 1), org.get("rank", 1)
+    tREFI = int(mem["DRAM"]["timing"]["tREFI"])
+    recorders = [p["ControllerPlugin"]["path"] for p in mem["Controller"].get("plugins", [])
+                 if "ControllerPlugin" in p and p["ControllerPlugin"]["impl"] == "TraceRecorder"]
+
+    # TraceRecorder writes one <path>.chN per channel; these may be named pipes
+    outputs = [open(f"{recorders[0]}.ch{ch}", "w") if recorders else open(os.devnull, "w") for ch in range(n_channels)]
+    try:
+        model = BankModel(n_channels, n_ranks, tREFI, outputs)
+        cycles = 0
+        for trace in config["Frontend"]["traces"]:
+            cycles = model.run(trace, AddrMapping(args.config_file))
+    finally:
+        for out in outputs:
+            out.close()
+    synthetic_delay()
+    sys.stdout.write(report(config, cycles, model.stats))
+
+
+if __name__ == "__main__":
+    main()
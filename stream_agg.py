@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import math
+
+# Constant-memory aggregation of per-run metrics for the analysis scripts: a
+# RunningStats per (trace, cfg, metric) instead of the list of every run dict.
+# Means and variances follow weighted Welford (West 1979), geometric means keep a
+# log sum, and two partial states (e.g. from different workers or result roots)
+# merge exactly as if one of them had seen all the runs.
+
+
+class RunningStats:
+    """
+    Weighted running mean / variance / min / max and geometric mean of one metric.
+    The geometric mean, like the scripts' geomean(), skips non-positive values.
+    """
+
+    __slots__ = ("count", "weight", "mean", "m2", "log_sum", "log_weight", "min", "max")
+
+    def __init__(self):
+        self.count, self.weight, self.mean, self.m2 = 0, 0.0, 0.0, 0.0
+        self.log_sum, self.log_weight = 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, x, w=1.0):
+        if w <= 0:
+            return
+        self.count += 1
+        self.weight += w
+        delta = x - self.mean
+        self.mean += delta * w / self.weight
+        self.m2 += w * delta * (x - self.mean)
+        if x > 0:
+            self.log_sum += w * math.log(x)
+            self.log_weight += w
+        self.min, self.max = min(self.min, x), max(self.max, x)
+
+    def merge(self, other):
+        # Chan et al.'s pairwise update; returns self
+        if other.weight == 0:
+            return self
+        total = self.weight + other.weight
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.weight * other.weight / total
+        self.mean += delta * other.weight / total
+        self.count += other.count
+        self.weight = total
+        self.log_sum += other.log_sum
+        self.log_weight += other.log_weight
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @property
+    def var(self):
+        # Weighted population variance (statistics.pvariance for unit weights)
+        return self.m2 / self.weight if self.weight else float('nan')
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    @property
+    def geomean(self):
+        return math.exp(self.log_sum / self.log_weight) if self.log_weight else float('nan')
+
+
+class GroupedStats:
+    """
+    {(trace, cfg): {metric: RunningStats}}. add() takes one run's metric dict;
+    merge() folds in another GroupedStats, key by key.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = list(metrics)
+        self.groups = {}
+
+    def add(self, key, values, w=1.0):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {m: RunningStats() for m in self.metrics}
+        for m in self.metrics:
+            group[m].add(values[m], w)
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            mine = self.groups.setdefault(key, {m: RunningStats() for m in self.metrics})
+            for m in self.metrics:
+                mine[m].merge(group[m])
+        return self
+
+    def get(self, key):
+        return self.groups.get(key)
+
+    def keys(self):
+        return self.groups.keys()
+
+    def means(self):
+        # {trace: {cfg: {metric: mean, "n_runs": count}}} as the scripts' data dicts
+        out = {}
+        for (trace, cfg), group in self.groups.items():
+            first = group[self.metrics[0]]
+            if first.weight > 0:
+                out.setdefault(trace, {})[cfg] = {**{m: s.mean for m, s in group.items()}, "n_runs": first.count}
+        return out
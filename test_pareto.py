@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 import os
-import re
 import math
-import statistics
-from collections import defaultdict, Counter
 import numpy as np
 import pandas as pd
+from results_store import stream_runs, FEATURES
+from pareto_sweep import ParetoSweep
+from stream_agg import GroupedStats
 
 # --- Configuration & Paths ---
 BASE_PATH = os.path.expanduser('/home/eevee/Documents/team_teh_tarik/result')
@@ -21,20 +21,6 @@ EPS = 1e-30                # protect divide-by-zero
 ratio_retent =  { "32ms": 1.0, "48ms": 2.2628, "64ms": 4.0395 }
 GAMMAS = np.arange(0.1, 0.25, 0.025)
 
-# --- Regex Patterns (Performance & AI Features) ---
-ENERGY_RE = re.compile(r"Total Energy ->\s*([\d\.eE\-\+]+)")
-LAT_RE    = re.compile(r"avg_read_latency_0:\s*([\d\.]+)")
-CYC_RE    = re.compile(r"memory_system_cycles:\s*([\d\.]+)")
-
-# AI Feature Regex (Supports multiple log formats)
-READ_RE   = re.compile(r"num_read_reqs_0:\s*([\d\.]+)|number_of_read_requests:\s*([\d\.]+)")
-WRITE_RE  = re.compile(r"num_write_reqs_0:\s*([\d\.]+)|number_of_write_requests:\s*([\d\.]+)")
-HITS_RE   = re.compile(r"row_hits_0:\s*([\d\.]+)|row_hits:\s*([\d\.]+)")
-RMISS_RE  = re.compile(r"row_misses_0:\s*([\d\.]+)|row_misses:\s*([\d\.]+)")
-RCONF_RE  = re.compile(r"row_conflicts_0:\s*([\d\.]+)|row_conflicts:\s*([\d\.]+)")
-LLC_M_RE  = re.compile(r"llc_read_misses:\s*([\d\.]+)|cache_read_misses:\s*([\d\.]+)")
-LLC_A_RE  = re.compile(r"llc_read_access:\s*([\d\.]+)|cache_read_access:\s*([\d\.]+)")
-
 TRACE_DISPLAY_MAP = {
     'deepsjeng': 'Trace B (deepsjeng)',
     'mcf':       'Trace D (mcf)',
@@ -50,156 +36,72 @@ def detect_trace_key(name: str) -> str:
         if key in name: return key
     return name.split('_')[0] if '_' in name else name
 
-def safe_float(regex, text, label=""):
-    m = regex.search(text)
-    if not m: return 0.0
-    # Return the first non-None group (handles OR in regex)
-    for group in m.groups():
-        if group is not None: return float(group)
-    return 0.0
-
-def geomean(values):
-    vals = [v for v in values if v > 0]
-    return math.exp(sum(math.log(v) for v in vals) / len(vals)) if vals else float('nan')
-
-def point_line_distance(px, py, ax, ay, bx, by):
-    vx, vy = bx - ax, by - ay
-    wx, wy = px - ax, py - ay
-    denom = vx*vx + vy*vy
-    if denom == 0: return math.hypot(px - ax, py - ay)
-    return abs(vx*wy - vy*wx) / math.sqrt(denom)
-
-# --- 1. Data Collection ---
-print(f"Scanning: {BASE_PATH}")
-trace_roots = set()
-for root, dirs, _ in os.walk(BASE_PATH):
-    if any(any(cfg in d for cfg in CONFIGS) for d in dirs):
-        trace_roots.add(root)
-
-aggregated = defaultdict(lambda: {cfg: [] for cfg in CONFIGS})
-
-for trace_path in sorted(trace_roots):
-    trace_key = detect_trace_key(os.path.basename(trace_path))
-    for cfg in CONFIGS:
-        cfg_folder = next((d for d in os.listdir(trace_path) if cfg in d), None)
-        if not cfg_folder: continue
-        
-        full_path = os.path.join(trace_path, cfg_folder)
-        dp_file  = next((f for f in os.listdir(full_path) if 'drampower_report' in f), None)
-        ram_file = next((f for f in os.listdir(full_path) if 'ramulator2_report' in f), None)
-        if not dp_file or not ram_file: continue
-
-        try:
-            with open(os.path.join(full_path, dp_file), 'r') as f:
-                dp_txt = f.read()
-                E = safe_float(ENERGY_RE, dp_txt, "Energy")
-
-            with open(os.path.join(full_path, ram_file), 'r') as f:
-                ram_txt = f.read()
-                lat_cyc = safe_float(LAT_RE, ram_txt)
-                tot_cyc = safe_float(CYC_RE, ram_txt)
-                # AI Feature extraction
-                n_read, n_write = safe_float(READ_RE, ram_txt), safe_float(WRITE_RE, ram_txt)
-                r_hit, r_miss, r_conf = safe_float(HITS_RE, ram_txt), safe_float(RMISS_RE, ram_txt), safe_float(RCONF_RE, ram_txt)
-                l_miss, l_acc = safe_float(LLC_M_RE, ram_txt), safe_float(LLC_A_RE, ram_txt)
-
-            # Performance Math
-            freq_hz = FREQ_MHZ * 1e6
-            lat_sec = lat_cyc / freq_hz
-            duration_hours = (tot_cyc / freq_hz) / 3600.0
-            M = E * (lat_sec ** 2)
-            
-            # Reliability Math
-            mu = (FIT_PER_GB / 1e9) * DEVICE_Gb * duration_hours
-            SER = 1.0 - math.exp(-mu)
-
-            # AI Calculation
-            total_reqs = n_read + n_write
-            denom_rb = r_hit + r_miss + r_conf
-            
-            # Append all metrics to avoid KeyErrors
-            aggregated[trace_key][cfg].append({
-                "E": E, "lat_sec": lat_sec, "hours": duration_hours, "M": M, "SER": SER,
-                "Incoming_Req_Per_Cycle": total_reqs / tot_cyc if tot_cyc > 0 else 0,
-                "Read_Intensity": n_read / total_reqs if total_reqs > 0 else 0,
-                "RB_Locality": r_hit / denom_rb if denom_rb > 0 else 0,
-                "RB_Conflict_Rate": r_conf / denom_rb if denom_rb > 0 else 0,
-                "LLC_Miss_Rate": l_miss / l_acc if l_acc > 0 else 0
-            })
-        except Exception as e:
-            continue
-
-# --- 2. Aggregation ---
-data = defaultdict(dict)
-for trace_key, cfgs in aggregated.items():
-    for cfg, runs in cfgs.items():
-        if not runs: continue
-        data[trace_key][cfg] = {
-            "M": statistics.mean(r["M"] for r in runs),
-            "SER": statistics.mean(r["SER"] for r in runs),
-            "n_runs": len(runs),
-            "runs": runs  # Keep raw runs for export
-        }
+def run_metrics(run):
+    # Performance Math
+    freq_hz = FREQ_MHZ * 1e6
+    lat_sec = run["lat_cycles"] / freq_hz
+    duration_hours = (run["cycles"] / freq_hz) / 3600.0
+    M = run["energy"] * (lat_sec ** 2)
+
+    # Reliability Math
+    mu = (FIT_PER_GB / 1e9) * DEVICE_Gb * duration_hours
+    SER = 1.0 - math.exp(-mu)
+
+    # Append all metrics to avoid KeyErrors
+    return {
+        "E": run["energy"], "lat_sec": lat_sec, "hours": duration_hours, "M": M, "SER": SER,
+        **{k: run[k] for k in FEATURES},
+        "weight": run["weight"]
+    }
+
+# --- 1. Data Collection & Aggregation (results.sqlite; weighted running means, runs are not kept) ---
+# Chunk weights come from simpoints.json; every run weighs 1.0 without it
+print(f"Loading: {BASE_PATH}")
+stats = GroupedStats(["M", "SER"])
+for run in stream_runs(BASE_PATH, CONFIGS):
+    if run["weight"] <= 0: continue
+    stats.add((detect_trace_key(run["chunk"]), run["cfg"]), run_metrics(run), run["weight"])
+data = stats.means()
 
 valid_traces = [t for t in sorted(data.keys()) if all(c in data[t] for c in CONFIGS)]
 if not valid_traces: raise SystemExit("No valid traces found.")
 
 # --- 3. Pareto Sweep ---
-gamma_results = []
-per_gamma_selections = {}
-
-for gamma in GAMMAS:
-    selections, M_norms, ratio_norms, counts = {}, [], [], Counter()
-    for t in valid_traces:
-        M64, SER64 = data[t]["48ms"]["M"], max(data[t]["48ms"]["SER"], EPS)
-        best_cfg, best_score, best_M, best_ratio = None, float("inf"), 0, 0
-
-        for cfg in CONFIGS:
-            M, SER = data[t][cfg]["M"], max(data[t][cfg]["SER"], EPS)
-            ratio_ser = SER / SER64
-            # Score formula: Score = M * ratio * (COEFF^gamma)
-            score = M * ratio_ser * (ratio_retent[cfg] ** gamma)
-            if score < best_score:
-                best_score, best_cfg, best_M, best_ratio = score, cfg, M, ratio_ser
-
-        selections[t] = {"cfg": best_cfg, "M": best_M, "ratio": best_ratio}
-        counts[best_cfg] += 1
-        M_norms.append(best_M / M64)
-        ratio_norms.append(best_ratio)
-
-    gamma_results.append({
-        "gamma": gamma, "M_impr": 1.0 - geomean(M_norms), "rel_deg_gm": geomean(ratio_norms),
-        "M_norm_gm": geomean(M_norms), "counts": counts
-    })
-    per_gamma_selections[gamma] = selections
-
-# Pick Pareto knee
-gamma_results_sorted = sorted(gamma_results, key=lambda d: d["gamma"])
-A, B = gamma_results_sorted[0], gamma_results_sorted[-1]
-best = max(gamma_results_sorted, key=lambda r: point_line_distance(r["rel_deg_gm"], r["M_impr"], A["rel_deg_gm"], A["M_impr"], B["rel_deg_gm"], B["M_impr"]))
-
-best_gamma = best["gamma"]
-final_sel = per_gamma_selections[best_gamma]
+# Score formula: Score = M * ratio * (COEFF^gamma), ratio = SER / SER(48ms); all gammas x traces x configs at once
+sweep = ParetoSweep(data, valid_traces, CONFIGS, ratio_retent, baseline="48ms")
+gamma_results = sweep.grid(GAMMAS)
+print(f"\n{'gamma':>7} {'M_impr':>8} {'rel_deg':>8}  " + "  ".join(f"{c:>5}" for c in CONFIGS))
+for r in gamma_results:
+    print(f"{r['gamma']:>7.3f} {r['M_impr']:>8.4f} {r['rel_deg_gm']:>8.4f}  " + "  ".join(f"{r['counts'][c]:>5}" for c in CONFIGS))
+
+# Pick Pareto knee on the exact curve: between breakpoints (a trace's winner changes) the selection is constant
+curve = sweep.curve(GAMMAS[0], GAMMAS[-1])
+k = sweep.knee(curve)
+best_gamma = (curve["lo"][k] + curve["hi"][k]) / 2
+final_sel = sweep.selections(best_gamma)
 
 # --- 4. Results & Export ---
-print(f"\n=== Best Gamma: {best_gamma:.4f} ===")
+print(f"\n=== Best Gamma: {best_gamma:.4f} (same selection over [{curve['lo'][k]:.4f}, {curve['hi'][k]:.4f}], "
+      f"segment {k + 1} of {len(curve['lo'])}) ===")
 for t in valid_traces:
     cfg = final_sel[t]["cfg"]
     print(f"- {t:20} -> {cfg}")
 
 print("\n=== Exporting Scenarios for AI Training ===")
-for t in valid_traces:
+# Second pass over the store for the winners' runs only
+exports = {t: [] for t in valid_traces}
+for run in stream_runs(BASE_PATH, CONFIGS, refresh=False):
+    t = detect_trace_key(run["chunk"])
+    if run["weight"] <= 0 or t not in exports or run["cfg"] != final_sel[t]["cfg"]: continue
+    # Calculate additional risk metrics during export
+    row = run_metrics(run)
+    row['Traffic_Risk'] = row['Incoming_Req_Per_Cycle'] * (1.0 - row['RB_Locality'])
+    row['Conflict_Load'] = row['RB_Conflict_Rate'] * row['Read_Intensity']
+    row['Label'] = run["cfg"]
+    exports[t].append(row)
+
+for t, trace_export in exports.items():
     winner_cfg = final_sel[t]["cfg"]
     save_path = os.path.join(AI_TRAINING_PATH, f"Scenario_{CONFIGS.index(winner_cfg) + 1}")
     os.makedirs(save_path, exist_ok=True)
-    
-    # Calculate additional risk metrics during export
-    trace_export = []
-    for run in data[t][winner_cfg]["runs"]:
-        row = run.copy()
-        row['Traffic_Risk'] = row['Incoming_Req_Per_Cycle'] * (1.0 - row['RB_Locality'])
-        row['Conflict_Load'] = row['RB_Conflict_Rate'] * row['Read_Intensity']
-        row['Label'] = winner_cfg
-        trace_export.append(row)
-        
     pd.DataFrame(trace_export).to_excel(os.path.join(save_path, f"trace_{t}.xlsx"), index=False)
\ No newline at end of file
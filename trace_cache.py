@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+# Content-addressed cache of dpc2ram.py outputs, keyed on the input trace contents,
+# the converter sources and every conversion argument.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("PIPELINE_ROOT", os.path.join(BASE_DIR, "..")), "trace_cache")
+CONVERTER_SOURCES = ["dpc2ram.py", "xz_index.py", "bintrace.py"]
+HASH_BLOCK = 16 * 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(HASH_BLOCK)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+def converter_version() -> str:
+    h = hashlib.sha256()
+    for name in CONVERTER_SOURCES:
+        with open(os.path.join(BASE_DIR, name), "rb") as f:
+            h.update(name.encode() + b"\0" + f.read())
+    return h.hexdigest()[:16]
+
+def _link(src: str, dst: str):
+    # Hard link when possible (same filesystem), otherwise a symlink into the cache
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        os.symlink(os.path.abspath(src), dst)
+
+
+class TraceCache:
+    """
+    Each entry is <cache_dir>/<key>/ holding the converter outputs and meta.json.
+    Input hashes are memoized by (path, size, mtime) so unchanged multi-GB traces
+    are not re-read. Entries are evicted least-recently-used above max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 50 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats_file = os.path.join(cache_dir, "stats.json")
+        self.hashes_file = os.path.join(cache_dir, "input_hashes.json")
+        self.lock_file = os.path.join(cache_dir, "cache.lock")
+
+    def _load_json(self, path: str, default):
+        if not os.path.exists(path):
+            return default
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_json(self, path: str, obj):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(obj, f, indent=2)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _locked(self):
+        # Serializes the read-modify-write of the shared json files, and entry removal against
+        # linking, across --jobs processes. Not reentrant: flock is per open file
+        with open(self.lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def input_hash(self, path: str) -> str:
+        st = os.stat(path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        entry = self._load_json(self.hashes_file, {}).get(os.path.abspath(path))
+        if entry and entry["stamp"] == stamp:
+            return entry["sha256"]
+        # Hash outside the lock, then merge into the memo as it is now
+        digest = file_sha256(path)
+        with self._locked():
+            memo = self._load_json(self.hashes_file, {})
+            memo[os.path.abspath(path)] = {"stamp": stamp, "sha256": digest}
+            self._save_json(self.hashes_file, memo)
+        return digest
+
+    def key(self, input_path: str, args: list) -> str:
+        h = hashlib.sha256()
+        h.update(self.input_hash(input_path).encode())
+        h.update(converter_version().encode())
+        h.update(json.dumps([str(a) for a in args]).encode())
+        return h.hexdigest()[:32]
+
+    def _record(self, hit: bool, saved_s: float = 0.0):
+        with self._locked():
+            stats = self._load_json(self.stats_file, {"hits": 0, "misses": 0, "saved_s": 0.0})
+            stats["hits" if hit else "misses"] += 1
+            stats["saved_s"] += saved_s
+            self._save_json(self.stats_file, stats)
+
+    def _valid(self, entry_dir: str, meta: dict) -> bool:
+        # Outputs are hard-linked out, so check nothing rewrote them in place
+        for name, size in meta["files"].items():
+            path = os.path.join(entry_dir, name)
+            if not os.path.exists(path) or os.path.getsize(path) != size:
+                return False
+        return True
+
+    def fetch(self, input_path: str, args: list, out_dir: str, convert) -> list:
+        """
+        Links the outputs for (input, args) into out_dir, running convert(staging_dir)
+        to produce them on a miss. Returns the output paths in out_dir.
+        """
+        key = self.key(input_path, args)
+        entry_dir = os.path.join(self.cache_dir, key)
+        meta_file = os.path.join(entry_dir, "meta.json")
+        # Validation and linking hold the lock, so another process's evict() cannot remove the entry in between
+        with self._locked():
+            meta = self._load_json(meta_file, None)
+            hit = bool(meta) and self._valid(entry_dir, meta)
+            if hit:
+                meta["last_used"] = time.time()
+                self._save_json(meta_file, meta)
+                outputs = self._link_outputs(entry_dir, meta, out_dir)
+
+        if hit:
+            self._record(True, meta.get("convert_s", 0.0))
+            print(f"Trace cache hit {key} ({len(meta['files'])} files, saved {meta.get('convert_s', 0.0):.1f}s)")
+        else:
+            staging = f"{entry_dir}.{os.getpid()}.tmp"
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+            os.makedirs(staging)
+            t0 = time.time()
+            try:
+                convert(staging)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            files = {name: os.path.getsize(os.path.join(staging, name)) for name in sorted(os.listdir(staging))}
+            meta = {"key": key, "input": os.path.abspath(input_path), "args": [str(a) for a in args],
+                    "converter": converter_version(), "files": files, "bytes": sum(files.values()),
+                    "convert_s": time.time() - t0, "created": time.time(), "last_used": time.time()}
+            self._save_json(os.path.join(staging, "meta.json"), meta)
+            with self._locked():
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir)
+                os.replace(staging, entry_dir)
+                outputs = self._link_outputs(entry_dir, meta, out_dir)
+            self._record(False)
+            print(f"Trace cache miss {key} (converted in {meta['convert_s']:.1f}s)")
+        self.evict(keep=key)
+        return outputs
+
+    def _link_outputs(self, entry_dir: str, meta: dict, out_dir: str) -> list:
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = []
+        for name in meta["files"]:
+            dst = os.path.join(out_dir, name)
+            _link(os.path.join(entry_dir, name), dst)
+            outputs.append(dst)
+        return outputs
+
+    def entries(self) -> list:
+        metas = []
+        for name in os.listdir(self.cache_dir):
+            meta = self._load_json(os.path.join(self.cache_dir, name, "meta.json"), None)
+            if meta:
+                metas.append(meta)
+        return metas
+
+    def evict(self, keep: str = None, max_bytes: int = None) -> int:
+        # Drop least-recently-used entries until the cache fits; returns bytes freed
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        freed = 0
+        with self._locked():
+            metas = sorted(self.entries(), key=lambda m: m["last_used"])
+            total = sum(m["bytes"] for m in metas)
+            for meta in metas:
+                if total <= max_bytes:
+                    break
+                if meta["key"] == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.cache_dir, meta["key"]), ignore_errors=True)
+                total -= meta["bytes"]
+                freed += meta["bytes"]
+                print(f"Evicted {meta['key']} ({meta['bytes'] / 1024**2:.1f} MB)")
+        return freed
+
+    def summary(self) -> dict:
+        stats = self._load_json(self.stats_file, {"hits": 0, "misses": 0, "saved_s": 0.0})
+        metas = self.entries()
+        lookups = stats["hits"] + stats["misses"]
+        return {**stats, "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(metas), "bytes": sum(m["bytes"] for m in metas)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or trim the converted-trace cache")
+    ap.add_argument("command", choices=["stats", "evict", "clear"])
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    ap.add_argument("--max-gb", type=float, default=50.0, help="Size bound for evict (GB)")
+    args = ap.parse_args()
+
+    cache = TraceCache(args.cache_dir, int(args.max_gb * 1024**3))
+    if args.command == "evict":
+        print(f"Freed {cache.evict() / 1024**3:.2f} GB")
+    elif args.command == "clear":
+        print(f"Freed {cache.evict(max_bytes=0) / 1024**3:.2f} GB")
+    s = cache.summary()
+    print(f"Entries: {s['entries']}  Size: {s['bytes'] / 1024**3:.2f} GB  "
+          f"Hits: {s['hits']}  Misses: {s['misses']}  Hit rate: {s['hit_rate'] * 100:.1f}%  "
+          f"Saved: {s['saved_s']:.0f}s")
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import lzma
+import os
+import numpy as np
+import yaml
+from tqdm import tqdm
+
+# DDR5_16Gb_x8 organization preset (Ramulator2 src/dram/impl/DDR5.cpp)
+ORG_PRESETS = {
+    "DDR5_16Gb_x8": {"bankgroup": 8, "bank": 4, "row": 1 << 16, "column": 1 << 10},
+}
+CHANNEL_WIDTH = 32      # bits
+PREFETCH_SIZE = 16      # BL16
+PAGE_BITS = 12          # RandomTranslation works on 4KB pages
+
+# SimpleO3 / LLC defaults used by automation.yaml
+LLC_BYTES = 2 * 1024**2
+LINE_BYTES = 64
+IPC = 4
+CLOCK_RATIO = 3 / 8     # memory ticks per frontend tick (MemorySystem 3, Frontend 8)
+MISS_PENALTY = 200      # frontend cycles per exposed LLC miss
+MLP = 4                 # overlapping misses
+
+FEATURES = ["Incoming_Req_Per_Cycle", "Read_Intensity", "RB_Locality", "RB_Conflict_Rate",
+            "LLC_Miss_Rate", "Traffic_Risk", "Conflict_Load"]
+
+
+def _log2(n: int) -> int:
+    return max(0, int(n).bit_length() - 1)
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = (x + np.uint64(0x9E3779B97F4A7C15))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class AddrMapping:
+    """
+    Vectorized Ramulator2 RoBaRaCoCh mapping (LSB first: channel, column, rank,
+    bankgroup, bank, row) after an optional RandomTranslation-like page shuffle.
+    """
+
+    def __init__(self, config_file: str, random_translation: bool = True):
+        with open(config_file) as f:
+            config = yaml.safe_load(f)
+        mem = config["MemorySystem"]
+        mapper = mem["AddrMapper"]["impl"]
+        if mapper != "RoBaRaCoCh":
+            raise ValueError(f"Unsupported address mapper {mapper} (only RoBaRaCoCh)")
+        org = dict(ORG_PRESETS[mem["DRAM"]["org"]["preset"]])
+        org["channel"] = mem["DRAM"]["org"].get("channel", 1)
+        org["rank"] = mem["DRAM"]["org"].get("rank", 1)
+
+        self.tx_offset = _log2(PREFETCH_SIZE * CHANNEL_WIDTH // 8)
+        self.bits = {
+            "channel": _log2(org["channel"]),
+            "column": _log2(org["column"]) - _log2(PREFETCH_SIZE),
+            "rank": _log2(org["rank"]),
+            "bankgroup": _log2(org["bankgroup"]),
+            "bank": _log2(org["bank"]),
+            "row": _log2(org["row"]),
+        }
+        self.n_banks = org["channel"] * org["rank"] * org["bankgroup"] * org["bank"]
+        translation = config.get("Frontend", {}).get("Translation", {})
+        self.random_translation = random_translation and translation.get("impl") == "RandomTranslation"
+        self.n_frames = max(1, int(translation.get("max_addr", 16 * 1024**3)) >> PAGE_BITS)
+
+    def translate(self, addr: np.ndarray) -> np.ndarray:
+        if not self.random_translation:
+            return addr
+        # Deterministic stand-in for Ramulator2's random page allocation
+        frame = _splitmix64(addr >> np.uint64(PAGE_BITS)) % np.uint64(self.n_frames)
+        return (frame << np.uint64(PAGE_BITS)) | (addr & np.uint64((1 << PAGE_BITS) - 1))
+
+    def fields(self, addr: np.ndarray) -> dict:
+        # -> {level: index array} for channel, column, rank, bankgroup, bank and row
+        a = self.translate(addr) >> np.uint64(self.tx_offset)
+        fields = {}
+        for level in ["channel", "column", "rank", "bankgroup", "bank", "row"]:
+            bits = np.uint64(self.bits[level])
+            fields[level] = a & ((np.uint64(1) << bits) - np.uint64(1))
+            a = a >> bits
+        return fields
+
+    def bank_row(self, addr: np.ndarray):
+        # -> (flat bank id over channel/rank/bankgroup/bank, row)
+        fields = self.fields(addr)
+        bank = fields["channel"]
+        for level in ["rank", "bankgroup", "bank"]:
+            bank = (bank << np.uint64(self.bits[level])) | fields[level]
+        return bank.astype(np.int64), fields["row"].astype(np.int64)
+
+
+class FeatureState:
+    """
+    Mergeable running counts for one trace (or chunk). update() consumes blocks of
+    converted lines; LLC and open-row state carry across blocks.
+    """
+
+    def __init__(self, mapping: AddrMapping, llc_bytes: int = LLC_BYTES):
+        self.mapping = mapping
+        self.window = max(1, llc_bytes // LINE_BYTES)
+        self.open_row = np.full(mapping.n_banks, -1, dtype=np.int64)
+        self.tail_lines = np.zeros(0, dtype=np.uint64)
+        self.tail_pos = np.zeros(0, dtype=np.int64)
+        self.pos = 0
+        self.c = dict(insts=0, lines=0, reads=0, writes=0, llc_read_access=0, llc_read_misses=0,
+                      dram_reads=0, dram_writes=0, row_hits=0, row_misses=0, row_conflicts=0)
+
+    def _llc_hits(self, lines: np.ndarray) -> np.ndarray:
+        """
+        Reuse-window LLC: an access hits if the same cache line was touched within the
+        last `window` accesses. Only the previous window of accesses is carried over.
+        """
+        pos = self.pos + np.arange(len(lines), dtype=np.int64)
+        all_lines = np.concatenate([self.tail_lines, lines])
+        all_pos = np.concatenate([self.tail_pos, pos])
+        order = np.argsort(all_lines, kind="stable")
+        same = all_lines[order][1:] == all_lines[order][:-1]
+        prev = np.full(len(all_lines), -1, dtype=np.int64)
+        prev[order[1:][same]] = all_pos[order[:-1][same]]
+        prev = prev[len(self.tail_lines):]
+        hits = (prev >= 0) & (pos - prev <= self.window)
+
+        keep = min(len(all_lines), self.window)
+        self.tail_lines, self.tail_pos = all_lines[-keep:], all_pos[-keep:]
+        self.pos += len(lines)
+        return hits
+
+    def _row_buffer(self, addr: np.ndarray):
+        # Open-page policy per bank: hit / miss (bank closed) / conflict, in request order
+        bank, row = self.mapping.bank_row(addr)
+        order = np.argsort(bank, kind="stable")
+        b, r = bank[order], row[order]
+        first = np.ones(len(b), dtype=bool)
+        first[1:] = b[1:] != b[:-1]
+        prev_row = np.empty(len(b), dtype=np.int64)
+        prev_row[1:] = r[:-1]
+        prev_row[first] = self.open_row[b[first]]
+        last = np.ones(len(b), dtype=bool)
+        last[:-1] = first[1:]
+        self.open_row[b[last]] = r[last]
+
+        hits = int(np.count_nonzero(prev_row == r))
+        misses = int(np.count_nonzero(prev_row < 0))
+        self.c["row_hits"] += hits
+        self.c["row_misses"] += misses
+        self.c["row_conflicts"] += len(b) - hits - misses
+
+    def update(self, line_bubble, load_addr, wb_addr, has_wb):
+        n = len(has_wb)
+        if n == 0:
+            return
+        load_addr = np.asarray(load_addr, dtype=np.uint64)
+        wb_addr = np.asarray(wb_addr, dtype=np.uint64)
+        self.c["insts"] += int(np.asarray(line_bubble, dtype=np.uint64).sum()) + n
+        self.c["lines"] += n
+
+        # Request order as issued by SimpleO3: each load, then its writeback
+        n_wb = int(np.count_nonzero(has_wb))
+        slot = np.arange(n, dtype=np.int64) + np.concatenate(([0], np.cumsum(has_wb)[:-1]))
+        addr = np.empty(n + n_wb, dtype=np.uint64)
+        is_write = np.zeros(n + n_wb, dtype=bool)
+        addr[slot] = load_addr
+        addr[slot[has_wb] + 1] = wb_addr[has_wb]
+        is_write[slot[has_wb] + 1] = True
+
+        hits = self._llc_hits(addr >> np.uint64(6))
+        self.c["reads"] += n
+        self.c["writes"] += n_wb
+        self.c["llc_read_access"] += n
+        self.c["llc_read_misses"] += int(np.count_nonzero(~hits & ~is_write))
+
+        to_dram = ~hits
+        self.c["dram_reads"] += int(np.count_nonzero(to_dram & ~is_write))
+        self.c["dram_writes"] += int(np.count_nonzero(to_dram & is_write))
+        if to_dram.any():
+            self._row_buffer(addr[to_dram])
+
+    def merge(self, other: "FeatureState"):
+        for k, v in other.c.items():
+            self.c[k] += v
+
+    def features(self) -> dict:
+        c = self.c
+        frontend_cycles = c["insts"] / IPC + c["llc_read_misses"] * MISS_PENALTY / MLP
+        mem_cycles = frontend_cycles * CLOCK_RATIO
+        total_reqs = c["dram_reads"] + c["dram_writes"]
+        denom_rb = c["row_hits"] + c["row_misses"] + c["row_conflicts"]
+        row = {
+            "Incoming_Req_Per_Cycle": total_reqs / mem_cycles if mem_cycles > 0 else 0,
+            "Read_Intensity": c["dram_reads"] / total_reqs if total_reqs > 0 else 0,
+            "RB_Locality": c["row_hits"] / denom_rb if denom_rb > 0 else 0,
+            "RB_Conflict_Rate": c["row_conflicts"] / denom_rb if denom_rb > 0 else 0,
+            "LLC_Miss_Rate": c["llc_read_misses"] / c["llc_read_access"] if c["llc_read_access"] > 0 else 0,
+            "Req_Per_Inst": total_reqs / c["insts"] if c["insts"] > 0 else 0,
+            "Est_Memory_Cycles": mem_cycles,
+        }
+        row["Traffic_Risk"] = row["Incoming_Req_Per_Cycle"] * (1.0 - row["RB_Locality"])
+        row["Conflict_Load"] = row["RB_Conflict_Rate"] * row["Read_Intensity"]
+        return row
+
+
+def iter_line_blocks(path: str, block_lines: int = 1 << 18, phys_capacity: int = 32 * 1024**3, shift: int = 0):
+    """
+    Yields (line_bubble, load_addr, wb_addr, has_wb) blocks from a DPC .xz trace
+    (decoded on the fly), a packed .bin trace, or a SimpleO3 text trace.
+    """
+    if path.endswith(".xz"):
+        from dpc2ram import RECORD_DTYPE, RECORD_SIZE, decode_batch
+        bubble = 0
+        with lzma.open(path, "rb") as f_in:
+            while True:
+                buf = f_in.read(block_lines * RECORD_SIZE)
+                n_recs = len(buf) // RECORD_SIZE
+                if n_recs == 0:
+                    break
+                recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=n_recs)
+                line_bubble, load_addr, wb_addr, has_wb, _, bubble = decode_batch(recs, bubble, phys_capacity, shift)
+                yield line_bubble, load_addr, wb_addr, has_wb
+    elif path.endswith(".bin"):
+        from bintrace import BinTrace
+        trace = BinTrace(path)
+        for start in range(0, len(trace), block_lines):
+            yield trace.decode(*trace.slice(start, start + block_lines))
+    else:
+        with open(path) as f:
+            while True:
+                text = f.readlines(block_lines * 24)
+                if not text:
+                    break
+                has_wb = np.fromiter((t.count(" ") == 2 for t in text), dtype=bool, count=len(text))
+                values = np.array(" ".join(text).split(), dtype=np.uint64)
+                width = 2 + has_wb.astype(np.int64)
+                starts = np.cumsum(width) - width
+                wb_addr = np.zeros(len(text), dtype=np.uint64)
+                wb_addr[has_wb] = values[starts[has_wb] + 2]
+                yield values[starts], values[starts + 1], wb_addr, has_wb
+
+
+def extract_features(path: str, mapping: AddrMapping, chunk_lines: int = 0, **kwargs):
+    """
+    Returns a list of (chunk_id, FeatureState); chunk_id 0 is the whole trace.
+    """
+    total = FeatureState(mapping)
+    chunks = []
+    state = FeatureState(mapping)
+    for block in tqdm(iter_line_blocks(path, **kwargs), unit="blk", desc=os.path.basename(path)):
+        if not chunk_lines:
+            total.update(*block)
+            continue
+        # Chunks start cold, like the separate Ramulator2 run each chunk gets
+        start = 0
+        n = len(block[3])
+        while start < n:
+            take = min(n - start, chunk_lines - state.c["lines"])
+            part = tuple(np.asarray(col)[start:start + take] for col in block)
+            state.update(*part)
+            total.update(*part)
+            start += take
+            if state.c["lines"] >= chunk_lines:
+                chunks.append((len(chunks) + 1, state))
+                state = FeatureState(mapping)
+    if chunk_lines and state.c["lines"]:
+        chunks.append((len(chunks) + 1, state))
+    return [(0, total)] + chunks
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Estimate classifier features from DPC/SimpleO3 traces without running Ramulator2")
+    ap.add_argument("inputs", nargs="+", help="DPC .xz traces, packed .bin traces or SimpleO3 .trace files")
+    ap.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "automation.yaml"),
+                    help="Ramulator2 config providing org and address mapping")
+    ap.add_argument("--chunk-lines", type=int, default=0, help="Also report per chunk of this many lines")
+    ap.add_argument("--phys-capacity", type=int, default=32 * 1024**3, help="As dpc2ram.py (for .xz input)")
+    ap.add_argument("--shift", type=int, default=0, help="As dpc2ram.py (for .xz input)")
+    ap.add_argument("--no-translation", action="store_true", help="Map addresses without the random page shuffle")
+    ap.add_argument("--out", default="trace_features.csv", help="Output CSV")
+    args = ap.parse_args()
+
+    mapping = AddrMapping(args.config, random_translation=not args.no_translation)
+    with open(args.out, "w", newline="") as f:
+        writer = None
+        for path in args.inputs:
+            results = extract_features(path, mapping, args.chunk_lines,
+                                       phys_capacity=args.phys_capacity, shift=args.shift)
+            for chunk_id, state in results:
+                row = {"trace": os.path.basename(path), "chunk": chunk_id, **state.features(), **state.c}
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                if chunk_id == 0:
+                    print(f"{row['trace']:<30} " + " ".join(f"{k}={row[k]:.4g}" for k in FEATURES))
+    print(f"Saved: {args.out}")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import numpy as np
+import automation
+from automation import job_paths, run_config, job_nodes, job_complete
+from manifest import atomic_write
+from scheduler import run_dag
+from simpoint import chunk_weight
+
+# Per-trace adaptive search of the refresh interval: golden-section search over the
+# retention window (integer ms, tREFI = ms * 7800 / 64) on the test_pareto.py score
+# M * SER * retention_ratio^gamma, simulating only the points the search visits.
+# Points already under result/ (e.g. the 32/48/64 ms grid) are reused, not re-simulated.
+FREQ_MHZ = 1600.0
+FIT_PER_GB = 100.0
+DEVICE_Gb = 16.0
+EPS = 1e-30
+RETENTION_POINTS = {32: 1.0, 48: 2.2628, 64: 4.0395}   # ratio_retent of test_pareto.py
+INV_PHI = (math.sqrt(5) - 1) / 2
+
+LAT_KEY = "avg_read_latency_0:"
+CYC_KEY = "memory_system_cycles:"
+
+
+def trefi_of(interval_ms: int) -> int:
+    return round(interval_ms * 7800 / 64)
+
+def interval_of(tREFI: float) -> float:
+    return tREFI * 64 / 7800
+
+def retention_ratio(interval_ms: float) -> float:
+    # Log-log interpolation through RETENTION_POINTS, extended by the end segments
+    x = np.log(sorted(RETENTION_POINTS))
+    y = np.log([RETENTION_POINTS[k] for k in sorted(RETENTION_POINTS)])
+    t = math.log(interval_ms)
+    i = min(max(np.searchsorted(x, t) - 1, 0), len(x) - 2)
+    return math.exp(y[i] + (y[i + 1] - y[i]) * (t - x[i]) / (x[i + 1] - x[i]))
+
+def report_value(path: str, key: str) -> float:
+    with open(path) as f:
+        for line in f:
+            if key in line:
+                return float(line.split(key, 1)[1].split()[0])
+    raise ValueError(f"{key} not found in {path}")
+
+def run_metrics(paths: dict) -> dict:
+    # M and SER of one finished job, as computed by test_pareto.py
+    energy = report_value(paths["drampower_report_output"], "Total Energy ->")
+    lat_sec = report_value(paths["ramulator_report_output"], LAT_KEY) / (FREQ_MHZ * 1e6)
+    hours = report_value(paths["ramulator_report_output"], CYC_KEY) / (FREQ_MHZ * 1e6) / 3600.0
+    return {"M": energy * lat_sec ** 2, "SER": 1.0 - math.exp(-(FIT_PER_GB / 1e9) * DEVICE_Gb * hours)}
+
+
+class TrefiSearch:
+    """
+    Scores retention windows of one trace. evaluate(ms) runs Steps 2-4 (with
+    automation.RESUME, so only stale or missing stages rerun) for the chunks whose
+    results at that window are not current, then memoizes the weighted metrics.
+    Result directories without a manifest (runs older than --resume) are taken as is.
+    """
+
+    def __init__(self, dpc_file_name, base_config, chunk_files, gamma, jobs=1, max_sims=0):
+        self.dpc_file_name = dpc_file_name
+        self.trace_name = automation.trace_paths(dpc_file_name)[0]
+        self.base_config = base_config
+        self.chunk_files = chunk_files
+        self.gamma = gamma
+        self.jobs = jobs
+        self.max_sims = max_sims
+        self.points = {}
+        self.simulated = 0
+
+    def chunk_jobs(self, interval_ms):
+        for chunk_trace in self.chunk_files:
+            chunk_tag = os.path.splitext(os.path.basename(chunk_trace))[0]
+            yield chunk_tag, (self.base_config, self.trace_name, chunk_trace, chunk_tag, trefi_of(interval_ms), interval_ms)
+
+    def measure(self, interval_ms):
+        runs = []
+        for chunk_tag, _ in self.chunk_jobs(interval_ms):
+            paths = job_paths(self.trace_name, chunk_tag, interval_ms)
+            weight = chunk_weight(os.path.dirname(paths["output_base"]))
+            if weight > 0:
+                runs.append((weight, run_metrics(paths)))
+        if not runs:
+            raise ValueError(f"no weighted chunks for {self.trace_name}")
+        total = sum(w for w, _ in runs)
+        return {k: sum(w * r[k] for w, r in runs) / total for k in ("M", "SER")}
+
+    def pending(self, interval_ms):
+        jobs = []
+        for chunk_tag, job in self.chunk_jobs(interval_ms):
+            paths = job_paths(self.trace_name, chunk_tag, interval_ms)
+            legacy = not os.path.exists(paths["manifest"]) and os.path.exists(paths["drampower_report_output"])
+            if not legacy and not job_complete(*job):
+                jobs.append((chunk_tag, job))
+        return jobs
+
+    def simulate(self, jobs, interval_ms):
+        if self.jobs > 1:
+            nodes = []
+            for chunk_tag, job in jobs:
+                nodes += job_nodes(f"{self.dpc_file_name}/{chunk_tag}/{interval_ms}ms", job)
+            run_dag(nodes, self.jobs)
+        else:
+            for _, job in jobs:
+                run_config(*job)
+
+    def budget_left(self) -> bool:
+        return not self.max_sims or self.simulated < self.max_sims
+
+    def evaluate(self, interval_ms: int) -> float:
+        if interval_ms in self.points:
+            return self.points[interval_ms]["score"]
+        jobs = self.pending(interval_ms)
+        if jobs:
+            if not self.budget_left():
+                return float("inf")
+            print(f"\n=== tREFI search: simulating {interval_ms} ms (tREFI {trefi_of(interval_ms)}), "
+                  f"{len(jobs)} chunk(s) ===")
+            self.simulate(jobs, interval_ms)
+            self.simulated += 1
+        try:
+            metrics = self.measure(interval_ms)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"{interval_ms} ms has no usable results: {e}") from None
+        reused = not jobs
+        ratio = retention_ratio(interval_ms)
+        score = metrics["M"] * max(metrics["SER"], EPS) * ratio ** self.gamma
+        self.points[interval_ms] = {"interval_ms": interval_ms, "tREFI": trefi_of(interval_ms), **metrics,
+                                    "retention_ratio": ratio, "score": score, "reused": reused}
+        print(f"[trefi] {interval_ms:3d} ms  tREFI {trefi_of(interval_ms):5d}  M {metrics['M']:.4e}  "
+              f"SER {metrics['SER']:.4e}  score {score:.4e}{'  (reused)' if reused else ''}")
+        return score
+
+    def golden_section(self, lo: int, hi: int, tol: int = 1) -> int:
+        """
+        Integer golden-section search for the minimum score in [lo, hi] ms, assuming it
+        is unimodal there. The bracket shrinks until it is at most max(tol, 2) wide and
+        the remaining points are then scored exhaustively.
+        """
+        a, b = lo, hi
+        while b - a > max(tol, 2):
+            c, d = b - round((b - a) * INV_PHI), a + round((b - a) * INV_PHI)
+            if c >= d:
+                break
+            if self.evaluate(c) <= self.evaluate(d):
+                b = d
+            else:
+                a = c
+        for interval_ms in range(a, b + 1):
+            self.evaluate(interval_ms)
+        return min(self.points, key=lambda k: self.points[k]["score"], default=None)
+
+
+def search_trace(dpc_file_name, trefi_range, gamma, tol=1, max_sims=0, jobs=1, simpoints=False, simpoint_max_chunks=0):
+    trace_name = automation.trace_paths(dpc_file_name)[0]
+    base_config = automation.load_base_config()
+    chunk_files = automation.convert_chunks(dpc_file_name, simpoints, simpoint_max_chunks)
+    if not chunk_files:
+        raise RuntimeError("no chunk files generated")
+
+    lo, hi = math.ceil(interval_of(trefi_range[0])), math.floor(interval_of(trefi_range[1]))
+    if lo > hi:
+        raise RuntimeError(f"tREFI range {trefi_range} contains no whole-ms retention window")
+    search = TrefiSearch(dpc_file_name, base_config, chunk_files, gamma, jobs, max_sims)
+    best = search.points.get(search.golden_section(lo, hi, tol))
+    if best is None:
+        raise RuntimeError("no point could be evaluated within the simulation budget")
+
+    out = os.path.join(automation.result_dir, trace_name, "trefi_search.json")
+    with atomic_write(out) as f:
+        json.dump({"trace": trace_name, "gamma": gamma, "range_ms": [lo, hi], "simulated": search.simulated,
+                   "best": best, "points": [search.points[k] for k in sorted(search.points)]}, f, indent=2)
+    print(f"\n=== {trace_name}: best retention window {best['interval_ms']} ms (tREFI {best['tREFI']}) "
+          f"after {len(search.points)} points, {search.simulated} simulated ===")
+    print(f"Saved: {out}")
+    return best
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Adaptive per-trace tREFI search (golden-section on the M/SER score)")
+    ap.add_argument("dpc_trace", nargs="+", help="DPC trace file name(s) (.xz) inside ../trace_files")
+    ap.add_argument("--range", nargs=2, type=float, default=[3900, 7800], metavar=("LO", "HI"),
+                    help="tREFI range to search (default: 3900 7800, i.e. 32-64 ms)")
+    ap.add_argument("--gamma", type=float, default=0.15, help="Retention weight of the score (test_pareto.py gamma)")
+    ap.add_argument("--tol", type=int, default=1, help="Stop once the bracket is this many ms wide")
+    ap.add_argument("--max-sims", type=int, default=0, help="Cap on newly simulated points per trace (0 = none)")
+    ap.add_argument("--jobs", type=int, default=1, help="Worker processes for the chunks of one point")
+    ap.add_argument("--simpoints", action="store_true", help="Simulate only representative chunks")
+    ap.add_argument("--simpoint-max-chunks", type=int, default=0)
+    ap.add_argument("--energy-backend", choices=["drampower", "model"], default=automation.ENERGY_BACKEND)
+    args = ap.parse_args()
+
+    automation.ENERGY_BACKEND = args.energy_backend
+    automation.RESUME = True
+    for trace in args.dpc_trace:
+        try:
+            search_trace(trace, args.range, args.gamma, args.tol, args.max_sims, args.jobs,
+                         args.simpoints, args.simpoint_max_chunks)
+        except RuntimeError as e:
+            print(f"tREFI search failed for {trace}: {e}")
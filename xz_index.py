@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import argparse
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# xz container layout (https://tukaani.org/xz/xz-file-format.txt)
+HEADER_MAGIC = b"\xfd7zXZ\x00"
+FOOTER_MAGIC = b"YZ"
+STREAM_HEADER_SIZE = 12
+STREAM_FOOTER_SIZE = 12
+
+
+def _round4(n: int) -> int:
+    return (n + 3) & ~3
+
+def _read_varint(buf: bytes, pos: int):
+    value, shift = 0, 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def list_xz_blocks(path: str) -> list:
+    """
+    Reads the stream footers and indexes of an .xz file (no decompression) and returns
+    one dict per block in file order:
+    offset/unpadded (compressed position and size), uoffset/usize (uncompressed) and
+    flags (the stream flags the block was written with).
+    """
+    blocks = []
+    with open(path, "rb") as f:
+        pos = os.fstat(f.fileno()).st_size
+        while pos > 0:
+            # Skip stream padding (groups of four null bytes)
+            while pos >= 4:
+                f.seek(pos - 4)
+                if f.read(4) != b"\x00\x00\x00\x00":
+                    break
+                pos -= 4
+            f.seek(pos - STREAM_FOOTER_SIZE)
+            footer = f.read(STREAM_FOOTER_SIZE)
+            if footer[10:] != FOOTER_MAGIC:
+                raise ValueError(f"{path}: not an xz file (bad stream footer)")
+            backward_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+            flags = footer[8:10]
+
+            index_start = pos - STREAM_FOOTER_SIZE - backward_size
+            f.seek(index_start)
+            index = f.read(backward_size)
+            if index[0] != 0x00:
+                raise ValueError(f"{path}: bad xz index indicator")
+            count, p = _read_varint(index, 1)
+            records = []
+            for _ in range(count):
+                unpadded, p = _read_varint(index, p)
+                usize, p = _read_varint(index, p)
+                records.append((unpadded, usize))
+
+            stream_start = index_start - sum(_round4(u) for u, _ in records) - STREAM_HEADER_SIZE
+            f.seek(stream_start)
+            header = f.read(STREAM_HEADER_SIZE)
+            if header[:6] != HEADER_MAGIC or header[6:8] != flags:
+                raise ValueError(f"{path}: xz stream header does not match its footer")
+
+            offset = stream_start + STREAM_HEADER_SIZE
+            stream_blocks = []
+            for unpadded, usize in records:
+                stream_blocks.append({"offset": offset, "unpadded": unpadded, "usize": usize, "flags": flags.hex()})
+                offset += _round4(unpadded)
+            blocks[:0] = stream_blocks
+            pos = stream_start
+
+    uoffset = 0
+    for b in blocks:
+        b["uoffset"] = uoffset
+        uoffset += b["usize"]
+    return blocks
+
+def decompress_block(fd: int, block: dict) -> bytes:
+    # Wrap the single block in a minimal one-block stream so the stock lzma
+    # decoder handles the filter chain and integrity check for us
+    flags = bytes.fromhex(block["flags"])
+    header = HEADER_MAGIC + flags + struct.pack("<I", zlib.crc32(flags))
+    data = os.pread(fd, _round4(block["unpadded"]), block["offset"])
+
+    index = b"\x00" + _encode_varint(1) + _encode_varint(block["unpadded"]) + _encode_varint(block["usize"])
+    index += b"\x00" * (_round4(len(index)) - len(index))
+    index += struct.pack("<I", zlib.crc32(index))
+
+    footer_body = struct.pack("<I", len(index) // 4 - 1) + flags
+    footer = struct.pack("<I", zlib.crc32(footer_body)) + footer_body + FOOTER_MAGIC
+    return lzma.decompress(header + data + index + footer, format=lzma.FORMAT_XZ)
+
+
+class XzBlockReader:
+    """
+    Read-only file object over the decompressed contents of an .xz file, starting at
+    block start_block (skipping skip_bytes of it). Up to `threads` blocks are decoded
+    ahead concurrently; lzma releases the GIL so this scales across cores.
+    """
+
+    def __init__(self, path: str, blocks: list = None, start_block: int = 0, skip_bytes: int = 0, threads: int = 1):
+        self.blocks = blocks if blocks is not None else list_xz_blocks(path)
+        self.fd = os.open(path, os.O_RDONLY)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, threads))
+        self.lookahead = max(1, threads) * 2
+        self.next_block = start_block
+        self.pending = deque()
+        self.buf = b""
+        self.pos = 0
+        self.skip = skip_bytes
+        self._fill()
+
+    def _fill(self):
+        while len(self.pending) < self.lookahead and self.next_block < len(self.blocks):
+            self.pending.append(self.pool.submit(decompress_block, self.fd, self.blocks[self.next_block]))
+            self.next_block += 1
+
+    def read(self, n: int = -1) -> bytes:
+        # Fast path: served from the current block without copying the remainder
+        if 0 <= n <= len(self.buf) - self.pos:
+            self.pos += n
+            return self.buf[self.pos - n:self.pos]
+        parts = [self.buf[self.pos:]]
+        have = len(parts[0])
+        while (n < 0 or have < n) and self.pending:
+            data = self.pending.popleft().result()
+            self._fill()
+            if self.skip:
+                data, self.skip = data[self.skip:], max(0, self.skip - len(data))
+            parts.append(data)
+            have += len(data)
+        if len(parts) == 2 and not parts[0]:
+            self.buf = parts[1]
+        else:
+            self.buf = b"".join(parts)
+        if n < 0:
+            n = len(self.buf)
+        self.pos = min(n, len(self.buf))
+        return self.buf[:self.pos]
+
+    def close(self):
+        for fut in self.pending:
+            fut.cancel()
+        self.pending.clear()
+        self.pool.shutdown(wait=True)
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="List the blocks of an .xz file")
+    ap.add_argument("input_xz", help="Input .xz file")
+    args = ap.parse_args()
+
+    blocks = list_xz_blocks(args.input_xz)
+    print(f"{'Block':>6} {'Offset':>14} {'Compressed':>12} {'Uncompressed':>14}")
+    for i, b in enumerate(blocks):
+        print(f"{i:>6} {b['offset']:>14,} {b['unpadded']:>12,} {b['usize']:>14,}")
+    if len(blocks) == 1:
+        print("Single block: recompress with `xz -T0` (or --block-size) to allow seeking and parallel decoding")